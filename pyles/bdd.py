@@ -0,0 +1,359 @@
+"""
+Reduced ordered binary decision diagrams.
+
+Equivalent equations built in the same manager, with the same variable order, give the
+same node, so equivalence is a comparison of node ids and the node is a normal form.
+"""
+from .equation import Equation, AndEq, OrEq, NotEq, ImpliesEq, BiImpliesEq, SymbolEq
+from .cache import symbol_order
+from .truthtable import NotEquivalentError, StoppedError
+
+# Terminal node ids.
+FALSE = 0
+TRUE = 1
+
+# Live nodes above which a manager collects unreferenced nodes before building the next equation.
+DEFAULT_GC_THRESHOLD = 1 << 20
+# Live nodes above which building stops with NodeLimitError.
+DEFAULT_MAX_NODES = 1 << 22
+# Subterms built between calls of a stop callback.
+STOP_INTERVAL = 256
+
+
+class NodeLimitError(Exception):
+    """ Raised when a BDD grows past its manager's max_nodes. """
+
+
+def variable_order(*eqs, method='occurrence'):
+    """
+    Variable order for equations.
+
+    :param method: 'occurrence' orders symbols by their first occurrence reading left to right,
+        which keeps related symbols together. 'sorted' orders them by name.
+    :returns: List of symbol names.
+    """
+    if method == 'occurrence':
+        return symbol_order(*eqs)
+    elif method == 'sorted':
+        names = set()
+        for eq in eqs:
+            if isinstance(eq, Equation):
+                names |= {x.symbol for x in eq.get_symbol_set()}
+        return sorted(names)
+    raise ValueError("Unknown variable order: " + repr(method))
+
+
+class BDD():
+    """
+    Manager of shared ROBDD nodes.
+
+    Node u has a variable level, a low child (variable false) and a high child, kept in
+    parallel lists. The unique table maps (level, low, high) to the node, so no two nodes are
+    equal, and the computed table caches ITE results. Nodes are kept alive by ref() and
+    otherwise freed by collect().
+    """
+    def __init__(self, order=None, gc_threshold=DEFAULT_GC_THRESHOLD, max_nodes=DEFAULT_MAX_NODES):
+        """
+        :param order: Initial list of symbol names, first is the root level. Symbols first seen
+            later are added below them.
+        :param gc_threshold: Live nodes above which build() collects unreferenced nodes first.
+        :param max_nodes: Live nodes above which NodeLimitError is raised.
+        """
+        self.gc_threshold = gc_threshold
+        self.max_nodes = max_nodes
+
+        self.variables = []
+        self.levels = {}
+        # Terminals sit below every variable.
+        self.level = [float('inf'), float('inf')]
+        self.low = [FALSE, TRUE]
+        self.high = [FALSE, TRUE]
+        self.unique = {}
+        self.computed = {}
+        self.refs = {}
+        self.free = []
+
+        self.live_count = 2
+        self.peak_live_count = 2
+        self.computed_hits = 0
+        self.computed_misses = 0
+        self.collections = 0
+        self.freed_count = 0
+
+        for name in order or ():
+            self.add_variable(name)
+
+    def add_variable(self, name):
+        """ Level of a symbol name, adding it below the existing variables if new. """
+        if name not in self.levels:
+            self.levels[name] = len(self.variables)
+            self.variables.append(name)
+        return self.levels[name]
+
+    def _node(self, level, low, high):
+        if low == high:
+            return low
+
+        key = (level, low, high)
+        u = self.unique.get(key)
+        if u is None:
+            if self.live_count >= self.max_nodes:
+                raise NodeLimitError("BDD has more than %d nodes." % self.max_nodes)
+
+            if self.free:
+                u = self.free.pop()
+                self.level[u] = level
+                self.low[u] = low
+                self.high[u] = high
+            else:
+                u = len(self.level)
+                self.level.append(level)
+                self.low.append(low)
+                self.high.append(high)
+
+            self.unique[key] = u
+            self.live_count += 1
+            self.peak_live_count = max(self.peak_live_count, self.live_count)
+        return u
+
+    def var(self, name):
+        """ Node of a single symbol. """
+        return self._node(self.add_variable(name), FALSE, TRUE)
+
+    def ite(self, f, g, h):
+        """
+        If-then-else: the node of (f and g) or (not f and h).
+        Iterative, so the stack depth does not grow with the variable count.
+        """
+        results = []
+        # Tasks are ('call', f, g, h) or ('make', key, level), the latter combining two results.
+        tasks = [('call', f, g, h)]
+        while tasks:
+            task = tasks.pop()
+            if task[0] == 'make':
+                high = results.pop()
+                low = results.pop()
+                u = self._node(task[2], low, high)
+                self.computed[task[1]] = u
+                results.append(u)
+                continue
+
+            _, f, g, h = task
+            if f == TRUE or g == h:
+                results.append(g)
+            elif f == FALSE:
+                results.append(h)
+            elif g == TRUE and h == FALSE:
+                results.append(f)
+            else:
+                key = (f, g, h)
+                u = self.computed.get(key)
+                if u is not None:
+                    self.computed_hits += 1
+                    results.append(u)
+                    continue
+                self.computed_misses += 1
+
+                top = min(self.level[f], self.level[g], self.level[h])
+                f0, f1 = self._cofactors(f, top)
+                g0, g1 = self._cofactors(g, top)
+                h0, h1 = self._cofactors(h, top)
+                tasks.append(('make', key, top))
+                tasks.append(('call', f1, g1, h1))
+                tasks.append(('call', f0, g0, h0))
+
+        return results[0]
+
+    def _cofactors(self, u, level):
+        if self.level[u] == level:
+            return self.low[u], self.high[u]
+        return u, u
+
+    def negate(self, u):
+        return self.ite(u, FALSE, TRUE)
+
+    def build(self, eq, stop=None):
+        """
+        Node of an equation. Interned subterms are built once.
+
+        :param eq: Equation or bool.
+        :param stop: Optional function of no arguments, called every STOP_INTERVAL subterms.
+            Building raises StoppedError once it returns True.
+        :returns: Node id. Call ref() on it to keep it across collections.
+        """
+        if self.live_count > self.gc_threshold:
+            self.collect()
+
+        nodes = {}
+        stack = [eq]
+        while stack:
+            term = stack[-1]
+            if term in nodes:
+                stack.pop()
+            elif isinstance(term, bool):
+                nodes[term] = TRUE if term else FALSE
+                stack.pop()
+            elif isinstance(term, SymbolEq):
+                nodes[term] = self.var(term.symbol)
+                stack.pop()
+            else:
+                pending = [x for x in term._arg_list if x not in nodes]
+                if pending:
+                    stack.extend(pending)
+                    continue
+
+                stack.pop()
+                if stop is not None and len(nodes) % STOP_INTERVAL == 0 and stop():
+                    raise StoppedError("BDD construction stopped.")
+                args = [nodes[x] for x in term._arg_list]
+                if isinstance(term, AndEq):
+                    nodes[term] = self.ite(args[0], args[1], FALSE)
+                elif isinstance(term, OrEq):
+                    nodes[term] = self.ite(args[0], TRUE, args[1])
+                elif isinstance(term, NotEq):
+                    nodes[term] = self.negate(args[0])
+                elif isinstance(term, ImpliesEq):
+                    nodes[term] = self.ite(args[0], args[1], TRUE)
+                elif isinstance(term, BiImpliesEq):
+                    nodes[term] = self.ite(args[0], args[1], self.negate(args[1]))
+
+        return nodes[eq]
+
+    def ref(self, u):
+        """ Keep a node and its descendants alive across collections. """
+        self.refs[u] = self.refs.get(u, 0) + 1
+        return u
+
+    def deref(self, u):
+        self.refs[u] -= 1
+        if not self.refs[u]:
+            del self.refs[u]
+
+    def collect(self):
+        """
+        Free every node not reachable from a referenced node, and clear the computed table.
+
+        :returns: Number of nodes freed.
+        """
+        marked = {FALSE, TRUE}
+        stack = list(self.refs)
+        while stack:
+            u = stack.pop()
+            if u not in marked:
+                marked.add(u)
+                stack.append(self.low[u])
+                stack.append(self.high[u])
+
+        dead = [u for u in self.unique.values() if u not in marked]
+        for u in dead:
+            del self.unique[(self.level[u], self.low[u], self.high[u])]
+            self.free.append(u)
+
+        self.computed.clear()
+        self.live_count -= len(dead)
+        self.freed_count += len(dead)
+        self.collections += 1
+        return len(dead)
+
+    def size(self, u):
+        """ Number of nodes reachable from u, terminals included. """
+        seen = set()
+        stack = [u]
+        while stack:
+            v = stack.pop()
+            if v not in seen:
+                seen.add(v)
+                if v > TRUE:
+                    stack.append(self.low[v])
+                    stack.append(self.high[v])
+        return len(seen)
+
+    def satisfying_assignment(self, u):
+        """
+        :returns: Dict of symbol name to value for the symbols on one path to TRUE, or None if u is FALSE.
+        """
+        if u == FALSE:
+            return None
+
+        assignment = {}
+        while u > TRUE:
+            name = self.variables[self.level[u]]
+            if self.high[u] != FALSE:
+                assignment[name] = True
+                u = self.high[u]
+            else:
+                assignment[name] = False
+                u = self.low[u]
+        return assignment
+
+    def normal_form(self, u):
+        """
+        String of the BDD below u that is equal for equal functions under the same variable order,
+        in any manager. Nodes are listed children first as 'symbol,low,high' with local numbering.
+        """
+        if u <= TRUE:
+            return 'T' if u == TRUE else 'F'
+
+        numbers = {FALSE: 'F', TRUE: 'T'}
+        entries = []
+        stack = [u]
+        while stack:
+            v = stack[-1]
+            if v in numbers:
+                stack.pop()
+                continue
+            pending = [x for x in (self.low[v], self.high[v]) if x not in numbers]
+            if pending:
+                stack.extend(pending)
+                continue
+
+            stack.pop()
+            numbers[v] = str(len(entries))
+            entries.append(self.variables[self.level[v]] + ',' + numbers[self.low[v]] + ',' + numbers[self.high[v]])
+        return ';'.join(entries)
+
+    def stats(self):
+        return {
+            'variables': len(self.variables),
+            'live_nodes': self.live_count,
+            'peak_live_nodes': self.peak_live_count,
+            'unique_size': len(self.unique),
+            'computed_size': len(self.computed),
+            'computed_hits': self.computed_hits,
+            'computed_misses': self.computed_misses,
+            'collections': self.collections,
+            'freed_nodes': self.freed_count,
+        }
+
+
+def normal_form(eq, order=None):
+    """
+    Canonical string of the function of an equation, equal for equivalent equations.
+    Usable as a cache or database key.
+
+    :param order: List of symbol names. Defaults to sorted names, which keeps the form independent of
+        how the equation is written.
+    """
+    manager = BDD(order or variable_order(eq, method='sorted'))
+    return manager.normal_form(manager.build(eq))
+
+def check_equivalence(eq1, eq2, order=None, max_nodes=DEFAULT_MAX_NODES, gc_threshold=DEFAULT_GC_THRESHOLD, stop=None):
+    """
+    Decide whether two equations are equivalent, for any number of symbols.
+
+    :param order: List of symbol names. Defaults to first-occurrence order.
+    :param gc_threshold: Live nodes above which a build collects unreferenced nodes, see BDD.
+    :param stop: Optional function of no arguments that stops building, see BDD.build.
+    :raises NotEquivalentError: With a counterexample, if they differ.
+    :raises NodeLimitError: If the BDDs grow past max_nodes.
+    """
+    manager = BDD(order or variable_order(eq1, eq2), gc_threshold=gc_threshold, max_nodes=max_nodes)
+    # Building eq2 may collect, which would free and reuse the nodes of eq1 unless it is referenced.
+    u = manager.ref(manager.build(eq1, stop))
+    v = manager.build(eq2, stop)
+    manager.deref(u)
+    if u != v:
+        difference = manager.ite(u, manager.negate(v), v)
+        counterexample = {x: False for x in variable_order(eq1, eq2, method='sorted')}
+        counterexample.update(manager.satisfying_assignment(difference))
+        raise NotEquivalentError(eq1, eq2, counterexample)
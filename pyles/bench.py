@@ -0,0 +1,413 @@
+"""
+Benchmarks on a seeded random workload.
+
+Run with python -m pyles.bench. A run can be written as a JSON baseline with --output
+and compared against one with --compare, which exits with status 1 on a regression.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+from .equation import AndEq, OrEq, NotEq, ImpliesEq, BiImpliesEq, SymbolEq
+from .database import Database, SetDatabase, SqliteDatabase, FingerprintDatabase
+from .identities import FUNC_LIST
+from .solve import get_depth, get_variations, get_all_variations, get_equation, search
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+DEFAULT_SEED = 0
+DEFAULT_FORMULA_COUNT = 20
+DEFAULT_SYMBOL_COUNT = 3
+DEFAULT_FORMULA_DEPTH = 3
+DEFAULT_REWRITE_STEPS = 4
+DEFAULT_NODE_BUDGET = 2000
+DEFAULT_TOLERANCE = 0.2
+# Micro benchmarks repeat until they have run this long, so their timings are not noise.
+MIN_BENCH_SECONDS = 0.2
+
+# Relative weight of each operator in random formulas.
+DEFAULT_OPERATORS = {
+    AndEq: 3,
+    OrEq: 3,
+    NotEq: 2,
+    ImpliesEq: 1,
+    BiImpliesEq: 1,
+}
+
+# Metric name suffixes whose values compare a run against a baseline.
+_HIGHER_IS_BETTER = ('_per_sec',)
+_LOWER_IS_BETTER = ('_seconds', '_bytes')
+
+
+def symbol_names(count):
+    """ Symbol names a, b, ..., z, then s26, s27, ... """
+    return [chr(ord('a') + i) if i < 26 else 's' + str(i) for i in range(count)]
+
+def random_equation(rng, symbol_count=DEFAULT_SYMBOL_COUNT, depth=DEFAULT_FORMULA_DEPTH, operators=None):
+    """
+    Random equation over the first symbol_count symbol names.
+
+    :param rng: random.Random instance.
+    :param depth: Operator nesting of the equation. Every path from the root has depth operators.
+    :param operators: Dict of operator class to relative weight. Defaults to DEFAULT_OPERATORS.
+    :returns: Equation.
+    """
+    operators = operators or DEFAULT_OPERATORS
+    classes = list(operators)
+    weights = [operators[x] for x in classes]
+    symbols = [SymbolEq(x) for x in symbol_names(symbol_count)]
+
+    def build(level):
+        if level == 0:
+            return rng.choice(symbols)
+
+        cls = rng.choices(classes, weights)[0]
+        if cls is NotEq:
+            return NotEq(build(level - 1))
+        return cls(build(level - 1), build(level - 1))
+
+    return build(depth)
+
+def random_rewrite(rng, eq, steps=DEFAULT_REWRITE_STEPS, max_depth=None):
+    """
+    Apply random identity rewrites to an equation, giving an equivalent one.
+
+    :param steps: Number of rewrites to apply. Fewer are applied if an equation has no variations.
+    :param max_depth: Max depth of the rewritten equations. Defaults to the depth of eq plus 2.
+    :returns: Equivalent Equation, or bool.
+    """
+    if max_depth is None:
+        max_depth = get_depth(eq) + 2
+
+    for _ in range(steps):
+        variation_list = get_all_variations(eq, max_depth)
+        if not variation_list:
+            break
+        eq = rng.choice(variation_list)[1]
+    return eq
+
+def make_workload(seed=DEFAULT_SEED, count=DEFAULT_FORMULA_COUNT, symbol_count=DEFAULT_SYMBOL_COUNT,
+                  depth=DEFAULT_FORMULA_DEPTH, operators=None, rewrite_steps=DEFAULT_REWRITE_STEPS):
+    """
+    Seeded list of random formulas, each paired with an equivalent formula.
+
+    :returns: List of (equation, equivalent equation) pairs. The same arguments always give the same pairs.
+    """
+    rng = random.Random(seed)
+    pairs = []
+    for _ in range(count):
+        eq = random_equation(rng, symbol_count, depth, operators)
+        pairs.append((eq, random_rewrite(rng, eq, rewrite_steps)))
+    return pairs
+
+
+class CountingDatabase(Database):
+    """ Wraps a database and counts how many lookups found an equation already tested. """
+    def __init__(self, database):
+        self.database = database
+        self.lookups = 0
+        self.hits = 0
+
+    def eq_exists(self, eq_string):
+        exists = self.database.eq_exists(eq_string)
+        self.lookups += 1
+        self.hits += exists
+        return exists
+
+    def exists_many(self, eq_strings):
+        exists = self.database.exists_many(eq_strings)
+        self.lookups += len(exists)
+        self.hits += sum(exists)
+        return exists
+
+    def add_eq(self, eq_string):
+        self.database.add_eq(eq_string)
+
+    def add_many(self, eq_strings):
+        self.database.add_many(eq_strings)
+
+    def get_test_count(self):
+        return self.database.get_test_count()
+
+    def new_search(self):
+        self.database.new_search()
+
+    def key(self, eq):
+        return self.database.key(eq)
+
+def peak_rss():
+    """ Peak resident memory of this process in bytes, or None where unavailable. """
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes elsewhere.
+    return usage if sys.platform == 'darwin' else usage * 1024
+
+def _rate(count, seconds):
+    return count / seconds if seconds > 0 else 0.0
+
+def _repeat(func):
+    """ Call func until MIN_BENCH_SECONDS have passed. Returns the call count and the seconds taken. """
+    rounds = 0
+    start = time.perf_counter()
+    while True:
+        func()
+        rounds += 1
+        seconds = time.perf_counter() - start
+        if seconds >= MIN_BENCH_SECONDS:
+            return rounds, seconds
+
+
+def bench_get_equation(pairs):
+    texts = [str(eq) for pair in pairs for eq in pair if not isinstance(eq, bool)]
+
+    def parse_all():
+        for text in texts:
+            get_equation(text)
+
+    rounds, seconds = _repeat(parse_all)
+    return {'formulas': len(texts), 'total_seconds': seconds / rounds, 'formulas_per_sec': _rate(rounds * len(texts), seconds)}
+
+def bench_get_variations(pairs):
+    eqs = [(eq, get_depth(eq) + 2) for eq, _ in pairs]
+
+    def each_function():
+        return sum(len(get_variations(func, eq, max_depth)) for eq, max_depth in eqs for func in FUNC_LIST)
+
+    def all_functions():
+        return sum(len(get_all_variations(eq, max_depth)) for eq, max_depth in eqs)
+
+    count = each_function()
+    rounds, seconds = _repeat(each_function)
+    rounds_all, seconds_all = _repeat(all_functions)
+
+    return {
+        'variations': count,
+        'total_seconds': seconds / rounds,
+        'variations_per_sec': _rate(rounds * count, seconds),
+        'all_variations_seconds': seconds_all / rounds_all,
+        'all_variations_per_sec': _rate(rounds_all * count, seconds_all),
+    }
+
+def _bench_search(pairs, simplify, node_budget, strategy):
+    searches = 0
+    skipped = 0
+    expanded = 0
+    lookups = 0
+    hits = 0
+    finished = 0
+    reduction = 0
+    proof_times = []
+
+    start = time.perf_counter()
+    for eq, dest_eq in pairs:
+        if simplify:
+            dest_eq = None
+        elif isinstance(eq, bool) or dest_eq is eq:
+            # Nothing to prove; counting it would dilute the per-search numbers.
+            skipped += 1
+            continue
+
+        searches += 1
+        database = CountingDatabase(SetDatabase())
+        for event in search(eq, dest_eq, database=database, simplify=simplify, max_depth=get_depth(eq) + 2,
+                            strategy=strategy, use_cache=False, node_budget=node_budget):
+            pass
+
+        expanded += event.expanded
+        lookups += database.lookups
+        hits += database.hits
+        if event.status in ('found', 'exhausted', 'max_tests'):
+            finished += 1
+        if event.status == 'found' and not simplify:
+            proof_times.append(event.elapsed)
+        if simplify:
+            reduction += get_depth(eq) - get_depth(event.result.eq)
+    seconds = time.perf_counter() - start
+
+    result = {
+        'searches': searches,
+        'skipped': skipped,
+        'finished': finished,
+        'nodes_expanded': expanded,
+        'total_seconds': seconds,
+        'nodes_per_sec': _rate(expanded, seconds),
+        'dedup_hit_rate': hits / lookups if lookups else 0.0,
+    }
+    if simplify:
+        result['depth_reduction'] = reduction
+    elif proof_times:
+        result['mean_time_to_proof_seconds'] = sum(proof_times) / len(proof_times)
+        result['max_time_to_proof_seconds'] = max(proof_times)
+    return result
+
+def bench_prove(pairs, node_budget=DEFAULT_NODE_BUDGET, strategy='bfs'):
+    return _bench_search(pairs, False, node_budget, strategy)
+
+def bench_simplify(pairs, node_budget=DEFAULT_NODE_BUDGET, strategy='bfs'):
+    return _bench_search(pairs, True, node_budget, strategy)
+
+def visited_bytes(database):
+    """ Bytes a database holds for its tested equations, or None where unknown, e.g. for SQLite. """
+    if isinstance(database, FingerprintDatabase):
+        return database.memory_usage()
+    if isinstance(database, SetDatabase):
+        return sys.getsizeof(database.tested_eqs) + sum(sys.getsizeof(x) for x in database.tested_eqs)
+    return None
+
+def bench_database(database, pairs):
+    """
+    Adds the equations two rewrites away from each formula to a database, then looks each one up twice.
+    Equations are given as the database's own keys, built before timing starts.
+    """
+    strings = []
+    for eq, _ in pairs:
+        max_depth = get_depth(eq) + 2
+        for _, var in get_all_variations(eq, max_depth):
+            strings.extend(database.key(x) for _, x in get_all_variations(var, max_depth))
+
+    start = time.perf_counter()
+    for x in strings:
+        if not database.eq_exists(x):
+            database.add_eq(x)
+    database.flush()
+    add_seconds = time.perf_counter() - start
+    memory = visited_bytes(database)
+
+    start = time.perf_counter()
+    found = sum(database.exists_many(strings)) + sum(database.eq_exists(x) for x in strings)
+    lookup_seconds = time.perf_counter() - start
+    database.close()
+
+    return {
+        'equations': len(strings),
+        'unique_equations': len(set(strings)),
+        'found': found,
+        'add_seconds': add_seconds,
+        'adds_per_sec': _rate(len(strings), add_seconds),
+        'lookup_seconds': lookup_seconds,
+        'lookups_per_sec': _rate(2 * len(strings), lookup_seconds),
+        'visited_bytes': memory,
+    }
+
+
+def run(seed=DEFAULT_SEED, count=DEFAULT_FORMULA_COUNT, symbol_count=DEFAULT_SYMBOL_COUNT, depth=DEFAULT_FORMULA_DEPTH,
+        operators=None, rewrite_steps=DEFAULT_REWRITE_STEPS, node_budget=DEFAULT_NODE_BUDGET, strategy='bfs'):
+    """
+    Run every benchmark on one workload.
+
+    :returns: Report dict with the workload parameters and a dict of results per benchmark.
+    """
+    pairs = make_workload(seed, count, symbol_count, depth, operators, rewrite_steps)
+
+    results = {
+        'get_equation': bench_get_equation(pairs),
+        'get_variations': bench_get_variations(pairs),
+        'prove': bench_prove(pairs, node_budget, strategy),
+        'simplify': bench_simplify(pairs, node_budget, strategy),
+        'database_set': bench_database(SetDatabase(), pairs),
+        'database_sqlite_memory': bench_database(SqliteDatabase(), pairs),
+        'database_fingerprint': bench_database(FingerprintDatabase(), pairs),
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        results['database_sqlite_file'] = bench_database(SqliteDatabase(os.path.join(directory, 'bench.db')), pairs)
+    results['process'] = {'peak_rss_bytes': peak_rss()}
+
+    return {
+        'params': {
+            'seed': seed,
+            'count': count,
+            'symbol_count': symbol_count,
+            'depth': depth,
+            'operators': {cls.__name__: weight for cls, weight in (operators or DEFAULT_OPERATORS).items()},
+            'rewrite_steps': rewrite_steps,
+            'node_budget': node_budget,
+            'strategy': strategy,
+        },
+        'results': results,
+    }
+
+def compare(report, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Compare a report against a baseline report.
+    Metrics ending in _per_sec should not fall, and metrics ending in _seconds or _bytes should not rise,
+    by more than tolerance, a fraction of the baseline value. Counts are not compared.
+
+    :returns: List of (benchmark, metric, baseline value, current value) regressions.
+    """
+    regressions = []
+    for name, metrics in sorted(baseline['results'].items()):
+        current = report['results'].get(name, {})
+        for metric, old in sorted(metrics.items()):
+            new = current.get(metric)
+            if old is None or new is None:
+                continue
+
+            if metric.endswith(_HIGHER_IS_BETTER) and new < old * (1 - tolerance):
+                regressions.append((name, metric, old, new))
+            elif metric.endswith(_LOWER_IS_BETTER) and new > old * (1 + tolerance):
+                regressions.append((name, metric, old, new))
+    return regressions
+
+def format_report(report):
+    lines = []
+    for name, metrics in sorted(report['results'].items()):
+        lines.append(name)
+        for metric, value in sorted(metrics.items()):
+            lines.append('    %-28s %s' % (metric, '%.6g' % value if isinstance(value, float) else value))
+    return '\n'.join(lines)
+
+def _parse_operators(text):
+    classes = {cls.__name__: cls for cls in DEFAULT_OPERATORS}
+    operators = {}
+    for item in text.split(','):
+        name, _, weight = item.partition('=')
+        operators[classes[name.strip()]] = float(weight)
+    return operators
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m pyles.bench', description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--count', type=int, default=DEFAULT_FORMULA_COUNT, help='Number of formulas.')
+    parser.add_argument('--symbols', type=int, default=DEFAULT_SYMBOL_COUNT, help='Symbols per formula.')
+    parser.add_argument('--depth', type=int, default=DEFAULT_FORMULA_DEPTH, help='Operator nesting of each formula.')
+    parser.add_argument('--operators', type=_parse_operators, default=None,
+                        help='Operator weights, e.g. AndEq=3,OrEq=3,NotEq=1.')
+    parser.add_argument('--rewrite-steps', type=int, default=DEFAULT_REWRITE_STEPS,
+                        help='Random rewrites between the formulas of an equivalent pair.')
+    parser.add_argument('--node-budget', type=int, default=DEFAULT_NODE_BUDGET, help='Expansions per search.')
+    parser.add_argument('--strategy', default='bfs')
+    parser.add_argument('--output', help='Write the report to this JSON file.')
+    parser.add_argument('--compare', help='Compare the run against this JSON baseline.')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    report = run(args.seed, args.count, args.symbols, args.depth, args.operators, args.rewrite_steps, args.node_budget,
+                 args.strategy)
+    print(format_report(report))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline['params'] != report['params']:
+            print('Warning: baseline workload parameters differ.')
+
+        regressions = compare(report, baseline, args.tolerance)
+        for name, metric, old, new in regressions:
+            print('REGRESSION %s.%s: %.6g -> %.6g' % (name, metric, old, new))
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
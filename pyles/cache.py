@@ -0,0 +1,118 @@
+import collections
+import threading
+
+from .equation import Equation, SymbolEq
+
+DEFAULT_CACHE_SIZE = 1024
+# Subterm results of bottom-up simplify, see pyles.solve.simplify.
+DEFAULT_SUBTERM_CACHE_SIZE = 1 << 14
+
+
+def rename_symbols(eq, mapping):
+    """
+    Replace symbols of an equation.
+
+    :param eq: Equation or bool.
+    :param mapping: Dict of symbol name to new symbol name. Missing symbols are kept.
+    :returns: The renamed Equation, sharing every subtree without a renamed symbol.
+    """
+    if not isinstance(eq, Equation):
+        return eq
+
+    renamed = {}
+    stack = [eq]
+    while stack:
+        node = stack[-1]
+        if node in renamed:
+            stack.pop()
+        elif isinstance(node, SymbolEq):
+            renamed[node] = SymbolEq(mapping.get(node.symbol, node.symbol))
+            stack.pop()
+        elif not isinstance(node, Equation):
+            renamed[node] = node
+            stack.pop()
+        else:
+            pending = [x for x in node._arg_list if x not in renamed]
+            if pending:
+                stack.extend(pending)
+            else:
+                stack.pop()
+                renamed[node] = type(node)(*(renamed[x] for x in node._arg_list))
+
+    return renamed[eq]
+
+def symbol_order(*eqs):
+    """ Symbol names of the equations in first-occurrence order, reading left to right. """
+    order = {}
+    for eq in eqs:
+        stack = [eq]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, SymbolEq):
+                order.setdefault(node.symbol, len(order))
+            elif isinstance(node, Equation):
+                stack.extend(reversed(node._arg_list))
+    return list(order)
+
+def canonicalize(*eqs):
+    """
+    Rename the symbols of equations to x0, x1, ... in first-occurrence order, so equations
+    that are equal up to symbol names have equal canonical forms.
+
+    :returns: Tuple of the list of canonical equations and the dict of original to canonical names.
+    """
+    mapping = {symbol: 'x' + str(i) for i, symbol in enumerate(symbol_order(*eqs))}
+    return [rename_symbols(eq, mapping) for eq in eqs], mapping
+
+
+class ResultCache():
+    """
+    Bounded LRU cache of finished search results, keyed on canonical equations.
+    Results are stored as (equation, description) chains in canonical symbol names.
+    """
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self):
+        return {
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+
+RESULT_CACHE = ResultCache()
+SUBTERM_CACHE = ResultCache(DEFAULT_SUBTERM_CACHE_SIZE)
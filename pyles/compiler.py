@@ -0,0 +1,179 @@
+"""
+Compile equations into Python functions.
+
+compile gives a function of one bool per symbol, e.g. lambda a, b, c: (a and not b) or c.
+compile_batch gives a function that evaluates many assignments in one call with NumPy.
+"""
+import builtins
+import keyword
+
+import numpy as np
+
+from .equation import Equation, AndEq, OrEq, NotEq, ImpliesEq, BiImpliesEq, SymbolEq
+from .cache import ResultCache
+
+# Subexpressions nested deeper than this are assigned to a local first, so generated
+# source stays within the limits of the Python compiler for any equation depth.
+MAX_NESTING = 32
+# Most symbols in one integer bitmask assignment.
+MAX_BITMASK_SYMBOLS = 64
+
+_SCALAR = {
+    AndEq: '({} and {})',
+    OrEq: '({} or {})',
+    NotEq: '(not {})',
+    ImpliesEq: '(not {} or {})',
+    BiImpliesEq: '({} == {})',
+}
+_BITWISE = {
+    AndEq: '({} & {})',
+    OrEq: '({} | {})',
+    NotEq: '(~{})',
+    ImpliesEq: '(~{} | {})',
+    BiImpliesEq: '(~({} ^ {}))',
+}
+# Constants of the bitwise form, where ~True would be -2.
+_BITWISE_CONSTANTS = {True: '_T', False: '_F'}
+
+COMPILE_CACHE = ResultCache()
+
+
+def _symbol_names(eq):
+    if isinstance(eq, Equation):
+        return sorted(x.symbol for x in eq.get_symbol_set())
+    return []
+
+def _argument_names(symbols):
+    """ Python identifiers for symbol names, keeping names that are already valid. """
+    names = []
+    for i, symbol in enumerate(symbols):
+        if symbol.isidentifier() and not keyword.iskeyword(symbol) and not symbol.startswith('_'):
+            names.append(symbol)
+        else:
+            names.append('_s' + str(i))
+    return names
+
+def generate_source(eq, symbols, bitwise=False, name='evaluate'):
+    """
+    Python source of a function of the symbols, in order, that evaluates eq.
+    Shared subterms are evaluated once.
+
+    :param symbols: List of symbol names, the function arguments.
+    :param bitwise: If true, use &, |, ^ and ~ so arguments can be NumPy bool arrays.
+    :returns: Source string defining the function name.
+    """
+    templates = _BITWISE if bitwise else _SCALAR
+    exprs = dict(zip((SymbolEq(x) for x in symbols), _argument_names(symbols)))
+
+    # Count references to find shared subterms.
+    counts = {}
+    stack = [eq]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, Equation) and not isinstance(node, SymbolEq):
+            counts[node] = counts.get(node, 0) + 1
+            if counts[node] == 1:
+                stack.extend(node._arg_list)
+
+    lines = []
+    nesting = {}
+    stack = [eq]
+    while stack:
+        node = stack[-1]
+        if node in exprs:
+            stack.pop()
+        elif isinstance(node, bool):
+            exprs[node] = _BITWISE_CONSTANTS[node] if bitwise else str(node)
+            nesting[node] = 0
+            stack.pop()
+        elif isinstance(node, SymbolEq):
+            raise ValueError("Symbol missing from the argument list: " + node.symbol)
+        else:
+            pending = [x for x in node._arg_list if x not in exprs]
+            if pending:
+                stack.extend(pending)
+                continue
+
+            stack.pop()
+            expr = templates[type(node)].format(*(exprs[x] for x in node._arg_list))
+            depth = 1 + max(nesting.get(x, 0) for x in node._arg_list)
+            if node is not eq and (counts[node] > 1 or depth > MAX_NESTING):
+                local = '_t' + str(len(lines))
+                lines.append('    ' + local + ' = ' + expr)
+                expr = local
+                depth = 0
+            exprs[node] = expr
+            nesting[node] = depth
+
+    lines.append('    return ' + exprs[eq])
+    return 'def ' + name + '(' + ', '.join(_argument_names(symbols)) + '):\n' + '\n'.join(lines) + '\n'
+
+def _build(source, namespace):
+    exec(builtins.compile(source, '<pyles.compiler>', 'exec'), namespace)
+    return namespace['evaluate']
+
+def compile(eq, symbols=None):
+    """
+    Compile an equation into a function of one bool per symbol.
+    Compiled functions are cached in COMPILE_CACHE by equation and symbol order.
+
+    :param eq: Equation or bool.
+    :param symbols: List of symbol names giving the argument order. Defaults to the sorted symbol names of eq.
+    :returns: Function with symbols and source attributes.
+    """
+    symbols = tuple(_symbol_names(eq) if symbols is None else symbols)
+    key = ('scalar', eq, symbols)
+    func = COMPILE_CACHE.get(key)
+    if func is None:
+        source = generate_source(eq, symbols)
+        func = _build(source, {})
+        func.symbols = symbols
+        func.source = source
+        COMPILE_CACHE.put(key, func)
+    return func
+
+def compile_batch(eq, symbols=None):
+    """
+    Compile an equation into a function that evaluates many assignments at once.
+    Compiled functions are cached in COMPILE_CACHE by equation and symbol order.
+
+    The function takes either a 2D array-like of shape (assignment count, symbol count), or a
+    1D array-like of integers where bit i of each integer is the value of symbol i, e.g.
+    numpy.arange(1 << len(symbols)) for every assignment. It returns a NumPy bool array with
+    one value per assignment.
+
+    :param eq: Equation or bool.
+    :param symbols: List of symbol names giving the column or bit order. Defaults to the sorted symbol names of eq.
+    :returns: Function with symbols and source attributes.
+    """
+    symbols = tuple(_symbol_names(eq) if symbols is None else symbols)
+    key = ('batch', eq, symbols)
+    evaluate_batch = COMPILE_CACHE.get(key)
+    if evaluate_batch is not None:
+        return evaluate_batch
+
+    source = generate_source(eq, symbols, bitwise=True)
+    func = _build(source, {'_T': np.True_, '_F': np.False_})
+    symbol_count = len(symbols)
+
+    def evaluate_batch(assignments):
+        assignments = np.asarray(assignments)
+        if assignments.ndim == 2:
+            if assignments.shape[1] != symbol_count:
+                raise ValueError("Expected %d columns, got %d." % (symbol_count, assignments.shape[1]))
+            columns = [assignments[:, i].astype(bool) for i in range(symbol_count)]
+        elif assignments.ndim == 1:
+            if symbol_count > MAX_BITMASK_SYMBOLS:
+                raise ValueError("Bitmask assignments hold at most %d symbols." % MAX_BITMASK_SYMBOLS)
+            values = assignments.astype(np.uint64)
+            columns = [((values >> np.uint64(i)) & np.uint64(1)).astype(bool) for i in range(symbol_count)]
+        else:
+            raise ValueError("Assignments must be a 1D bitmask or a 2D bool array.")
+
+        # Constant equations give a scalar.
+        return np.broadcast_to(func(*columns), (len(assignments),)).copy()
+
+    evaluate_batch.symbols = symbols
+    evaluate_batch.source = source
+    COMPILE_CACHE.put(key, evaluate_batch)
+    return evaluate_batch
@@ -1,5 +1,22 @@
 import sqlite3
 import abc
+import json
+import math
+from array import array
+
+from .equation import Equation, fingerprint, _digest
+
+DEFAULT_BATCH_SIZE = 10000
+# Initial slots of a FingerprintDatabase table, rounded up to a power of two.
+DEFAULT_CAPACITY = 1 << 16
+# Fraction of used slots above which a FingerprintDatabase table doubles.
+MAX_LOAD = 0.5
+# Bloom filter size and hash count of an approximate FingerprintDatabase: 16 MiB, under a
+# 1% false positive rate up to about 14 million equations.
+DEFAULT_BLOOM_BITS = 1 << 27
+DEFAULT_BLOOM_HASHES = 7
+
+_MASK64 = (1 << 64) - 1
 
 class Database():
     @abc.abstractmethod
@@ -14,26 +31,145 @@ class Database():
     def get_test_count(self):
         raise NotImplementedError()
 
+    def key(self, eq):
+        """ What searches pass to the other methods for an equation: its string. """
+        return str(eq)
+
+    def exists_many(self, eq_strings):
+        """ List of booleans, whether each equation string has been tested. """
+        return [self.eq_exists(x) for x in eq_strings]
+
+    def add_many(self, eq_strings):
+        for x in eq_strings:
+            self.add_eq(x)
+
+    def new_search(self):
+        """
+        Forget the equations tested so far. Called by every search before it starts, so one database
+        serves several searches; finished proofs are kept.
+        """
+        pass
+
+    def get_proof(self, start, dest):
+        """
+        Look up a finished proof.
+
+        :returns: List of (equation string, description) pairs from start to dest, or None.
+        """
+        return None
+
+    def add_proof(self, start, dest, chain):
+        """ Store a finished proof. Databases without a proof store ignore it. """
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
 class SqliteDatabase(Database):
-    def __init__(self):
-        self.conn = sqlite3.connect(':memory:')
+    """
+    Database kept in an SQLite file, or in memory by default.
+
+    Tested equations are buffered and written with executemany every batch_size
+    equations. They are the visited set of the current search and are cleared when the next
+    one starts. Finished proofs are kept in a second table that persists between runs.
+    """
+    def __init__(self, path=':memory:', batch_size=DEFAULT_BATCH_SIZE, clear_tested=True):
+        """
+        :param path: Database file path.
+        :param batch_size: Number of tested equations buffered before they are written.
+        :param clear_tested: If true, forget the equations tested by earlier runs now rather than when the
+            next search starts. Proofs are always kept.
+        """
+        self.conn = sqlite3.connect(path)
         self.c = self.conn.cursor()
+        self.batch_size = batch_size
+        self.pending = []
+        self.pending_set = set()
 
-        self.c.execute('''CREATE TABLE tested_eqs (eq_string)''')
+        self.c.execute('PRAGMA journal_mode=WAL')
+        self.c.execute('PRAGMA synchronous=NORMAL')
+        self.c.execute('''CREATE TABLE IF NOT EXISTS tested_eqs (eq_string TEXT PRIMARY KEY) WITHOUT ROWID''')
+        self.c.execute('''CREATE TABLE IF NOT EXISTS proofs (start TEXT, dest TEXT, chain TEXT, PRIMARY KEY (start, dest))''')
+        if clear_tested:
+            self.c.execute('DELETE FROM tested_eqs')
 
         self.conn.commit()
+        # Rows of tested_eqs, kept up to date by flush, so counting needs no query.
+        self.c.execute("SELECT COUNT(*) FROM tested_eqs")
+        self.count = self.c.fetchone()[0]
 
     def eq_exists(self, eq_string):
-        self.c.execute("SELECT eq_string FROM tested_eqs WHERE eq_string=?", (eq_string,))
-        return self.c.rowcount > 0
+        if eq_string in self.pending_set:
+            return True
+        self.c.execute("SELECT 1 FROM tested_eqs WHERE eq_string=?", (eq_string,))
+        return self.c.fetchone() is not None
 
     def add_eq(self, eq_string):
-        self.c.execute("INSERT INTO tested_eqs VALUES (?)", (eq_string,))
-        self.conn.commit()
+        if eq_string not in self.pending_set:
+            self.pending.append(eq_string)
+            self.pending_set.add(eq_string)
+
+            if len(self.pending) >= self.batch_size:
+                self.flush()
+
+    def exists_many(self, eq_strings):
+        eq_strings = list(eq_strings)
+        found = set(x for x in eq_strings if x in self.pending_set)
+
+        # Stay below SQLite's limit on bound parameters.
+        lookup = [x for x in eq_strings if x not in found]
+        for i in range(0, len(lookup), 500):
+            chunk = lookup[i:i + 500]
+            self.c.execute("SELECT eq_string FROM tested_eqs WHERE eq_string IN (%s)" % ','.join('?' * len(chunk)), chunk)
+            found.update(row[0] for row in self.c.fetchall())
+
+        return [x in found for x in eq_strings]
+
+    def add_many(self, eq_strings):
+        for x in eq_strings:
+            if x not in self.pending_set:
+                self.pending.append(x)
+                self.pending_set.add(x)
+
+        if len(self.pending) >= self.batch_size:
+            self.flush()
 
     def get_test_count(self):
-        self.c.execute("SELECT 1 FROM tested_eqs")
-        return self.c.rowcount
+        return self.count + len(self.pending)
+
+    def new_search(self):
+        self.pending = []
+        self.pending_set = set()
+        self.c.execute('DELETE FROM tested_eqs')
+        self.conn.commit()
+        self.count = 0
+
+    def get_proof(self, start, dest):
+        self.c.execute("SELECT chain FROM proofs WHERE start=? AND dest=?", (start, dest))
+        row = self.c.fetchone()
+        if row:
+            return [tuple(x) for x in json.loads(row[0])]
+
+    def add_proof(self, start, dest, chain):
+        self.flush()
+        self.c.execute("INSERT OR REPLACE INTO proofs VALUES (?, ?, ?)", (start, dest, json.dumps(list(chain))))
+        self.conn.commit()
+
+    def flush(self):
+        if self.pending:
+            changes = self.conn.total_changes
+            self.c.executemany("INSERT OR IGNORE INTO tested_eqs VALUES (?)", ((x,) for x in self.pending))
+            self.count += self.conn.total_changes - changes
+            self.pending = []
+            self.pending_set = set()
+        self.conn.commit()
+
+    def close(self):
+        self.flush()
+        self.conn.close()
 
 class SetDatabase(Database):
     def __init__(self):
@@ -45,5 +181,207 @@ class SetDatabase(Database):
     def add_eq(self, eq_string):
         self.tested_eqs.add(eq_string)
 
+    def exists_many(self, eq_strings):
+        return [x in self.tested_eqs for x in eq_strings]
+
+    def add_many(self, eq_strings):
+        self.tested_eqs.update(eq_strings)
+
+    def get_test_count(self):
+        return len(self.tested_eqs)
+
+    def new_search(self):
+        self.tested_eqs = set()
+
+class FingerprintDatabase(Database):
+    """
+    Visited set of 64 or 128-bit structural fingerprints, see pyles.equation.fingerprint,
+    in place of equation strings.
+
+    Fingerprints are kept in array-backed open-addressing tables with linear probing, 8 or 16
+    bytes a slot with at least half the slots free. Searches pass the fingerprint from key, so
+    no equation string is built. Equations with equal fingerprints count as one; with 64 bits
+    the first such collision is expected after about 4 billion equations.
+
+    With approximate=True only a Bloom filter is kept instead. Its memory is fixed, but it reports
+    an untested equation as tested with probability false_positive_rate(), so a search may skip it.
+
+    Equation strings are accepted too, hashed as strings, so give a database either equations or
+    strings, not both.
+    """
+    def __init__(self, bits=64, capacity=DEFAULT_CAPACITY, approximate=False, bloom_bits=DEFAULT_BLOOM_BITS,
+                 bloom_hashes=DEFAULT_BLOOM_HASHES):
+        """
+        :param bits: 64 or 128 bits stored per equation.
+        :param capacity: Initial number of slots. The table doubles as it fills.
+        :param approximate: If true, keep a Bloom filter of bloom_bits bits and bloom_hashes hashes instead.
+        """
+        if bits not in (64, 128):
+            raise ValueError("Fingerprints have 64 or 128 bits.")
+        self.bits = bits
+        self.approximate = approximate
+        self.count = 0
+        self.lookups = 0
+        self.probes = 0
+        self.max_probe = 0
+        self.resizes = 0
+
+        if approximate:
+            self.bloom_bits = bloom_bits
+            self.bloom_hashes = bloom_hashes
+            self.bloom = bytearray((bloom_bits + 7) // 8)
+        else:
+            self._allocate(1 << max(capacity - 1, 1).bit_length())
+
+    def _allocate(self, slots):
+        self.mask = slots - 1
+        self.low = array('Q', bytes(8 * slots))
+        # Upper halves of 128-bit fingerprints, in a parallel table.
+        self.high = array('Q', bytes(8 * slots)) if self.bits == 128 else None
+
+    def key(self, eq):
+        return fingerprint(eq)
+
+    def _fingerprint(self, item):
+        if isinstance(item, str):
+            return _digest(b'str:' + item.encode())
+        if isinstance(item, (Equation, bool)):
+            return fingerprint(item)
+        return item
+
+    def _split(self, fp):
+        """ Slot values of a fingerprint; all zero marks a free slot, so a zero fingerprint is stored as 1. """
+        low = fp & _MASK64
+        high = (fp >> 64) & _MASK64 if self.high is not None else 0
+        if not low and not high:
+            low = 1
+        return low, high
+
+    def _find(self, low, high):
+        """ :returns: Tuple of the slot holding the fingerprint or the free slot where it belongs, and whether it was found. """
+        table = self.low
+        highs = self.high
+        mask = self.mask
+        start = i = low & mask
+        while True:
+            value = table[i]
+            if value == low and (highs is None or highs[i] == high):
+                found = True
+                break
+            if not value and (highs is None or not highs[i]):
+                found = False
+                break
+            i = (i + 1) & mask
+
+        probes = (i - start) & mask
+        self.lookups += 1
+        self.probes += probes
+        if probes > self.max_probe:
+            self.max_probe = probes
+        return i, found
+
+    def _bloom_positions(self, fp):
+        # Double hashing from the two halves of the 128-bit fingerprint.
+        h1 = fp & _MASK64
+        h2 = (fp >> 64) | 1
+        return [(h1 + i * h2) % self.bloom_bits for i in range(self.bloom_hashes)]
+
+    def eq_exists(self, eq_string):
+        fp = self._fingerprint(eq_string)
+        if self.approximate:
+            self.lookups += 1
+            return all(self.bloom[x >> 3] & (1 << (x & 7)) for x in self._bloom_positions(fp))
+        return self._find(*self._split(fp))[1]
+
+    def add_eq(self, eq_string):
+        fp = self._fingerprint(eq_string)
+        if self.approximate:
+            positions = self._bloom_positions(fp)
+            if not all(self.bloom[x >> 3] & (1 << (x & 7)) for x in positions):
+                for x in positions:
+                    self.bloom[x >> 3] |= 1 << (x & 7)
+                self.count += 1
+            return
+
+        low, high = self._split(fp)
+        i, found = self._find(low, high)
+        if found:
+            return
+        self.low[i] = low
+        if self.high is not None:
+            self.high[i] = high
+        self.count += 1
+
+        if self.count > MAX_LOAD * (self.mask + 1):
+            self._grow()
+
+    def _grow(self):
+        old_low, old_high = self.low, self.high
+        self._allocate(2 * (self.mask + 1))
+        self.resizes += 1
+        for j, low in enumerate(old_low):
+            high = old_high[j] if old_high is not None else 0
+            if low or high:
+                i = low & self.mask
+                while self.low[i] or (self.high is not None and self.high[i]):
+                    i = (i + 1) & self.mask
+                self.low[i] = low
+                if self.high is not None:
+                    self.high[i] = high
+
+    def exists_many(self, eq_strings):
+        return [self.eq_exists(x) for x in eq_strings]
+
+    def add_many(self, eq_strings):
+        for x in eq_strings:
+            self.add_eq(x)
+
     def get_test_count(self):
-        return len(self.tested_eqs)
\ No newline at end of file
+        return self.count
+
+    def new_search(self):
+        # The statistics describe one search, so they restart with the table.
+        self.count = 0
+        self.lookups = 0
+        self.probes = 0
+        self.max_probe = 0
+        self.resizes = 0
+        if self.approximate:
+            self.bloom = bytearray(len(self.bloom))
+        else:
+            self._allocate(self.mask + 1)
+
+    def memory_usage(self):
+        """ Bytes of the table or Bloom filter. """
+        if self.approximate:
+            return len(self.bloom)
+        return (self.mask + 1) * (8 if self.high is None else 16)
+
+    def false_positive_rate(self):
+        """ Estimated chance that an untested equation is reported tested. 0 unless approximate. """
+        if not self.approximate:
+            return 0.0
+        return (1 - math.exp(-self.bloom_hashes * self.count / self.bloom_bits)) ** self.bloom_hashes
+
+    def stats(self):
+        stats = {
+            'entries': self.count,
+            'bits': self.bits,
+            'approximate': self.approximate,
+            'bytes': self.memory_usage(),
+            'bytes_per_entry': self.memory_usage() / self.count if self.count else 0.0,
+            'lookups': self.lookups,
+        }
+        if self.approximate:
+            stats['bloom_bits'] = self.bloom_bits
+            stats['bloom_hashes'] = self.bloom_hashes
+            stats['false_positive_rate'] = self.false_positive_rate()
+        else:
+            stats['slots'] = self.mask + 1
+            stats['load_factor'] = self.count / (self.mask + 1)
+            # Probes past the first slot, each one a collision with another fingerprint.
+            stats['collisions'] = self.probes
+            stats['mean_probes'] = self.probes / self.lookups if self.lookups else 0.0
+            stats['max_probe'] = self.max_probe
+            stats['resizes'] = self.resizes
+        return stats
@@ -0,0 +1,331 @@
+"""
+E-graphs for equality saturation.
+
+An e-graph holds many equivalent equations at once: each e-class is a set of e-nodes, an
+operator over child e-classes, so a rewrite adds a few nodes to a class instead of copying the
+whole equation. Rules are applied to every class in rounds until nothing changes or a limit is
+hit; then the smallest equation of a class is extracted, or two equations are equivalent under
+the rules if they are in the same class. Commutativity and associativity, which multiply the
+equations a search visits, only add nodes to existing classes here.
+"""
+from .equation import Equation, SymbolEq
+from .identities import RULES
+
+# Limits of saturate(). Rounds slow down as classes grow; 2000 e-nodes take about a second.
+DEFAULT_MAX_NODES = 2000
+DEFAULT_MAX_ITERATIONS = 30
+# New matches of one rule in one round above which the rule is banned for BAN_LENGTH rounds.
+DEFAULT_MATCH_LIMIT = 1000
+BAN_LENGTH = 2
+
+
+def _is_expanding(rule):
+    """ Rules such as P = not (not P) match every class and never saturate. """
+    return isinstance(rule.lhs, SymbolEq)
+
+
+class EGraph():
+    """
+    E-classes are ids of a union-find. An e-node is a tuple: (operator class, child class ids...)
+    for operators, (SymbolEq, name) for symbols and (bool, value) for constants. The hash cons
+    maps every canonical e-node, whose children are class roots, to its class, so no two classes
+    hold equal nodes. Unions are repaired by rebuild(), which also merges classes of nodes that
+    became equal: congruence closure.
+    """
+    def __init__(self, rules=None):
+        """
+        :param rules: List of pyles.rules.Rule applied by step(). Defaults to every rule of the
+            FUNC_LIST identities except those whose left-hand side is a bare variable.
+        """
+        if rules is None:
+            rules = [x for x in RULES.rules if not _is_expanding(x)]
+        self.rules = rules
+
+        self.parents = []
+        self.nodes = {}
+        self.uses = {}
+        self.hashcons = {}
+        self.pending = []
+        # Keys of the matches already applied, see step().
+        self.applied = set()
+        self.match_limits = [DEFAULT_MATCH_LIMIT] * len(rules)
+        self.banned_until = [0] * len(rules)
+        self.iterations = 0
+        self.unions = 0
+
+    def __len__(self):
+        """ Number of e-nodes. """
+        return len(self.hashcons)
+
+    def class_count(self):
+        return len(self.nodes)
+
+    def find(self, a):
+        parents = self.parents
+        while parents[a] != a:
+            parents[a] = parents[parents[a]]
+            a = parents[a]
+        return a
+
+    def _canonical(self, node):
+        if node[0] is SymbolEq or node[0] is bool:
+            return node
+        return (node[0],) + tuple(self.find(x) for x in node[1:])
+
+    def add_node(self, node):
+        """ Class id of an e-node, adding it if new. """
+        node = self._canonical(node)
+        a = self.hashcons.get(node)
+        if a is not None:
+            return self.find(a)
+
+        a = len(self.parents)
+        self.parents.append(a)
+        self.nodes[a] = [node]
+        self.uses[a] = []
+        if node[0] is not SymbolEq and node[0] is not bool:
+            for child in node[1:]:
+                self.uses[child].append((node, a))
+        self.hashcons[node] = a
+        return a
+
+    def add(self, eq):
+        """
+        Add an equation, once per shared subterm.
+
+        :param eq: Equation or bool.
+        :returns: Class id.
+        """
+        ids = {}
+        stack = [eq]
+        while stack:
+            term = stack[-1]
+            if term in ids:
+                stack.pop()
+            elif isinstance(term, SymbolEq):
+                ids[term] = self.add_node((SymbolEq, term.symbol))
+                stack.pop()
+            elif not isinstance(term, Equation):
+                ids[term] = self.add_node((bool, term))
+                stack.pop()
+            else:
+                pending = [x for x in term._arg_list if x not in ids]
+                if pending:
+                    stack.extend(pending)
+                    continue
+                stack.pop()
+                ids[term] = self.add_node((type(term),) + tuple(ids[x] for x in term._arg_list))
+        return self.find(ids[eq])
+
+    def union(self, a, b):
+        """
+        Merge two classes. Call rebuild() before the next lookup.
+
+        :returns: True if they were different classes.
+        """
+        a = self.find(a)
+        b = self.find(b)
+        if a == b:
+            return False
+        if len(self.nodes[a]) < len(self.nodes[b]):
+            a, b = b, a
+
+        self.parents[b] = a
+        self.nodes[a].extend(self.nodes.pop(b))
+        self.uses[a].extend(self.uses.pop(b))
+        self.pending.append(a)
+        self.unions += 1
+        return True
+
+    def rebuild(self):
+        """ Restore the hash cons and congruence closure after unions. """
+        while self.pending:
+            todo = {self.find(x) for x in self.pending}
+            self.pending = []
+            for a in todo:
+                # Repairs merge classes, so a may no longer be a root.
+                self._repair(self.find(a))
+
+    def _repair(self, a):
+        uses = self.uses[a]
+        self.uses[a] = []
+        for node, _ in uses:
+            self.hashcons.pop(node, None)
+
+        # Parents that became equal nodes are congruent: their classes are merged.
+        repaired = {}
+        for node, b in uses:
+            node = self._canonical(node)
+            if node in repaired:
+                self.union(b, repaired[node])
+            repaired[node] = self.find(b)
+            self.hashcons[node] = repaired[node]
+
+        root = self.find(a)
+        self.uses[root].extend(repaired.items())
+        self.nodes[root] = list({self._canonical(x): None for x in self.nodes[root]})
+
+    def _match(self, pattern, a, bindings):
+        """ Generator of the extensions of bindings, pattern variable to class id, under which pattern matches class a. """
+        a = self.find(a)
+        if isinstance(pattern, SymbolEq):
+            bound = bindings.get(pattern.symbol)
+            if bound is None:
+                bindings = dict(bindings)
+                bindings[pattern.symbol] = a
+                yield bindings
+            elif self.find(bound) == a:
+                yield bindings
+            return
+        elif not isinstance(pattern, Equation):
+            constant = self.hashcons.get((bool, pattern))
+            if constant is not None and self.find(constant) == a:
+                yield bindings
+            return
+
+        op = type(pattern)
+        args = pattern._arg_list
+        for node in self.nodes[a]:
+            if node[0] is not op:
+                continue
+            if len(args) == 1:
+                yield from self._match(args[0], node[1], bindings)
+            else:
+                for partial in self._match(args[0], node[1], bindings):
+                    yield from self._match(args[1], node[2], partial)
+
+    def _instantiate(self, pattern, bindings):
+        if isinstance(pattern, SymbolEq):
+            return bindings[pattern.symbol]
+        elif not isinstance(pattern, Equation):
+            return self.add_node((bool, pattern))
+        return self.add_node((type(pattern),) + tuple(self._instantiate(x, bindings) for x in pattern._arg_list))
+
+    def step(self, max_nodes=None):
+        """
+        One round of equality saturation: match every rule against every class, then apply
+        the matches not applied in an earlier round, and rebuild.
+
+        A rule with more than its match limit of new matches in a round is banned for a few
+        rounds and its limit doubled, so rules such as associativity, whose matches multiply,
+        do not crowd out the rest.
+
+        :param max_nodes: Stop applying matches once the e-graph has more e-nodes.
+        :returns: False if nothing changed, i.e. the e-graph is saturated.
+        """
+        by_op = {}
+        for a, nodes in self.nodes.items():
+            for node in nodes:
+                by_op.setdefault(node[0], set()).add(a)
+
+        matches = []
+        banned = False
+        for rule_index, rule in enumerate(self.rules):
+            if self.banned_until[rule_index] > self.iterations:
+                banned = True
+                continue
+
+            rule_matches = []
+            limit = self.match_limits[rule_index]
+            op = type(rule.lhs) if isinstance(rule.lhs, Equation) else bool
+            for a in by_op.get(op, ()):
+                for bindings in self._match(rule.lhs, a, {}):
+                    # The bindings decide the rewrite, so a match seen with the same classes is done.
+                    key = (rule_index,) + tuple(self.find(x) for x in bindings.values())
+                    if key not in self.applied:
+                        rule_matches.append((key, rule, a, bindings))
+                if len(rule_matches) > limit:
+                    break
+
+            if len(rule_matches) > limit:
+                self.banned_until[rule_index] = self.iterations + 1 + BAN_LENGTH
+                self.match_limits[rule_index] *= 2
+                banned = True
+            else:
+                matches.extend(rule_matches)
+
+        size = len(self.hashcons)
+        changed = False
+        for key, rule, a, bindings in matches:
+            self.applied.add(key)
+            changed |= self.union(a, self._instantiate(rule.rhs, bindings))
+            if max_nodes is not None and len(self.hashcons) > max_nodes:
+                break
+        self.rebuild()
+        self.iterations += 1
+        # A round with banned rules is not saturation: they may still match.
+        return changed or banned or len(self.hashcons) != size
+
+    def saturate(self, max_nodes=DEFAULT_MAX_NODES, max_iterations=DEFAULT_MAX_ITERATIONS, goal=None):
+        """
+        Run step() until saturation or a limit.
+
+        :param goal: Optional pair of class ids; stop as soon as they are merged.
+        :returns: 'saturated', 'found' if goal was reached, 'node_limit' or 'iteration_limit'.
+        """
+        for _ in range(max_iterations):
+            if goal is not None and self.find(goal[0]) == self.find(goal[1]):
+                return 'found'
+            if not self.step(max_nodes):
+                return 'saturated'
+            if len(self.hashcons) > max_nodes:
+                return 'node_limit'
+        if goal is not None and self.find(goal[0]) == self.find(goal[1]):
+            return 'found'
+        return 'iteration_limit'
+
+    def extract(self, a, costs=None):
+        """
+        Smallest equation of a class. The cost of an equation is the sum of its operator costs,
+        plus one per symbol; constants cost nothing.
+
+        :param costs: Dict of Equation class to cost, e.g. pyles.heuristics.OPERATOR_COSTS.
+            Defaults to 1 for every operator, which is the node count.
+        :returns: Equation or bool.
+        """
+        best = {}
+        changed = True
+        while changed:
+            changed = False
+            for b, nodes in self.nodes.items():
+                for node in nodes:
+                    if node[0] is SymbolEq:
+                        cost = 1
+                    elif node[0] is bool:
+                        cost = 0
+                    else:
+                        children = [best.get(self.find(x)) for x in node[1:]]
+                        if None in children:
+                            continue
+                        cost = (1 if costs is None else costs[node[0]]) + sum(x[0] for x in children)
+                    if b not in best or cost < best[b][0]:
+                        best[b] = (cost, node)
+                        changed = True
+
+        # Costs grow from child to parent, so the chosen nodes form a tree.
+        built = {}
+        stack = [self.find(a)]
+        while stack:
+            b = stack[-1]
+            node = best[b][1]
+            if node[0] is SymbolEq:
+                built[b] = SymbolEq(node[1])
+            elif node[0] is bool:
+                built[b] = node[1]
+            else:
+                children = [self.find(x) for x in node[1:]]
+                pending = [x for x in children if x not in built]
+                if pending:
+                    stack.extend(pending)
+                    continue
+                built[b] = node[0](*(built[x] for x in children))
+            stack.pop()
+        return built[self.find(a)]
+
+    def stats(self):
+        return {
+            'nodes': len(self.hashcons),
+            'classes': len(self.nodes),
+            'iterations': self.iterations,
+            'unions': self.unions,
+        }
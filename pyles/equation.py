@@ -1,180 +1,371 @@
 import abc
+import hashlib
+import threading
+import weakref
+
+# Unique table of every live Equation node.
+# Nodes are hash-consed: constructing a node that is structurally equal to a
+# live one returns the existing object, so equality is an identity check and
+# subtrees are shared between every formula that contains them.
+_unique_table = weakref.WeakValueDictionary()
+# Guards inserts into the unique table, so threads that build the same node at once get one object.
+_unique_lock = threading.Lock()
+
+# Subterms with at most this many nodes keep their string once built. Larger ones are rebuilt
+# from their cached subterms, so long chains do not hold a quadratic amount of text.
+STRING_CACHE_NODES = 64
+# Equations with more nodes are pickled as a flat list, as pickle recurses once per level of
+# nested arguments. Smaller ones are pickled by argument, so the subtrees that a batch of
+# equations shares are written once.
+FLAT_PICKLE_NODES = 128
+
+
+def _digest(data):
+    """ 128-bit int hash of bytes, the same in every process and run. """
+    return int.from_bytes(hashlib.blake2b(data, digest_size=16).digest(), 'little')
+
+_CONSTANT_FINGERPRINTS = {True: _digest(b'True'), False: _digest(b'False')}
+
+def fingerprint(eq):
+    """ 128-bit structural hash of an Equation or bool, see Equation.fingerprint. """
+    if isinstance(eq, Equation):
+        return eq.fingerprint
+    return _CONSTANT_FINGERPRINTS[eq]
+
 
 class Equation():
-    def __init__(self):
-        self._arg_list = []
-        self.string = ""
-        self.hash = 0
+    """
+    Immutable, hash-consed formula node.
+
+    Nodes are built through the unique table, so hash, depth, string, symbol set
+    and fingerprint are computed at most once per node and reused afterwards.
+    """
+    __slots__ = ('_arg_list', '_hash', '_depth', '_string', '_symbols', '_fingerprint', '__weakref__')
+
+    @classmethod
+    def _intern(cls, key, arg_list):
+        node = _unique_table.get(key)
+        if node is not None:
+            return node
+        with _unique_lock:
+            node = _unique_table.get(key)
+            if node is None:
+                node = object.__new__(cls)
+                node._arg_list = arg_list
+                node._hash = hash(key)
+                node._depth = 1 + sum(x._depth for x in arg_list if isinstance(x, Equation))
+                node._string = None
+                node._symbols = None
+                node._fingerprint = None
+                _unique_table[key] = node
+        return node
 
     @property
     def arg1(self):
         return self._arg_list[0]
 
-    @arg1.setter
-    def arg1(self, value):
-        if len(self._arg_list) < 1:
-            self._arg_list.append(value)
-        else:
-            self._arg_list[0] = value
-
     @property
     def arg2(self):
         return self._arg_list[1]
 
-    @arg2.setter
-    def arg2(self, value):
-        if len(self._arg_list) < 2:
-            self._arg_list.append(value)
-        else:
-            self._arg_list[1] = value
+    @property
+    def depth(self):
+        """ Node count of the tree, computed at construction. """
+        return self._depth
+
+    @property
+    def fingerprint(self):
+        """
+        128-bit structural hash: a hash of the operator and the fingerprints of the arguments.
+        Unlike hash(), it is the same in every process and run. Computed once per node.
+        """
+        if self._fingerprint is None:
+            stack = [self]
+            while stack:
+                node = stack[-1]
+                pending = [x for x in node._arg_list if isinstance(x, Equation) and x._fingerprint is None]
+                if pending:
+                    stack.extend(pending)
+                    continue
+
+                stack.pop()
+                if node._fingerprint is None:
+                    data = [type(node).__name__.encode(), b':']
+                    data.extend(fingerprint(x).to_bytes(16, 'little') for x in node._arg_list)
+                    node._fingerprint = _digest(b''.join(data))
+        return self._fingerprint
 
-    @abc.abstractmethod
     def eval(self):
+        """ Value of the equation for the current symbol values. Iterative, so any depth evaluates. """
+        values = {}
+        stack = [self]
+        while stack:
+            node = stack[-1]
+            if node in values:
+                stack.pop()
+            elif not isinstance(node, Equation):
+                values[node] = node
+                stack.pop()
+            elif isinstance(node, SymbolEq):
+                values[node] = node.value
+                stack.pop()
+            else:
+                pending = [x for x in node._arg_list if x not in values]
+                if pending:
+                    stack.extend(pending)
+                else:
+                    stack.pop()
+                    values[node] = node._apply(*(values[x] for x in node._arg_list))
+        return values[self]
+
+    @abc.abstractmethod
+    def _apply(self, *args):
+        """ Value of this operator for the values of its arguments. """
         raise NotImplementedError
 
     @abc.abstractmethod
-    def sub_str(self):
+    def _parts(self):
+        """ Tuple of the strings and arguments that make up this node's text, in order. """
         raise NotImplementedError
-    
+
+    def sub_str(self):
+        """ String of the equation with each symbol replaced by its value. """
+        parts = []
+        stack = [self]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, str):
+                parts.append(item)
+            elif isinstance(item, SymbolEq):
+                parts.append(str(item.value))
+            elif isinstance(item, Equation):
+                stack.extend(reversed(item._parts()))
+            else:
+                parts.append(str(item))
+        return ''.join(parts)
+
     def set_symbol_value(self, symbol, value):
-        for x in self._arg_list:
-            if isinstance(x, SymbolEq):
-                if x.symbol == symbol:
-                    x.value = value
-                    return True
-            elif x.set_symbol_value(symbol, value):
-                return True
+        # Symbols are interned by name, so the unique table finds the node without a scan.
+        node = _unique_table.get(symbol)
+        if isinstance(node, SymbolEq) and node in self.get_symbol_set():
+            node.value = value
+            return True
 
     def get_symbol_set(self):
-        symbol_set = set()
-        for x in self._arg_list:
-            if isinstance(x, SymbolEq):
-                symbol_set.add(x)
-            else:
-                symbol_set |= x.get_symbol_set()
-        
-        return symbol_set
+        """ Frozenset of the SymbolEq nodes in the equation, cached on this node. """
+        if self._symbols is None:
+            symbol_set = set()
+            seen = set()
+            stack = [self]
+            while stack:
+                node = stack.pop()
+                if node._symbols is not None:
+                    symbol_set |= node._symbols
+                    continue
+                for x in node._arg_list:
+                    if isinstance(x, Equation) and x not in seen:
+                        seen.add(x)
+                        stack.append(x)
+            self._symbols = frozenset(symbol_set)
+
+        return self._symbols
+
+    def __repr__(self):
+        if self._string is None:
+            self._string = _build_string(self)
+        return self._string
+
+    def __hash__(self):
+        return self._hash
 
     def __eq__(self, other):
-        if isinstance(self, type(other)):
-            if isinstance(self, SymbolEq):
-                return self.symbol == other.symbol
-            else:
-                return self._arg_list == other._arg_list
-        else:
-            return False
+        # Structurally equal nodes are always the same object.
+        return self is other
 
+    def __reduce__(self):
+        if self._depth > FLAT_PICKLE_NODES:
+            return (_unflatten, (_flatten(self),))
+        return (type(self), self._arg_list)
 
-class AndEq(Equation):
-    def __init__(self, arg1, arg2):
-        super().__init__()
-        self.arg1 = arg1
-        self.arg2 = arg2
+    def __copy__(self):
+        return self
 
-    def eval(self):
-        return self.arg1.eval() and self.arg2.eval()
+    def __deepcopy__(self, memo):
+        return self
 
-    def __repr__(self):
-        return '(' + repr(self.arg1) + ' and ' + repr(self.arg2) + ')'
 
-    def sub_str(self):
-        return '(' + self.arg1.sub_str() + ' and ' + self.arg2.sub_str() + ')'
+class AndEq(Equation):
+    __slots__ = ()
 
-    def __hash__(self):
-        return hash(str(self))
+    def __new__(cls, arg1, arg2):
+        return cls._intern((cls.__name__, arg1, arg2), (arg1, arg2))
 
-class OrEq(Equation):
-    def __init__(self, arg1, arg2):
-        super().__init__()
-        self.arg1 = arg1
-        self.arg2 = arg2
+    def _apply(self, arg1, arg2):
+        return arg1 and arg2
 
-    def eval(self):
-        return self.arg1.eval() or self.arg2.eval()
+    def _parts(self):
+        return ('(', self.arg1, ' and ', self.arg2, ')')
 
-    def __repr__(self):
-        return '(' + repr(self.arg1) + ' or ' + repr(self.arg2) + ')'
+class OrEq(Equation):
+    __slots__ = ()
 
-    def sub_str(self):
-        return '(' + self.arg1.sub_str() + ' or ' + self.arg2.sub_str() + ')'
+    def __new__(cls, arg1, arg2):
+        return cls._intern((cls.__name__, arg1, arg2), (arg1, arg2))
 
-    def __hash__(self):
-        return hash(str(self))
+    def _apply(self, arg1, arg2):
+        return arg1 or arg2
+
+    def _parts(self):
+        return ('(', self.arg1, ' or ', self.arg2, ')')
 
 class ImpliesEq(Equation):
-    def __init__(self, arg1, arg2):
-        super().__init__()
-        self.arg1 = arg1
-        self.arg2 = arg2
+    __slots__ = ()
 
-    def eval(self):
-        if self.arg1.eval() and not self.arg2.eval():
+    def __new__(cls, arg1, arg2):
+        return cls._intern((cls.__name__, arg1, arg2), (arg1, arg2))
+
+    def _apply(self, arg1, arg2):
+        if arg1 and not arg2:
             return False
         else:
             return True
 
-    def __repr__(self):
-        return '(' + repr(self.arg1) + ' -> ' + repr(self.arg2) + ')'
-
-    def sub_str(self):
-        return '(' + self.arg1.sub_str() + ' -> ' + self.arg2.sub_str() + ')'
-    
-    def __hash__(self):
-        return hash(str(self))
+    def _parts(self):
+        return ('(', self.arg1, ' -> ', self.arg2, ')')
 
 class BiImpliesEq(Equation):
-    def __init__(self, arg1, arg2):
-        super().__init__()
-        self.arg1 = arg1
-        self.arg2 = arg2
+    __slots__ = ()
 
-    def eval(self):
-        if self.arg1.eval() == self.arg2.eval():
+    def __new__(cls, arg1, arg2):
+        return cls._intern((cls.__name__, arg1, arg2), (arg1, arg2))
+
+    def _apply(self, arg1, arg2):
+        if arg1 == arg2:
             return True
         else:
             return False
 
-    def __repr__(self):
-        return '(' + repr(self.arg1) + ' <-> ' + repr(self.arg2) + ')'
-
-    def sub_str(self):
-        return '(' + self.arg1.sub_str() + ' <-> ' + self.arg2.sub_str() + ')'
-
-    def __hash__(self):
-        return hash(str(self))
+    def _parts(self):
+        return ('(', self.arg1, ' <-> ', self.arg2, ')')
 
 class NotEq(Equation):
-    def __init__(self, arg):
-        super().__init__()
-        self.arg1 = arg
+    __slots__ = ()
 
-    def eval(self):
-        return not self.arg1.eval()
+    def __new__(cls, arg):
+        return cls._intern((cls.__name__, arg), (arg,))
 
-    def __repr__(self):
-        return '(not ' + repr(self.arg1) + ')'
+    def _apply(self, arg):
+        return not arg
 
-    def sub_str(self):
-        return '(not ' + self.arg1.sub_str() + ')'
-    
-    def __hash__(self):
-        return hash(str(self))
+    def _parts(self):
+        return ('(not ', self.arg1, ')')
 
 
 class SymbolEq(Equation):
-    def __init__(self, symbol, value=False):
-        super().__init__()
-        self.symbol = symbol
-        self.value = value
+    """
+    A named symbol. Symbols are interned by name, so every formula that uses
+    the symbol shares the same node and its value.
+    """
+    __slots__ = ('symbol', 'value')
+
+    def __new__(cls, symbol, value=None):
+        node = _unique_table.get(symbol)
+        if node is None:
+            with _unique_lock:
+                node = _unique_table.get(symbol)
+                if node is None:
+                    node = object.__new__(cls)
+                    node._arg_list = ()
+                    node._hash = hash(symbol)
+                    node._depth = 1
+                    node._string = symbol
+                    node._symbols = frozenset((node,))
+                    node._fingerprint = _digest(b'SymbolEq:' + symbol.encode())
+                    node.symbol = symbol
+                    node.value = False
+                    _unique_table[symbol] = node
+
+        if value is not None:
+            node.value = value
+        return node
 
     def eval(self):
         return self.value
 
-    def __repr__(self):
-        return self.symbol
+    def _apply(self):
+        return self.value
+
+    def _parts(self):
+        return (self.symbol,)
 
     def sub_str(self):
         return str(self.value)
 
-    def __hash__(self):
-        return hash(str(self))
\ No newline at end of file
+    def __reduce__(self):
+        return (type(self), (self.symbol,))
+
+
+def _flatten(eq):
+    """
+    Distinct nodes of an equation in postorder, as tuples: (class, child positions...) for
+    operators, (SymbolEq, name) for symbols and (bool, value) for constants. eq is the last one.
+    """
+    positions = {}
+    entries = []
+    stack = [eq]
+    while stack:
+        node = stack[-1]
+        if node in positions:
+            stack.pop()
+        elif isinstance(node, SymbolEq):
+            positions[node] = len(entries)
+            entries.append((SymbolEq, node.symbol))
+            stack.pop()
+        elif not isinstance(node, Equation):
+            positions[node] = len(entries)
+            entries.append((bool, node))
+            stack.pop()
+        else:
+            pending = [x for x in node._arg_list if x not in positions]
+            if pending:
+                stack.extend(pending)
+                continue
+            stack.pop()
+            positions[node] = len(entries)
+            entries.append((type(node),) + tuple(positions[x] for x in node._arg_list))
+    return entries
+
+def _unflatten(entries):
+    """ Inverse of _flatten. """
+    nodes = []
+    for entry in entries:
+        if entry[0] is SymbolEq or entry[0] is bool:
+            nodes.append(entry[0](entry[1]))
+        else:
+            nodes.append(entry[0](*(nodes[i] for i in entry[1:])))
+    return nodes[-1]
+
+def _build_string(eq):
+    """
+    Text of an equation, built by one iterative walk and a join.
+    Cached strings of subterms are reused, and subterms small enough are cached on the way.
+    """
+    parts = []
+    # Items are strings, arguments, or (node, index into parts) markers closing a cached subterm.
+    stack = [eq]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+            parts.append(item)
+        elif isinstance(item, tuple):
+            node, start = item
+            node._string = ''.join(parts[start:])
+        elif not isinstance(item, Equation):
+            parts.append(str(item))
+        elif item._string is not None:
+            parts.append(item._string)
+        else:
+            if item._depth <= STRING_CACHE_NODES and item is not eq:
+                stack.append((item, len(parts)))
+            stack.extend(reversed(item._parts()))
+    return ''.join(parts)
@@ -0,0 +1,171 @@
+"""
+Cost functions for best-first search.
+
+Each heuristic takes the current equation and the destination equation,
+which is None when simplifying, and returns a number. Lower is closer.
+
+Size metrics take one equation and return its size; simplify keeps the smallest
+equation it reaches under one of them, see SIZE_METRICS.
+"""
+from collections import Counter
+
+from .equation import Equation, AndEq, OrEq, NotEq, ImpliesEq, BiImpliesEq, SymbolEq
+
+# Cost of each operator for operator_cost, about the number of and/or/not operators it stands for.
+OPERATOR_COSTS = {
+    AndEq: 1,
+    OrEq: 1,
+    NotEq: 1,
+    ImpliesEq: 2,
+    BiImpliesEq: 4,
+}
+
+
+def _label(eq):
+    if isinstance(eq, SymbolEq):
+        return eq.symbol
+    elif isinstance(eq, Equation):
+        return type(eq).__name__
+    return str(eq)
+
+def _args(eq):
+    if isinstance(eq, Equation):
+        return eq._arg_list
+    return ()
+
+def _size(eq):
+    if isinstance(eq, Equation):
+        return eq.depth
+    return 1
+
+def _labels(eq):
+    labels = Counter()
+    stack = [eq]
+    while stack:
+        node = stack.pop()
+        labels[_label(node)] += 1
+        stack.extend(_args(node))
+    return labels
+
+
+def depth_heuristic(eq, dest_eq):
+    """ Size of the current equation. Prefers small equations, which suits simplify. """
+    return _size(eq)
+
+def label_count_distance(eq, dest_eq):
+    """
+    Difference between the symbol and operator counts of eq and dest_eq.
+    When simplifying, every label counts against eq.
+    """
+    labels = _labels(eq)
+    if dest_eq is None:
+        return sum(labels.values())
+
+    dest_labels = _labels(dest_eq)
+    return sum(abs(labels[x] - dest_labels[x]) for x in labels.keys() | dest_labels.keys())
+
+def tree_edit_distance(eq, dest_eq):
+    """
+    Top-down tree edit distance from eq to dest_eq.
+    Roots are always mapped to each other; argument lists are aligned with inserts and
+    deletes that cost the size of the inserted or deleted subtree, and relabels cost 1.
+    """
+    if dest_eq is None:
+        return depth_heuristic(eq, dest_eq)
+
+    # Post-order over pairs of subterms with an explicit stack, so any depth is safe.
+    memo = {}
+    stack = [(eq, dest_eq)]
+    while stack:
+        a, b = stack[-1]
+        if a is b:
+            memo[(a, b)] = 0
+        if (a, b) in memo:
+            stack.pop()
+            continue
+
+        args_a = _args(a)
+        args_b = _args(b)
+        pending = [(x, y) for x in args_a for y in args_b if (x, y) not in memo]
+        if pending:
+            stack.extend(pending)
+            continue
+
+        stack.pop()
+        # Sequence edit distance over the (at most two) arguments.
+        row = [0]
+        for y in args_b:
+            row.append(row[-1] + _size(y))
+        for x in args_a:
+            new_row = [row[0] + _size(x)]
+            for j, y in enumerate(args_b):
+                new_row.append(min(row[j] + memo[(x, y)], row[j + 1] + _size(x), new_row[j] + _size(y)))
+            row = new_row
+
+        memo[(a, b)] = (_label(a) != _label(b)) + row[-1]
+
+    return memo[(eq, dest_eq)]
+
+
+def node_count(eq):
+    """ Number of nodes, the size simplify uses by default. Constants count 0, so they are smallest. """
+    if isinstance(eq, Equation):
+        return eq.depth
+    return 0
+
+def _bottom_up(eq, leaf, combine):
+    """ Fold eq from its symbols up, once per shared subterm. Constants give 0. """
+    values = {}
+    stack = [eq]
+    while stack:
+        node = stack[-1]
+        if node in values:
+            stack.pop()
+        elif isinstance(node, SymbolEq):
+            values[node] = leaf
+            stack.pop()
+        elif not isinstance(node, Equation):
+            values[node] = 0
+            stack.pop()
+        else:
+            pending = [x for x in node._arg_list if x not in values]
+            if pending:
+                stack.extend(pending)
+            else:
+                stack.pop()
+                values[node] = combine(node, [values[x] for x in node._arg_list])
+    return values[eq]
+
+def tree_depth(eq):
+    """ Nesting depth: 1 for a symbol, one more than the deepest argument for an operator. """
+    return _bottom_up(eq, 1, lambda node, args: 1 + max(args))
+
+def operator_cost(eq, costs=None):
+    """
+    Symbol count plus the cost of every operator.
+
+    :param costs: Dict of Equation class to cost. Defaults to OPERATOR_COSTS.
+    """
+    costs = OPERATOR_COSTS if costs is None else costs
+    return _bottom_up(eq, 1, lambda node, args: costs[type(node)] + sum(args))
+
+
+# Size metrics by name, for simplify.
+SIZE_METRICS = {
+    'nodes': node_count,
+    'depth': tree_depth,
+    'cost': operator_cost,
+}
+
+def get_metric(metric):
+    """
+    :param metric: Name in SIZE_METRICS, a function of one equation, or None for node_count.
+    :returns: The metric function.
+    """
+    if metric is None:
+        return node_count
+    if callable(metric):
+        return metric
+    if metric not in SIZE_METRICS:
+        raise ValueError("Unknown size metric: " + repr(metric))
+    return SIZE_METRICS[metric]
@@ -1,180 +1,76 @@
-from .equation import AndEq, OrEq, NotEq, ImpliesEq, BiImpliesEq
+from .rules import RuleSet
+from .cache import RESULT_CACHE, SUBTERM_CACHE
 
-def identity(eq):
-    """
-    P and True = P
-    Q or False = Q
-    """
-    if isinstance(eq, AndEq):
-        if isinstance(eq.arg2, bool):
-            if eq.arg2 == True:
-                return eq.arg1
-    elif isinstance(eq, OrEq):
-        if isinstance(eq.arg2, bool):
-            if eq.arg2 == False:
-                return eq.arg1
-
-def idempotent(eq):
-    """
-    P and P = P
-    Q or Q = Q
-    """
-    if isinstance(eq, AndEq) or isinstance(eq, OrEq):
-        if eq.arg1 == eq.arg2:
-            return eq.arg1
+# Every identity is written as rewrite rules in get_equation syntax and compiled
+# into one discrimination tree. Rules of an identity are tried in order.
+RULES = RuleSet()
 
-def domination(eq):
-    """
-    P or True = True
-    Q and False = False
-    """
-    if isinstance(eq, AndEq):
-        if isinstance(eq.arg2, bool):
-            if eq.arg2 == False:
-                return False
-    elif isinstance(eq, OrEq):
-        if isinstance(eq.arg2, bool):
-            if eq.arg2 == True:
-                return True
-
-def commutative(eq):
-    """
-    P and Q = Q and P
-    P or Q = Q or P
-    """
-    if isinstance(eq, AndEq):
-        return AndEq(eq.arg2, eq.arg1)
-    elif isinstance(eq, OrEq):
-        return OrEq(eq.arg2, eq.arg1)
+identity = RULES.add('identity',
+    "P and True = P",
+    "P or False = P")
 
-def associative(eq):
-    """
-    (P and Q) and R = P and (Q and R)
-    (P or Q) or R = P or (Q or R)
-    """
-    if isinstance(eq, AndEq) or isinstance(eq, OrEq):
-        if isinstance(eq.arg1, type(eq)):
-            arg1 = eq.arg1.arg1
-            arg2 = type(eq)(eq.arg1.arg2, eq.arg2)
+idempotent = RULES.add('idempotent',
+    "P and P = P",
+    "P or P = P")
 
-            return type(eq)(arg1, arg2)
+domination = RULES.add('domination',
+    "P and False = False",
+    "P or True = True")
 
-def distributive(eq):
-    """
-    P or (Q and R) = (P or Q) and (P or R)
-    P and (Q or R) = (P and Q) or (P and R)
-    """
-    if isinstance(eq, OrEq):
-        if isinstance(eq.arg2, AndEq):
-            arg1 = OrEq(eq.arg1, eq.arg2.arg1)
-            arg2 = OrEq(eq.arg1, eq.arg2.arg2)
-
-            return AndEq(arg1, arg2)
-        elif isinstance(eq.arg1, AndEq) and isinstance(eq.arg2, AndEq) and eq.arg1.arg1 == eq.arg2.arg1:
-            arg1 = eq.arg1.arg1
-            arg2 = OrEq(eq.arg1.arg2, eq.arg2.arg2)
-
-            return OrEq(arg1, arg2)
-    elif isinstance(eq, AndEq):
-        if isinstance(eq.arg2, OrEq):
-            arg1 = AndEq(eq.arg1, eq.arg2.arg1)
-            arg2 = AndEq(eq.arg1, eq.arg2.arg2)
-
-            return OrEq(arg1, arg2)
-        elif isinstance(eq.arg1, OrEq) and isinstance(eq.arg2, OrEq) and eq.arg1.arg1 == eq.arg2.arg1:
-            arg1 = eq.arg1.arg1
-            arg2 = OrEq(eq.arg1.arg2, eq.arg2.arg2)
-
-            return OrEq(arg1, arg2)
-
-def negation(eq):
-    """
-    P and not P = F
-    P or not P = T
-    """
-    if isinstance(eq, AndEq) and isinstance(eq.arg2, NotEq):
-        if eq.arg1 == eq.arg2.arg1:
-            return False
-    elif isinstance(eq, OrEq) and isinstance(eq.arg2, NotEq):
-        if eq.arg1 == eq.arg2.arg1:
-            return True
-
-def absorption(eq):
-    """
-    P and (P or Q) = P
-    P or (P and Q) = P
-    """
-    if isinstance(eq, AndEq) or isinstance(eq, OrEq):
-        if isinstance(eq.arg2, AndEq) or isinstance(eq.arg2, OrEq):
-            if not isinstance(eq, type(eq.arg2)):
-                if eq.arg1 == eq.arg2.arg1:
-                    return eq.arg1
+commutative = RULES.add('commutative',
+    "P and Q = Q and P",
+    "P or Q = Q or P")
 
-def double_negation(eq):
-    """
-    not not P = P
-    P = not not P
-    """
-    if isinstance(eq, NotEq) and isinstance(eq.arg1, NotEq):
-        return eq.arg1.arg1
-    else:
-        return NotEq(NotEq(eq))
+associative = RULES.add('associative',
+    "(P and Q) and R = P and (Q and R)",
+    "(P or Q) or R = P or (Q or R)")
 
-def implication_equivalence(eq):
-    """
-    P -> Q = not P or Q
-    """
-    if isinstance(eq, ImpliesEq):
-        arg1 = NotEq(eq.arg1)
-        arg2 = eq.arg2
-
-        return OrEq(arg1, arg2)
-    elif isinstance(eq, OrEq) and isinstance(eq.arg1, NotEq):
-        arg1 = eq.arg1.arg1
-        arg2 = eq.arg2
-        
-        return ImpliesEq(arg1, arg2)
-
-def biconditional_equivalence(eq):
-    """
-    P <-> Q = (P -> Q) and (Q -> P)
-    """
-    if isinstance(eq, BiImpliesEq):
-        arg1 = ImpliesEq(eq.arg1, eq.arg2)
-        arg2 = ImpliesEq(eq.arg2, eq.arg1)
-
-        return AndEq(arg1, arg2)
-    elif isinstance(eq, AndEq) and isinstance(eq.arg1, ImpliesEq) and isinstance(eq.arg2, ImpliesEq):
-        if eq.arg1.arg1 == eq.arg2.arg2 and eq.arg1.arg2 == eq.arg2.arg1:
-            arg1 = eq.arg1.arg1
-            arg2 = eq.arg1.arg2
-            
-            return BiImpliesEq(arg1, arg2)
-
-def demorgans_law(eq):
+distributive = RULES.add('distributive',
+    "P or (Q and R) = (P or Q) and (P or R)",
+    "P and (Q or R) = (P and Q) or (P and R)")
+
+negation = RULES.add('negation',
+    "P and not P = False",
+    "P or not P = True")
+
+absorption = RULES.add('absorption',
+    "P and (P or Q) = P",
+    "P or (P and Q) = P")
+
+double_negation = RULES.add('double_negation',
+    "not (not P) = P",
+    "P = not (not P)")
+
+demorgans_law = RULES.add('demorgans_law',
+    "not (P and Q) = not P or not Q",
+    "not (P or Q) = not P and not Q",
+    "not P and not Q = not (P or Q)",
+    "not P or not Q = not (P and Q)")
+
+implication_equivalence = RULES.add('implication_equivalence',
+    "P -> Q = not P or Q",
+    "not P or Q = P -> Q")
+
+biconditional_equivalence = RULES.add('biconditional_equivalence',
+    "P <-> Q = (P -> Q) and (Q -> P)",
+    "(P -> Q) and (Q -> P) = P <-> Q")
+
+
+# Identity functions in RULES order: [identity, idempotent, domination, commutative, associative, distributive,
+# negation, absorption, double_negation, demorgans_law, implication_equivalence, biconditional_equivalence]
+FUNC_LIST = RULES.functions
+
+def register_identity(name, *texts):
     """
-    not (P and Q) = not P or not Q
-    not (P or Q) = not P and not Q
+    Add an identity, or more rules for an existing one, to the shared discrimination tree.
+    New identities are appended to FUNC_LIST, which is RULES.functions, so every search uses them.
+    The result caches are cleared, as their results were found without the new rules.
+
+    :param name: Name of the identity.
+    :param texts: Rules in 'lhs = rhs' form, e.g. "P and (not P or Q) = P and Q".
+    :returns: The identity function.
     """
-    if isinstance(eq, NotEq):
-        if isinstance(eq.arg1, AndEq) or isinstance(eq.arg1, OrEq):
-            arg1 = NotEq(eq.arg1.arg1)
-            arg2 = NotEq(eq.arg1.arg2)
-
-            if isinstance(eq.arg1, AndEq):
-                return OrEq(arg1, arg2)
-            else:
-                return AndEq(arg1, arg2)
-
-    elif isinstance(eq, AndEq) or isinstance(eq, OrEq):
-        if isinstance(eq.arg1, NotEq) and isinstance(eq.arg2, NotEq):
-            arg1 = eq.arg1.arg1
-            arg2 = eq.arg2.arg1
-            
-            if isinstance(eq, AndEq):
-                return NotEq(OrEq(arg1, arg2))
-            else:
-                return NotEq(AndEq(arg1, arg2))
-
-
-FUNC_LIST = [identity, idempotent, domination, commutative, associative, distributive, negation, absorption, double_negation, demorgans_law, implication_equivalence, biconditional_equivalence]
\ No newline at end of file
+    func = RULES.add(name, *texts)
+    RESULT_CACHE.clear()
+    SUBTERM_CACHE.clear()
+    return func
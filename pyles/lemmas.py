@@ -0,0 +1,293 @@
+"""
+Library of proven lemmas, reused by searches as macro rewrite steps.
+
+A lemma is a short run of rule applications inside one subterm of a finished proof,
+generalized by renaming its symbols to pattern variables, e.g.
+"((x0 -> x1) and (x0 -> x2)) = (x0 -> (x1 and x2))". A search given the library may apply a
+lemma as one step, and its proof is expanded back into the primitive rule steps afterwards.
+Lemmas are kept in SQLite with use counts; the least used are evicted when the library is full.
+"""
+import json
+import sqlite3
+
+from .equation import Equation, SymbolEq
+from .identities import FUNC_LIST
+from .rules import RuleSet, _bind, _substitute
+from .cache import canonicalize
+from .parser import get_equation
+from .solve import EquationHistory, _history_chain, _subterm_at, _replace_at
+
+DEFAULT_MAX_LEMMAS = 256
+# Rule applications in the shortest and longest lemmas learned.
+DEFAULT_MIN_STEPS = 2
+DEFAULT_MAX_STEPS = 4
+# Description of a lemma step in a proof, followed by the lemma's rule text.
+LEMMA_PREFIX = 'lemma: '
+
+
+def _positions(eq):
+    """ List of (subterm, path) for every compound subterm of eq in preorder. A path is a tuple of argument indexes. """
+    positions = []
+    stack = [(eq, ())]
+    while stack:
+        node, path = stack.pop()
+        if isinstance(node, SymbolEq) or not isinstance(node, Equation):
+            continue
+        positions.append((node, path))
+        for i in range(len(node._arg_list) - 1, -1, -1):
+            stack.append((node._arg_list[i], path + (i,)))
+    return positions
+
+def _step_path(prev, curr, func):
+    """
+    Path of the subterm that func rewrites to turn prev into curr, or curr into prev for the
+    reversed steps of a bidirectional proof. The deepest one if several do, None if none does.
+    """
+    for source, target in ((prev, curr), (curr, prev)):
+        found = None
+        for node, path in _positions(source):
+            new_node = func(node)
+            if new_node is not None and _replace_at(source, path, new_node) is target:
+                if found is None or len(path) > len(found):
+                    found = path
+        if found is not None:
+            return found
+    return None
+
+def _common_prefix(paths):
+    prefix = paths[0]
+    for path in paths[1:]:
+        n = 0
+        while n < min(len(prefix), len(path)) and prefix[n] == path[n]:
+            n += 1
+        prefix = prefix[:n]
+    return prefix
+
+def _symbol_names(eq):
+    if isinstance(eq, Equation):
+        return {x.symbol for x in eq.get_symbol_set()}
+    return set()
+
+
+class Lemma():
+    """
+    A proven rewrite lhs = rhs over pattern variables, with the primitive steps that prove it:
+    a list of (pattern, identity name) pairs from lhs to rhs, the first name being None.
+    """
+    __slots__ = ('text', 'lhs', 'rhs', 'steps', 'uses', 'last_used')
+
+    def __init__(self, steps, uses=0, last_used=0):
+        self.steps = steps
+        self.lhs = steps[0][0]
+        self.rhs = steps[-1][0]
+        self.text = str(self.lhs) + ' = ' + str(self.rhs)
+        self.uses = uses
+        self.last_used = last_used
+
+    def __repr__(self):
+        return self.text
+
+
+def extract_lemmas(eq_history, min_steps=DEFAULT_MIN_STEPS, max_steps=DEFAULT_MAX_STEPS):
+    """
+    Lemmas of a finished proof: every run of min_steps to max_steps consecutive rule steps,
+    restricted to the smallest subterm that contains all of their rewrites.
+
+    :param eq_history: Last step of a proof. Steps that are not FUNC_LIST identities, such as
+        truth table steps, are never part of a lemma.
+    :returns: List of Lemma objects, without duplicates.
+    """
+    functions = {str(func): func for func in FUNC_LIST}
+    chain = _history_chain(eq_history)
+
+    # Path of each step's rewrite, or None if it is not a rule step.
+    paths = [None]
+    for prev, curr in zip(chain, chain[1:]):
+        func = functions.get(curr.description)
+        paths.append(None if func is None else _step_path(prev.eq, curr.eq, func))
+
+    lemmas = {}
+    for i in range(len(chain)):
+        for j in range(i + min_steps, min(i + max_steps, len(chain) - 1) + 1):
+            if any(x is None for x in paths[i + 1:j + 1]):
+                break
+
+            prefix = _common_prefix(paths[i + 1:j + 1])
+            subterms = [_subterm_at(x.eq, prefix) for x in chain[i:j + 1]]
+            patterns, _ = canonicalize(*subterms)
+            lhs, rhs = patterns[0], patterns[-1]
+            if isinstance(lhs, SymbolEq) or not isinstance(lhs, Equation) or lhs is rhs:
+                continue
+            # Reversed steps may introduce symbols, which a rewrite of lhs could not bind.
+            names = _symbol_names(lhs)
+            if any(not _symbol_names(x) <= names for x in patterns):
+                continue
+
+            steps = [(patterns[0], None)]
+            steps.extend((pattern, functions[x.description].__name__) for pattern, x in zip(patterns[1:], chain[i + 1:j + 1]))
+            lemma = Lemma(steps)
+            lemmas.setdefault(lemma.text, lemma)
+
+    return list(lemmas.values())
+
+
+class LemmaLibrary():
+    """
+    Lemmas learned from finished proofs, kept in an SQLite file, or in memory by default.
+
+    Pass the library to prove or simplify as lemmas: the search applies each lemma as one step
+    next to FUNC_LIST, and the proof it returns is expanded into primitive steps. Every
+    expansion counts as a use of the lemma. When the library is over max_lemmas, the lemmas
+    with the fewest uses are evicted, the least recently used first.
+    """
+    def __init__(self, path=':memory:', max_lemmas=DEFAULT_MAX_LEMMAS, min_steps=DEFAULT_MIN_STEPS,
+                 max_steps=DEFAULT_MAX_STEPS):
+        """
+        :param path: Database file path. Lemmas persist between runs.
+        :param max_lemmas: Number of lemmas kept.
+        :param min_steps: Rule steps in the shortest lemma learned.
+        :param max_steps: Rule steps in the longest lemma learned.
+        """
+        self.max_lemmas = max_lemmas
+        self.min_steps = min_steps
+        self.max_steps = max_steps
+        self.learned = 0
+        self.evicted = 0
+        self.expanded = 0
+        self._rules = None
+        self._rule_lemmas = None
+
+        self.conn = sqlite3.connect(path)
+        self.c = self.conn.cursor()
+        self.c.execute('''CREATE TABLE IF NOT EXISTS lemmas (rule TEXT PRIMARY KEY, steps TEXT, uses INTEGER, last_used INTEGER)''')
+        self.conn.commit()
+
+        self.lemmas = {}
+        self.c.execute('SELECT steps, uses, last_used FROM lemmas ORDER BY rowid')
+        for steps, uses, last_used in self.c.fetchall():
+            lemma = Lemma([(get_equation(eq_string), name) for eq_string, name in json.loads(steps)], uses, last_used)
+            self.lemmas[lemma.text] = lemma
+        self.clock = max((x.last_used for x in self.lemmas.values()), default=0)
+
+    def __len__(self):
+        return len(self.lemmas)
+
+    def _compile(self):
+        if self._rules is None:
+            self._rules = RuleSet()
+            self._rule_lemmas = list(self.lemmas.values())
+            for i, lemma in enumerate(self._rule_lemmas):
+                self._rules.add('lemma_%d' % i, lemma.text)
+
+    @property
+    def rules(self):
+        """ RuleSet with one identity per lemma, in the order of description(). """
+        self._compile()
+        return self._rules
+
+    def description(self, index):
+        """ Proof step description of the lemma at an identity index of rules. """
+        self._compile()
+        return LEMMA_PREFIX + self._rule_lemmas[index].text
+
+    def learn(self, eq_history):
+        """
+        Add the lemmas of a finished proof, see extract_lemmas, then evict down to max_lemmas.
+
+        :returns: Number of new lemmas.
+        """
+        self.clock += 1
+        new = 0
+        for lemma in extract_lemmas(eq_history, self.min_steps, self.max_steps):
+            lemma.last_used = self.clock
+            if lemma.text in self.lemmas:
+                self.lemmas[lemma.text].last_used = self.clock
+                self.c.execute('UPDATE lemmas SET last_used=? WHERE rule=?', (self.clock, lemma.text))
+                continue
+
+            self.lemmas[lemma.text] = lemma
+            steps = json.dumps([(str(eq), name) for eq, name in lemma.steps])
+            self.c.execute('INSERT INTO lemmas VALUES (?, ?, ?, ?)', (lemma.text, steps, lemma.uses, lemma.last_used))
+            new += 1
+
+        self.learned += new
+        self._evict()
+        self.conn.commit()
+        if new:
+            self._rules = None
+        return new
+
+    def _evict(self):
+        excess = len(self.lemmas) - self.max_lemmas
+        if excess > 0:
+            victims = sorted(self.lemmas.values(), key=lambda x: (x.uses, x.last_used))[:excess]
+            for lemma in victims:
+                del self.lemmas[lemma.text]
+            self.c.executemany('DELETE FROM lemmas WHERE rule=?', [(x.text,) for x in victims])
+            self.evicted += len(victims)
+            self._rules = None
+
+    def expand(self, eq_history):
+        """
+        Replace every lemma step of a proof by the primitive steps of the lemma, and count the uses.
+        Lemma steps may be reversed, as in bidirectional proofs.
+
+        :returns: The last step of the expanded proof.
+        """
+        descriptions = {func.__name__: str(func) for func in FUNC_LIST}
+        chain = _history_chain(eq_history)
+        if not any(x.description.startswith(LEMMA_PREFIX) for x in chain):
+            return eq_history
+
+        self.clock += 1
+        result = EquationHistory(chain[0].eq, chain[0].description, None)
+        for prev, curr in zip(chain, chain[1:]):
+            lemma = None
+            if curr.description.startswith(LEMMA_PREFIX):
+                lemma = self.lemmas.get(curr.description[len(LEMMA_PREFIX):])
+            steps = lemma and self._instantiate(lemma, prev.eq, curr.eq)
+            if not steps:
+                result = EquationHistory(curr.eq, curr.description, result)
+                continue
+
+            for eq, name in steps:
+                result = EquationHistory(eq, descriptions[name], result)
+            lemma.uses += 1
+            lemma.last_used = self.clock
+            self.expanded += 1
+            self.c.execute('UPDATE lemmas SET uses=?, last_used=? WHERE rule=?', (lemma.uses, lemma.last_used, lemma.text))
+
+        self.conn.commit()
+        return result
+
+    def _instantiate(self, lemma, prev, curr):
+        """
+        :returns: List of (equation, identity name) pairs of the primitive steps from prev to curr,
+            or None if the lemma does not rewrite one into the other.
+        """
+        for source, target, forward in ((prev, curr, True), (curr, prev, False)):
+            for node, path in _positions(source):
+                bindings = _bind(lemma.lhs, node)
+                if bindings is None or _replace_at(source, path, _substitute(lemma.rhs, bindings)) is not target:
+                    continue
+
+                eqs = [_replace_at(source, path, _substitute(pattern, bindings)) for pattern, _ in lemma.steps]
+                names = [name for _, name in lemma.steps]
+                if forward:
+                    return list(zip(eqs[1:], names[1:]))
+                # Walk the lemma backwards: each step keeps the name of the rule it undoes.
+                return list(zip(reversed(eqs[:-1]), reversed(names[1:])))
+        return None
+
+    def stats(self):
+        return {
+            'lemmas': len(self.lemmas),
+            'learned': self.learned,
+            'evicted': self.evicted,
+            'expanded': self.expanded,
+            'uses': sum(x.uses for x in self.lemmas.values()),
+        }
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
@@ -0,0 +1,257 @@
+"""
+Two-level minimization of equations into a sum of products.
+
+Small equations use Quine-McCluskey with an exact cover of the prime implicants. Larger
+ones use an Espresso-style expand and irredundant pass over the truth table.
+"""
+import functools
+
+import numpy as np
+
+from .equation import AndEq, OrEq, NotEq, SymbolEq
+from .truthtable import MAX_EXACT_SYMBOLS, truth_table
+
+# Equations with at most this many symbols are minimized exactly with Quine-McCluskey.
+QM_MAX_SYMBOLS = 8
+# Branch and bound nodes searched for an exact cover before the best cover found is used.
+MAX_COVER_NODES = 100000
+
+
+class EquivalenceCertificate():
+    """
+    Evidence that a minimized equation is equivalent to its input: both have the same
+    exact truth table, over the same symbols, with the given fingerprint.
+    """
+    def __init__(self, eq, result, symbols, fingerprint):
+        self.eq = eq
+        self.result = result
+        self.symbols = symbols
+        self.fingerprint = fingerprint
+
+    def verify(self):
+        """ Recompute both truth tables. Returns True if they still match the fingerprint. """
+        return (truth_table(self.eq, self.symbols).fingerprint() == self.fingerprint
+                and truth_table(self.result, self.symbols).fingerprint() == self.fingerprint)
+
+    def __repr__(self):
+        return 'EquivalenceCertificate(%s, %s, %s)' % (self.eq, self.result, self.fingerprint)
+
+
+class Minimization():
+    """
+    Result of minimize.
+
+    cubes is the sum of products as (value, mask) pairs: bit i of mask is set if symbol i is
+    absent from the product, otherwise bit i of value is its polarity.
+    """
+    def __init__(self, eq, symbols, cubes, method, certificate):
+        self.eq = eq
+        self.symbols = symbols
+        self.cubes = cubes
+        self.method = method
+        self.certificate = certificate
+
+    def literal_count(self):
+        full = (1 << len(self.symbols)) - 1
+        return sum(bin(full & ~mask).count('1') for _, mask in self.cubes)
+
+
+def _cube_index(value, mask, n):
+    """ Index of a cube's minterms in the truth table reshaped to n axes of size 2. """
+    # Axis a of the C-order reshape holds bit n - 1 - a of the assignment.
+    return tuple(slice(None) if (mask >> i) & 1 else (value >> i) & 1 for i in reversed(range(n)))
+
+def prime_implicants(minterms):
+    """
+    Quine-McCluskey: merge cubes that differ in one literal until none merge.
+
+    :param minterms: Iterable of assignments the function is true for.
+    :returns: Set of prime implicant cubes as (value, mask) pairs.
+    """
+    cubes = {(m, 0) for m in minterms}
+    primes = set()
+    while cubes:
+        merged = set()
+        used = set()
+        # Only cubes with the same mask can merge; group them and pair by single-bit differences.
+        by_mask = {}
+        for value, mask in cubes:
+            by_mask.setdefault(mask, set()).add(value)
+
+        for mask, values in by_mask.items():
+            for value in values:
+                bit = 1
+                while bit <= value:
+                    if value & bit and not mask & bit and value ^ bit in values:
+                        merged.add((value ^ bit, mask | bit))
+                        used.add((value, mask))
+                        used.add((value ^ bit, mask))
+                    bit <<= 1
+
+        primes |= cubes - used
+        cubes = merged
+    return primes
+
+def _minterm_set(cube, index_of, n):
+    """ Bitset, over positions in index_of, of the minterms a cube covers. """
+    value, mask = cube
+    free = [1 << i for i in range(n) if (mask >> i) & 1]
+    bits = 0
+    for k in range(1 << len(free)):
+        m = value
+        for j, bit in enumerate(free):
+            if (k >> j) & 1:
+                m |= bit
+        bits |= 1 << index_of[m]
+    return bits
+
+def _cost(cube, n):
+    """ Literal count of a cube. """
+    return n - bin(cube[1]).count('1')
+
+def minimum_cover(minterms, primes, n, max_nodes=MAX_COVER_NODES):
+    """
+    Choose the fewest prime implicants covering every minterm, breaking ties by literal count.
+    Essential primes are taken first, then the rest is a branch and bound search.
+
+    :returns: List of cubes. Minimal unless max_nodes ran out, in which case the best cover found.
+    """
+    index_of = {m: i for i, m in enumerate(sorted(minterms))}
+    primes = sorted(primes, key=lambda x: (_cost(x, n), x))
+    sets = [_minterm_set(x, index_of, n) for x in primes]
+    costs = [_cost(x, n) for x in primes]
+
+    uncovered = (1 << len(index_of)) - 1
+    chosen = []
+    # Essential primes: the only cover of some minterm.
+    for i in range(len(index_of)):
+        bit = 1 << i
+        covering = [j for j, x in enumerate(sets) if x & bit]
+        if len(covering) == 1 and covering[0] not in chosen:
+            chosen.append(covering[0])
+            uncovered &= ~sets[covering[0]]
+
+    # Start from a greedy cover, so there is a result however the search ends.
+    greedy = []
+    remaining = uncovered
+    while remaining:
+        j = max(range(len(sets)), key=lambda j: (bin(sets[j] & remaining).count('1'), -costs[j]))
+        greedy.append(j)
+        remaining &= ~sets[j]
+    best = [greedy, (len(greedy), sum(costs[j] for j in greedy))]
+    nodes = [0]
+
+    def search(uncovered, picked, cost):
+        if cost >= best[1]:
+            return
+        if not uncovered:
+            best[0] = list(picked)
+            best[1] = cost
+            return
+        if nodes[0] >= max_nodes or (cost[0] + 1, cost[1]) >= best[1]:
+            return
+        nodes[0] += 1
+
+        # Branch on the lowest uncovered minterm, trying the primes that cover the most first.
+        bit = uncovered & -uncovered
+        candidates = [j for j, x in enumerate(sets) if x & bit]
+        candidates.sort(key=lambda j: (-bin(sets[j] & uncovered).count('1'), costs[j]))
+        for j in candidates:
+            picked.append(j)
+            search(uncovered & ~sets[j], picked, (cost[0] + 1, cost[1] + costs[j]))
+            picked.pop()
+
+    search(uncovered, [], (0, 0))
+    return [primes[j] for j in chosen + best[0]]
+
+def espresso(on, n):
+    """
+    Espresso-style heuristic cover: expand each uncovered minterm into a maximal implicant,
+    raising the literals whose removal covers the most uncovered minterms first, then drop
+    redundant cubes. One pass, without Espresso's reduce step.
+
+    :param on: Bool array of the truth table, indexed by assignment.
+    :returns: List of cubes.
+    """
+    on = on.reshape((2,) * n)
+    uncovered = on.copy()
+    cubes = []
+    while uncovered.any():
+        m = int(np.flatnonzero(uncovered.reshape(-1))[0])
+        value, mask = m, 0
+
+        while True:
+            best = None
+            for i in range(n):
+                if (mask >> i) & 1:
+                    continue
+                raised = (value & ~(1 << i), mask | (1 << i))
+                index = _cube_index(raised[0], raised[1], n)
+                if on[index].all():
+                    gain = int(uncovered[index].sum())
+                    if best is None or gain > best[0]:
+                        best = (gain, raised)
+            if best is None:
+                break
+            value, mask = best[1]
+
+        cubes.append((value, mask))
+        uncovered[_cube_index(value, mask, n)] = False
+
+    # Irredundant: drop cubes, most literals first, whose minterms are all covered by others.
+    coverage = np.zeros(on.shape, dtype=np.int32)
+    for value, mask in cubes:
+        coverage[_cube_index(value, mask, n)] += 1
+    result = []
+    for value, mask in sorted(cubes, key=lambda x: -_cost(x, n)):
+        index = _cube_index(value, mask, n)
+        if coverage[index].min() > 1:
+            coverage[index] -= 1
+        else:
+            result.append((value, mask))
+    return result
+
+def cubes_to_equation(cubes, symbols):
+    """ Sum of products Equation of AndEq, OrEq and NotEq, with products and literals in symbol order. """
+    if not cubes:
+        return False
+
+    products = []
+    for value, mask in sorted(cubes, key=lambda x: (x[1], x[0]), reverse=True):
+        literals = [SymbolEq(symbol) if (value >> i) & 1 else NotEq(SymbolEq(symbol))
+                    for i, symbol in enumerate(symbols) if not (mask >> i) & 1]
+        if not literals:
+            return True
+        products.append(functools.reduce(AndEq, literals))
+    return functools.reduce(OrEq, products)
+
+def minimize(eq, symbols=None):
+    """
+    Minimal sum of products of an equation, from its exact truth table.
+
+    :param symbols: Symbol names to minimize over. Defaults to the sorted symbols of eq.
+    :returns: Minimization obj, with the result equation and its EquivalenceCertificate.
+    :raises ValueError: If eq has more than MAX_EXACT_SYMBOLS symbols.
+    """
+    table = truth_table(eq, symbols)
+    if not table.exact:
+        raise ValueError("Minimization needs an exact truth table, at most %d symbols." % MAX_EXACT_SYMBOLS)
+
+    symbols = table.symbols
+    n = len(symbols)
+    on = np.unpackbits(table.bits, count=table.size, bitorder='little').astype(bool)
+
+    if n <= QM_MAX_SYMBOLS:
+        minterms = [int(x) for x in np.flatnonzero(on)]
+        cubes = minimum_cover(minterms, prime_implicants(minterms), n) if minterms else []
+        method = 'quine-mccluskey'
+    else:
+        cubes = espresso(on, n)
+        method = 'espresso'
+
+    result = cubes_to_equation(cubes, symbols)
+    fingerprint = table.fingerprint()
+    if truth_table(result, symbols).fingerprint() != fingerprint:
+        raise AssertionError("Minimized equation differs from its input.")
+
+    return Minimization(result, symbols, cubes, method, EquivalenceCertificate(eq, result, symbols, fingerprint))
@@ -0,0 +1,204 @@
+import re
+
+from .equation import Equation, AndEq, OrEq, NotEq, ImpliesEq, BiImpliesEq, SymbolEq
+
+# Precedence and class of each binary operator; higher binds tighter. All are left associative.
+BINARY_OPERATORS = {
+    'and': (4, AndEq),
+    'or': (3, OrEq),
+    '->': (2, ImpliesEq),
+    '<->': (1, BiImpliesEq),
+}
+
+# Tokens are parentheses and runs of anything else up to whitespace or a parenthesis.
+_TOKEN_RE = re.compile(r'[()]|[^\s()]+')
+_LITERALS = {'True': True, 'False': False}
+
+
+class ParseError(ValueError):
+    """ Raised when text is not a valid equation. position is the offset of the bad token in the text. """
+    def __init__(self, message, text, position, line=None):
+        self.message = message
+        self.text = text
+        self.position = position
+        self.line = line
+        if line is not None:
+            message += ' (line %d)' % line
+        super().__init__(message + ' at position %d: %r' % (position, text))
+
+
+def tokenize(text):
+    """ Split text into tokens in one pass. """
+    return _TOKEN_RE.findall(text)
+
+def _position(text, index):
+    """ Offset in text of token number index, or the end of the text. Only needed for errors. """
+    for i, match in enumerate(_TOKEN_RE.finditer(text)):
+        if i == index:
+            return match.start()
+    return len(text)
+
+def _reduce(operator, operands):
+    if operator == 'not':
+        operands.append(NotEq(operands.pop()))
+    else:
+        arg2 = operands.pop()
+        operands.append(BINARY_OPERATORS[operator][1](operands.pop(), arg2))
+
+def parse_tokens(tokens, symbols=None, text=''):
+    """
+    Operator-precedence parse of a token list, without recursion, so nesting depth is unbounded.
+    'not' binds tightest, then 'and', 'or', '->' and '<->'.
+
+    :param tokens: List of tokens of text, see tokenize.
+    :param symbols: Dict of symbol name to SymbolEq shared between calls, or None for a new one.
+    :param text: Text the tokens came from, for error positions.
+    :returns: Equation, or bool.
+    """
+    if symbols is None:
+        symbols = {}
+
+    operands = []
+    # Pending 'not', binary operators and '(' with their token indexes.
+    operators = []
+    expect_operand = True
+
+    for index, token in enumerate(tokens):
+        if expect_operand:
+            if token == '(' or token == 'not':
+                operators.append((token, index))
+            elif token in BINARY_OPERATORS or token == ')':
+                raise ParseError("Expected a symbol, 'not' or '(' but found %r" % token, text, _position(text, index))
+            else:
+                if token in _LITERALS:
+                    operands.append(_LITERALS[token])
+                else:
+                    if token not in symbols:
+                        symbols[token] = SymbolEq(token)
+                    operands.append(symbols[token])
+                expect_operand = False
+
+        elif token == ')':
+            while operators and operators[-1][0] != '(':
+                _reduce(operators.pop()[0], operands)
+            if not operators:
+                raise ParseError("Unmatched ')'", text, _position(text, index))
+            operators.pop()
+
+        elif token in BINARY_OPERATORS:
+            precedence = BINARY_OPERATORS[token][0]
+            while operators:
+                top = operators[-1][0]
+                if top == 'not' or (top in BINARY_OPERATORS and BINARY_OPERATORS[top][0] >= precedence):
+                    _reduce(operators.pop()[0], operands)
+                else:
+                    break
+            operators.append((token, index))
+            expect_operand = True
+
+        else:
+            raise ParseError("Expected an operator or ')' but found %r" % token, text, _position(text, index))
+
+    if expect_operand:
+        raise ParseError("Unexpected end of equation", text, len(text))
+
+    while operators:
+        operator, index = operators.pop()
+        if operator == '(':
+            raise ParseError("Unmatched '('", text, _position(text, index))
+        _reduce(operator, operands)
+
+    return operands[0]
+
+def parse_text(text):
+    """
+    Parse the string into a list of lists.
+
+    Ex. "S and (P or R)" -> ['S', 'and' ['P', 'or' 'R']]
+
+    :param text: Text to parse.
+    :returns: List of items, with subitems as sublitsts.
+    """
+    parse_list = []
+    stack = []
+    for index, token in enumerate(tokenize(text)):
+        if token == '(':
+            stack.append(parse_list)
+            parse_list = []
+        elif token == ')':
+            if not stack:
+                raise ParseError("Unmatched ')'", text, _position(text, index))
+            stack[-1].append(parse_list)
+            parse_list = stack.pop()
+        else:
+            parse_list.append(token)
+
+    if stack:
+        raise ParseError("Unmatched '('", text, len(text))
+    return parse_list
+
+def parse_equation(parse_list, symbol_list=None):
+    """
+    Parse equation list into an Equation object.
+    Reuses equivalent symbols so all similar symbols are the same reference.
+
+    :param parse_list: Parse list returned from parse_text.
+    :param symbol_list: Optional list of SymbolEq objects that have already been created.
+        New symbols are appended to it.
+    :returns: A single Equation obj, with appropriate Equations as arguments.
+    """
+    # Flatten the sublists back into parenthesized tokens.
+    tokens = []
+    stack = [iter(parse_list)]
+    while stack:
+        item = next(stack[-1], None)
+        if item is None:
+            stack.pop()
+            if stack:
+                tokens.append(')')
+        elif isinstance(item, list):
+            tokens.append('(')
+            stack.append(iter(item))
+        else:
+            tokens.append(item)
+
+    symbols = {} if symbol_list is None else {x.symbol: x for x in symbol_list}
+    eq = parse_tokens(tokens, symbols, ' '.join(tokens))
+
+    if symbol_list is not None:
+        known = set(symbol_list)
+        symbol_list.extend(x for x in symbols.values() if x not in known)
+    return eq
+
+def get_equation(text, symbols=None):
+    """
+    Parse an equation, e.g. "not P and (Q -> R)".
+
+    :param symbols: Optional dict of symbol name to SymbolEq, shared between calls.
+    :returns: Equation, or bool.
+    :raises ParseError: If the text is not a valid equation.
+    """
+    return parse_tokens(tokenize(text), symbols, text)
+
+def parse_many(lines, symbols=None):
+    """
+    Parse one equation per line, streaming, e.g. from an open file.
+    Blank lines and lines starting with '#' are skipped.
+
+    :param lines: Iterable of strings.
+    :param symbols: Optional dict of symbol name to SymbolEq, shared by every line.
+    :returns: Generator of Equation objects or bools.
+    :raises ParseError: With the line number, if a line is not a valid equation.
+    """
+    if symbols is None:
+        symbols = {}
+
+    for line_number, line in enumerate(lines, 1):
+        tokens = tokenize(line)
+        if not tokens or tokens[0].startswith('#'):
+            continue
+
+        try:
+            yield parse_tokens(tokens, symbols, line)
+        except ParseError as e:
+            raise ParseError(e.message, line, e.position, line_number) from None
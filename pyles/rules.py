@@ -0,0 +1,208 @@
+from .equation import Equation, SymbolEq
+from .parser import get_equation
+
+# Trie edge for a pattern variable, which matches any subterm.
+_ANY = '*'
+
+
+def _label(term):
+    """ Trie edge label of a term. Symbols only match pattern variables. """
+    if isinstance(term, SymbolEq):
+        return None
+    elif isinstance(term, Equation):
+        return type(term)
+    return term
+
+def _bind(pattern, term):
+    """
+    Match a pattern against a term.
+
+    :returns: Dict of variable name to subterm, or None if the term does not match.
+    """
+    bindings = {}
+    stack = [(pattern, term)]
+    while stack:
+        pattern, term = stack.pop()
+        if isinstance(pattern, SymbolEq):
+            if pattern.symbol in bindings:
+                # Hash-consed terms are equal only if they are the same object.
+                if bindings[pattern.symbol] is not term:
+                    return None
+            else:
+                bindings[pattern.symbol] = term
+        elif isinstance(pattern, Equation):
+            if type(term) is not type(pattern):
+                return None
+            stack.extend(zip(pattern._arg_list, term._arg_list))
+        elif pattern is not term:
+            return None
+    return bindings
+
+def _substitute(template, bindings):
+    if isinstance(template, SymbolEq):
+        return bindings[template.symbol]
+    elif isinstance(template, Equation):
+        return type(template)(*(_substitute(x, bindings) for x in template._arg_list))
+    return template
+
+
+class Rule():
+    """
+    One rewrite, lhs = rhs, written in get_equation syntax, e.g. "P and (P or Q) = P".
+    Every symbol is a pattern variable; True and False match themselves.
+    """
+    __slots__ = ('name', 'text', 'lhs', 'rhs')
+
+    def __init__(self, name, text):
+        lhs, sep, rhs = text.partition('=')
+        if not sep or '=' in rhs:
+            raise ValueError("Rule must have the form 'lhs = rhs': " + text)
+
+        self.name = name
+        self.text = text
+        self.lhs = get_equation(lhs.strip())
+        self.rhs = get_equation(rhs.strip())
+
+        unbound = _variables(self.rhs) - _variables(self.lhs)
+        if unbound:
+            raise ValueError("Right-hand side variables missing from the left-hand side: " + ', '.join(sorted(unbound)))
+
+    def __repr__(self):
+        return self.name + ': ' + self.text
+
+def _variables(eq):
+    if isinstance(eq, Equation):
+        return {x.symbol for x in eq.get_symbol_set()}
+    return set()
+
+
+class _TrieNode():
+    __slots__ = ('edges', 'rules')
+
+    def __init__(self):
+        self.edges = {}
+        self.rules = []
+
+
+class RuleSet():
+    """
+    Rewrite rules grouped into named identities, compiled into one discrimination tree.
+
+    Within an identity the rules are tried in order and the first match is used,
+    so every identity gives at most one rewrite per subterm.
+    """
+    def __init__(self):
+        self.rules = []
+        self.names = []
+        self.functions = []
+        self._rule_identity = []
+        self._identity_roots = []
+        self._root = _TrieNode()
+
+    def add(self, name, *texts):
+        """
+        Register an identity, or add rules to an existing one.
+
+        :param name: Name of the identity.
+        :param texts: Rules in 'lhs = rhs' form, in order of priority.
+        :returns: The identity function, see function().
+        """
+        if name not in self.names:
+            self.names.append(name)
+            self._identity_roots.append(set())
+            self.functions.append(self._make_function(name, len(self.names) - 1))
+
+        identity_index = self.names.index(name)
+        for text in texts:
+            rule = Rule(name, text)
+            self.rules.append(rule)
+            self._rule_identity.append(identity_index)
+            self._identity_roots[identity_index].add(_ANY if isinstance(rule.lhs, SymbolEq) else _label(rule.lhs))
+            self._insert(rule.lhs, len(self.rules) - 1)
+
+        func = self.functions[identity_index]
+        func.__doc__ = '\n' + ''.join('    ' + x.text + '\n' for x in self.rules if x.name == name) + '    '
+        return func
+
+    def function(self, name):
+        """ Callable that applies an identity at the root of an equation, returning the rewrite or None. """
+        return self.functions[self.names.index(name)]
+
+    def _make_function(self, name, index):
+        roots = self._identity_roots[index]
+
+        def apply(eq):
+            # Skip the tree walk when no rule of this identity can match the root.
+            if _ANY not in roots and _label(eq) not in roots:
+                return None
+
+            for rule_index in self.candidates(eq):
+                if self._rule_identity[rule_index] == index:
+                    rule = self.rules[rule_index]
+                    bindings = _bind(rule.lhs, eq)
+                    if bindings is not None:
+                        return _substitute(rule.rhs, bindings)
+
+        apply.__name__ = name
+        apply.__qualname__ = name
+        return apply
+
+    def _insert(self, pattern, rule_index):
+        # Preorder walk of the pattern; variables become wildcard edges.
+        node = self._root
+        stack = [pattern]
+        while stack:
+            term = stack.pop()
+            if isinstance(term, SymbolEq):
+                label = _ANY
+            else:
+                label = _label(term)
+                if isinstance(term, Equation):
+                    stack.extend(reversed(term._arg_list))
+            node = node.edges.setdefault(label, _TrieNode())
+        node.rules.append(rule_index)
+
+    def candidates(self, eq):
+        """ Sorted indexes of the rules whose left-hand side shape matches eq, ignoring repeated variables. """
+        found = []
+        stack = [(self._root, (eq,))]
+        while stack:
+            node, remaining = stack.pop()
+            if not remaining:
+                found.extend(node.rules)
+                continue
+
+            term = remaining[0]
+            rest = remaining[1:]
+
+            child = node.edges.get(_ANY)
+            if child:
+                stack.append((child, rest))
+
+            label = _label(term)
+            if label is not None:
+                child = node.edges.get(label)
+                if child:
+                    stack.append((child, term._arg_list + rest if isinstance(term, Equation) else rest))
+
+        found.sort()
+        return found
+
+    def match(self, eq):
+        """
+        Every identity that applies at the root of eq, in one visit of the discrimination tree.
+
+        :returns: List of (identity index, rewritten equation) pairs, ordered by identity index.
+        """
+        results = {}
+        for rule_index in self.candidates(eq):
+            identity_index = self._rule_identity[rule_index]
+            if identity_index in results:
+                continue
+
+            rule = self.rules[rule_index]
+            bindings = _bind(rule.lhs, eq)
+            if bindings is not None:
+                results[identity_index] = _substitute(rule.rhs, bindings)
+
+        return sorted(results.items())
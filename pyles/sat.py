@@ -0,0 +1,496 @@
+"""
+CNF encoding and a CDCL SAT solver.
+
+Decides tautology and equivalence for any number of symbols, where truth tables stop at
+MAX_EXACT_SYMBOLS. Equations are Tseitin encoded into clauses, and the solver searches for a
+satisfying assignment with watched literals, first-UIP clause learning, VSIDS branching,
+phase saving and Luby restarts. A non-equivalent pair is usually rejected within a few
+conflicts, since any satisfying assignment of eq1 xor eq2 is a counterexample.
+"""
+import heapq
+
+from .equation import Equation, AndEq, OrEq, NotEq, ImpliesEq, BiImpliesEq, SymbolEq
+from .truthtable import NotEquivalentError, StoppedError
+
+# Conflicts a check may take before ConflictLimitError, so a precheck gives up on hard pairs.
+DEFAULT_MAX_CONFLICTS = 20000
+# Conflicts between calls of a stop callback.
+STOP_INTERVAL = 64
+# Conflicts in one unit of the Luby restart sequence.
+RESTART_UNIT = 100
+# Activity decay of VSIDS.
+VARIABLE_DECAY = 0.95
+# Learnt clauses kept before the worst half is dropped, as a multiple of the original clause count.
+LEARNT_FRACTION = 1 / 3
+
+_UNASSIGNED = -1
+
+
+class ConflictLimitError(Exception):
+    """ Raised when the solver reaches its conflict limit without an answer. """
+
+
+class CNF():
+    """
+    Clauses over variables 1..variables, as lists of DIMACS literals: v for the variable,
+    -v for its negation. symbols maps symbol names to their variables.
+    """
+    def __init__(self):
+        self.variables = 0
+        self.clauses = []
+        self.symbols = {}
+        self._literals = {}
+
+    def new_variable(self):
+        self.variables += 1
+        return self.variables
+
+    def add(self, clause):
+        self.clauses.append(list(clause))
+
+    def encode(self, eq):
+        """
+        Tseitin encoding: add clauses defining a new variable for each operator of eq, once per
+        shared subterm, so the clause count is linear in the size of eq.
+
+        :param eq: Equation or bool.
+        :returns: Literal that is true exactly when eq is.
+        """
+        literals = self._literals
+        stack = [eq]
+        while stack:
+            node = stack[-1]
+            if node in literals:
+                stack.pop()
+            elif isinstance(node, bool):
+                if True not in literals:
+                    # One variable forced true stands for both constants.
+                    x = self.new_variable()
+                    self.add([x])
+                    literals[True] = x
+                    literals[False] = -x
+                stack.pop()
+            elif isinstance(node, SymbolEq):
+                x = self.new_variable()
+                self.symbols[node.symbol] = x
+                literals[node] = x
+                stack.pop()
+            else:
+                pending = [x for x in node._arg_list if x not in literals]
+                if pending:
+                    stack.extend(pending)
+                    continue
+
+                stack.pop()
+                args = [literals[x] for x in node._arg_list]
+                if isinstance(node, NotEq):
+                    literals[node] = -args[0]
+                    continue
+
+                a, b = args
+                x = self.new_variable()
+                if isinstance(node, AndEq):
+                    self.clauses.extend(([-x, a], [-x, b], [x, -a, -b]))
+                elif isinstance(node, OrEq):
+                    self.clauses.extend(([x, -a], [x, -b], [-x, a, b]))
+                elif isinstance(node, ImpliesEq):
+                    self.clauses.extend(([x, a], [x, -b], [-x, -a, b]))
+                elif isinstance(node, BiImpliesEq):
+                    self.clauses.extend(([-x, -a, b], [-x, a, -b], [x, a, b], [x, -a, -b]))
+                literals[node] = x
+
+        return literals[eq]
+
+    def to_dimacs(self):
+        lines = ['p cnf %d %d' % (self.variables, len(self.clauses))]
+        lines.extend(' '.join(str(x) for x in clause) + ' 0' for clause in self.clauses)
+        return '\n'.join(lines) + '\n'
+
+
+def _luby(i):
+    """ Term i, from 0, of the Luby sequence 1 1 2 1 1 2 4 ... """
+    size, exponent = 1, 0
+    while size < i + 1:
+        exponent += 1
+        size = 2 * size + 1
+    while size - 1 != i:
+        size = (size - 1) // 2
+        exponent -= 1
+        i %= size
+    return 1 << exponent
+
+
+class Solver():
+    """
+    CDCL solver. Literal 2v is variable v and 2v + 1 its negation, so lit ^ 1 negates.
+
+    Each clause of two or more literals is watched by its first two literals: watches[lit]
+    lists the clauses to visit when lit becomes false. The literal a clause implies is kept
+    first, so a reason clause is its implied literal followed by the false ones.
+    """
+    def __init__(self, variables, clauses):
+        """
+        :param variables: Number of variables, numbered from 1.
+        :param clauses: Iterable of clauses of DIMACS literals.
+        """
+        self.variables = variables
+        count = variables + 1
+        self.value = [_UNASSIGNED] * (2 * count)
+        self.level = [0] * count
+        self.reason = [None] * count
+        self.activity = [0.0] * count
+        self.polarity = [1] * count
+        self.seen = [False] * count
+        self.watches = [[] for _ in range(2 * count)]
+        self.trail = []
+        self.trail_limits = []
+        self.queue_head = 0
+        self.variable_increment = 1.0
+        self.heap = [(0.0, v) for v in range(1, count)]
+
+        self.clauses = []
+        self.learnts = []
+        self.conflicts = 0
+        self.decisions = 0
+        self.propagations = 0
+        self.restarts = 0
+        self.unsatisfiable = False
+
+        for clause in clauses:
+            self._add_clause([2 * x if x > 0 else -2 * x + 1 for x in clause])
+        self.max_learnts = max(len(self.clauses) * LEARNT_FRACTION, 1000)
+
+    def _add_clause(self, clause):
+        if self.unsatisfiable:
+            return
+        clause = list(dict.fromkeys(clause))
+        if any(x ^ 1 in clause for x in clause):
+            return
+        if not clause:
+            self.unsatisfiable = True
+        elif len(clause) == 1:
+            # Propagated by solve(), once every clause is watched.
+            if self.value[clause[0]] == 0:
+                self.unsatisfiable = True
+            elif self.value[clause[0]] == _UNASSIGNED:
+                self._enqueue(clause[0], None)
+        else:
+            self.clauses.append(clause)
+            self.watches[clause[0]].append(clause)
+            self.watches[clause[1]].append(clause)
+
+    def _enqueue(self, lit, reason):
+        v = lit >> 1
+        self.value[lit] = 1
+        self.value[lit ^ 1] = 0
+        self.level[v] = len(self.trail_limits)
+        self.reason[v] = reason
+        self.trail.append(lit)
+
+    def _propagate(self):
+        """ Unit propagation of the trail. Returns a conflicting clause, or None. """
+        value = self.value
+        watches = self.watches
+        trail = self.trail
+        while self.queue_head < len(trail):
+            false_lit = trail[self.queue_head] ^ 1
+            self.queue_head += 1
+            self.propagations += 1
+
+            watchers = watches[false_lit]
+            i = j = 0
+            n = len(watchers)
+            while i < n:
+                clause = watchers[i]
+                i += 1
+                if clause[0] == false_lit:
+                    clause[0], clause[1] = clause[1], false_lit
+                first = clause[0]
+                if value[first] == 1:
+                    watchers[j] = clause
+                    j += 1
+                    continue
+
+                for k in range(2, len(clause)):
+                    if value[clause[k]] != 0:
+                        clause[1], clause[k] = clause[k], false_lit
+                        watches[clause[1]].append(clause)
+                        break
+                else:
+                    watchers[j] = clause
+                    j += 1
+                    if value[first] == 0:
+                        while i < n:
+                            watchers[j] = watchers[i]
+                            j += 1
+                            i += 1
+                        del watchers[j:]
+                        return clause
+                    self._enqueue(first, clause)
+            del watchers[j:]
+        return None
+
+    def _bump(self, v):
+        self.activity[v] += self.variable_increment
+        if self.activity[v] > 1e100:
+            self.activity = [x * 1e-100 for x in self.activity]
+            self.variable_increment *= 1e-100
+            self.heap = [(-self.activity[x], x) for x in range(1, self.variables + 1) if self.value[2 * x] == _UNASSIGNED]
+            heapq.heapify(self.heap)
+        elif self.value[2 * v] == _UNASSIGNED:
+            heapq.heappush(self.heap, (-self.activity[v], v))
+
+    def _analyze(self, conflict):
+        """
+        First-UIP conflict analysis.
+
+        :returns: Tuple of the learnt clause, asserting literal first and a literal of the
+            backtrack level second, and the backtrack level.
+        """
+        seen = self.seen
+        level = self.level
+        current = len(self.trail_limits)
+        learnt = [None]
+        counter = 0
+        lit = None
+        index = len(self.trail) - 1
+        clause = conflict
+
+        while True:
+            for q in (clause if lit is None else clause[1:]):
+                v = q >> 1
+                if not seen[v] and level[v] > 0:
+                    seen[v] = True
+                    self._bump(v)
+                    if level[v] == current:
+                        counter += 1
+                    else:
+                        learnt.append(q)
+
+            while not seen[self.trail[index] >> 1]:
+                index -= 1
+            lit = self.trail[index]
+            index -= 1
+            clause = self.reason[lit >> 1]
+            seen[lit >> 1] = False
+            counter -= 1
+            if not counter:
+                break
+
+        learnt[0] = lit ^ 1
+        for q in learnt[1:]:
+            seen[q >> 1] = False
+
+        backtrack = 0
+        if len(learnt) > 1:
+            best = max(range(1, len(learnt)), key=lambda k: level[learnt[k] >> 1])
+            learnt[1], learnt[best] = learnt[best], learnt[1]
+            backtrack = level[learnt[1] >> 1]
+        return learnt, backtrack
+
+    def _backtrack(self, target):
+        if len(self.trail_limits) <= target:
+            return
+        start = self.trail_limits[target]
+        for lit in self.trail[start:]:
+            v = lit >> 1
+            self.value[lit] = self.value[lit ^ 1] = _UNASSIGNED
+            self.reason[v] = None
+            self.polarity[v] = lit & 1
+            heapq.heappush(self.heap, (-self.activity[v], v))
+        del self.trail[start:]
+        del self.trail_limits[target:]
+        self.queue_head = start
+
+    def _decide(self):
+        """ Branch on the unassigned variable of highest activity. Returns False if all are assigned. """
+        heap = self.heap
+        while heap:
+            activity, v = heapq.heappop(heap)
+            if self.value[2 * v] == _UNASSIGNED and -activity == self.activity[v]:
+                self.decisions += 1
+                self.trail_limits.append(len(self.trail))
+                self._enqueue(2 * v + self.polarity[v], None)
+                return True
+        for v in range(1, self.variables + 1):
+            if self.value[2 * v] == _UNASSIGNED:
+                heapq.heappush(heap, (-self.activity[v], v))
+                return self._decide()
+        return False
+
+    def _locked(self, clause):
+        return self.reason[clause[0] >> 1] is clause and self.value[clause[0]] == 1
+
+    def _reduce(self):
+        """ Drop the longer half of the learnt clauses that are not the reason of an assignment. """
+        self.learnts.sort(key=len)
+        keep = len(self.learnts) // 2
+        removed = set()
+        kept = self.learnts[:keep]
+        for clause in self.learnts[keep:]:
+            if self._locked(clause) or len(clause) <= 2:
+                kept.append(clause)
+            else:
+                removed.add(id(clause))
+        self.learnts = kept
+        for i, watchers in enumerate(self.watches):
+            if watchers:
+                self.watches[i] = [x for x in watchers if id(x) not in removed]
+
+    def solve(self, max_conflicts=None, stop=None):
+        """
+        :param max_conflicts: Conflicts before giving up, or None.
+        :param stop: Optional function of no arguments, called every STOP_INTERVAL conflicts.
+        :returns: True if satisfiable, with the assignment in model(); False if not.
+        :raises ConflictLimitError: If max_conflicts is reached first.
+        :raises StoppedError: If stop returns True first.
+        """
+        if self.unsatisfiable or self._propagate() is not None:
+            self.unsatisfiable = True
+            return False
+
+        restart = 0
+        restart_limit = RESTART_UNIT * _luby(restart)
+        restart_conflicts = 0
+        while True:
+            conflict = self._propagate()
+            if conflict is not None:
+                self.conflicts += 1
+                restart_conflicts += 1
+                if not self.trail_limits:
+                    self.unsatisfiable = True
+                    return False
+                if max_conflicts is not None and self.conflicts >= max_conflicts:
+                    self._backtrack(0)
+                    raise ConflictLimitError("No answer within %d conflicts." % max_conflicts)
+                if stop is not None and self.conflicts % STOP_INTERVAL == 0 and stop():
+                    self._backtrack(0)
+                    raise StoppedError("SAT solver stopped after %d conflicts." % self.conflicts)
+
+                learnt, backtrack = self._analyze(conflict)
+                self._backtrack(backtrack)
+                if len(learnt) == 1:
+                    self._enqueue(learnt[0], None)
+                else:
+                    self.learnts.append(learnt)
+                    self.watches[learnt[0]].append(learnt)
+                    self.watches[learnt[1]].append(learnt)
+                    self._enqueue(learnt[0], learnt)
+                self.variable_increment /= VARIABLE_DECAY
+
+            else:
+                if restart_conflicts >= restart_limit:
+                    restart += 1
+                    self.restarts += 1
+                    restart_limit = RESTART_UNIT * _luby(restart)
+                    restart_conflicts = 0
+                    self._backtrack(0)
+                    continue
+                if len(self.learnts) >= self.max_learnts:
+                    self._reduce()
+                    self.max_learnts *= 1.1
+                if not self._decide():
+                    return True
+
+    def model(self):
+        """ Dict of variable to value after solve returned True. """
+        return {v: self.value[2 * v] == 1 for v in range(1, self.variables + 1)}
+
+    def stats(self):
+        return {
+            'variables': self.variables,
+            'clauses': len(self.clauses),
+            'learnts': len(self.learnts),
+            'conflicts': self.conflicts,
+            'decisions': self.decisions,
+            'propagations': self.propagations,
+            'restarts': self.restarts,
+        }
+
+
+class CheckResult():
+    """
+    Outcome of is_tautology or equivalent. True if the check holds; otherwise counterexample
+    is a dict of symbol name to value on which it fails.
+    """
+    def __init__(self, valid, counterexample=None, stats=None):
+        self.valid = valid
+        self.counterexample = counterexample
+        self.stats = stats
+
+    def __bool__(self):
+        return self.valid
+
+    def __repr__(self):
+        if self.valid:
+            return 'CheckResult(True)'
+        return 'CheckResult(False, %r)' % self.counterexample
+
+
+def _symbol_names(*eqs):
+    names = set()
+    for eq in eqs:
+        if isinstance(eq, Equation):
+            names |= {x.symbol for x in eq.get_symbol_set()}
+    return names
+
+def satisfy(eq, max_conflicts=DEFAULT_MAX_CONFLICTS, stats=None, stop=None):
+    """
+    Find an assignment that makes eq true.
+
+    :param stats: Optional dict filled with the solver statistics.
+    :param stop: Optional function of no arguments that stops the solver, see Solver.solve.
+    :returns: Dict of symbol name to value, or None if eq is unsatisfiable.
+    :raises ConflictLimitError: If the solver reaches max_conflicts first.
+    """
+    cnf = CNF()
+    cnf.add([cnf.encode(eq)])
+    solver = Solver(cnf.variables, cnf.clauses)
+    try:
+        satisfiable = solver.solve(max_conflicts, stop)
+    finally:
+        if stats is not None:
+            stats.update(solver.stats())
+
+    if not satisfiable:
+        return None
+    model = solver.model()
+    assignment = {x: False for x in _symbol_names(eq)}
+    assignment.update((symbol, model[v]) for symbol, v in cnf.symbols.items())
+    return assignment
+
+def is_tautology(eq, max_conflicts=DEFAULT_MAX_CONFLICTS, stop=None):
+    """
+    Whether eq is true for every assignment, i.e. not eq is unsatisfiable.
+
+    :returns: CheckResult, with an assignment making eq false if it is not a tautology.
+    :raises ConflictLimitError: If the solver reaches max_conflicts first.
+    """
+    stats = {}
+    counterexample = satisfy(NotEq(eq) if isinstance(eq, Equation) else not eq, max_conflicts, stats, stop)
+    return CheckResult(counterexample is None, counterexample, stats)
+
+def equivalent(eq1, eq2, max_conflicts=DEFAULT_MAX_CONFLICTS, stop=None):
+    """
+    Whether eq1 and eq2 are equivalent, i.e. eq1 xor eq2 is unsatisfiable.
+
+    :returns: CheckResult, with an assignment on which they differ if they are not equivalent.
+        It sets every symbol of both equations.
+    :raises ConflictLimitError: If the solver reaches max_conflicts first.
+    """
+    stats = {}
+    counterexample = satisfy(NotEq(BiImpliesEq(eq1, eq2)), max_conflicts, stats, stop)
+    if counterexample is not None:
+        counterexample = dict(sorted(counterexample.items()))
+    return CheckResult(counterexample is None, counterexample, stats)
+
+def check_equivalence(eq1, eq2, max_conflicts=DEFAULT_MAX_CONFLICTS, stop=None):
+    """
+    Decide whether two equations are equivalent, for any number of symbols.
+
+    :raises NotEquivalentError: With a counterexample, if they differ.
+    :raises ConflictLimitError: If the solver reaches max_conflicts first.
+    """
+    result = equivalent(eq1, eq2, max_conflicts, stop)
+    if not result:
+        raise NotEquivalentError(eq1, eq2, result.counterexample)
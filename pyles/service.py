@@ -0,0 +1,513 @@
+"""
+Batch service that solves prove and simplify jobs in a pool of worker processes.
+
+Jobs arrive as JSON lines on stdin or a local socket, one object per line:
+
+    {"id": 1, "op": "prove", "eq": "a and b", "dest": "b and a", "timeout": 10}
+    {"id": 2, "op": "simplify", "eq": "a or (a and b)", "max_tests": 10000}
+    {"op": "cancel", "id": 1}
+    {"op": "metrics"}
+
+Each job gets one JSON line back, in completion order, with its id, status, result and proof.
+Jobs are keyed by their canonical equation strings, see pyles.cache.canonicalize, so jobs that
+differ only in symbol names share one search while in flight and one result cache entry after.
+
+Usage: python -m pyles.service [--workers N] [--socket PATH | --port N] [--timeout SECONDS]
+"""
+import argparse
+import asyncio
+import concurrent.futures
+import ctypes
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+from .cache import ResultCache, canonicalize, rename_symbols, DEFAULT_CACHE_SIZE
+from .parser import get_equation
+from .truthtable import NotEquivalentError
+from . import solve
+
+# Search parameters a job may set, with their types.
+JOB_PARAMS = {
+    'max_depth': int,
+    'max_tests': int,
+    'strategy': str,
+    'node_budget': int,
+    'metric': str,
+    'patience': int,
+}
+# JSON types a job id may have besides null; ids key the jobs in flight, so they must be hashable.
+JOB_ID_TYPES = (str, int)
+# Seconds a worker may overrun a job's timeout before the job is answered without it.
+TIMEOUT_GRACE = 1.0
+# Statuses of finished jobs whose results are cached.
+CACHED_STATUSES = solve._COMPLETE_STATUSES + ('not_equivalent',)
+
+# Cancel flags of the worker slots, set by the pool initializer in each worker.
+_cancel_flags = None
+
+
+def _valid_id(job_id):
+    return job_id is None or (isinstance(job_id, JOB_ID_TYPES) and not isinstance(job_id, bool))
+
+
+class Job():
+    """
+    A prove or simplify request.
+
+    Equations are held in canonical symbol names, with mapping from original to canonical names,
+    so equal jobs up to renaming have the same key.
+    """
+    def __init__(self, op, eqs, params=None, timeout=None, job_id=None):
+        """
+        :param op: 'prove' or 'simplify'.
+        :param eqs: List of Equation objects: start and destination for 'prove', the equation for 'simplify'.
+        :param params: Dict of search parameters, see JOB_PARAMS.
+        :param timeout: Seconds the search may run, or None.
+        :param job_id: Id echoed in the response.
+        """
+        self.op = op
+        self.params = params or {}
+        self.timeout = timeout
+        self.id = job_id
+        canonical_eqs, self.mapping = canonicalize(*eqs)
+        self.eq_strings = tuple(str(x) for x in canonical_eqs)
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        :param data: Decoded JSON job.
+        :raises ValueError: If the job is malformed, ParseError included.
+        """
+        op = data.get('op')
+        if op == 'prove':
+            names = ('eq', 'dest')
+        elif op == 'simplify':
+            names = ('eq',)
+        else:
+            raise ValueError("Unknown op: " + repr(op))
+
+        for name in names:
+            if not isinstance(data.get(name), str):
+                raise ValueError("Missing equation string: " + repr(name))
+        eqs = [get_equation(data[name]) for name in names]
+
+        job_id = data.get('id')
+        if not _valid_id(job_id):
+            raise ValueError("id must be a string, an integer or null.")
+
+        params = {}
+        for name, kind in JOB_PARAMS.items():
+            if data.get(name) is not None:
+                # JSON true and false are ints to Python.
+                if isinstance(data[name], bool) or not isinstance(data[name], kind):
+                    raise ValueError("%s must be %s." % (name, kind.__name__))
+                params[name] = data[name]
+
+        timeout = data.get('timeout')
+        if timeout is not None and (isinstance(timeout, bool) or not isinstance(timeout, (int, float))):
+            raise ValueError("timeout must be a number.")
+        return cls(op, eqs, params, timeout, job_id)
+
+    @property
+    def key(self):
+        """ Cache key: the operation, canonical equation strings and search parameters. """
+        return (self.op, self.eq_strings, tuple(sorted(self.params.items())))
+
+    def rename(self, eq_string):
+        """ Equation string in canonical names back in the job's own names. """
+        inverse = {canonical: symbol for symbol, canonical in self.mapping.items()}
+        return str(rename_symbols(get_equation(eq_string), inverse))
+
+
+class _SlotCancel():
+    """ Cancel flag of one worker slot in shared memory, in place of the threading.Event search expects. """
+    def __init__(self, slot):
+        self.slot = slot
+
+    def is_set(self):
+        return _cancel_flags is not None and bool(_cancel_flags[self.slot])
+
+
+def _init_worker(cancel_flags):
+    global _cancel_flags
+    _cancel_flags = cancel_flags
+
+def _solve(op, eq_strings, params, timeout, slot):
+    """
+    Worker: run one job in canonical names.
+
+    :returns: Dict of status, chain of (equation string, description) pairs or None, counterexample,
+        expanded and visited counts.
+    """
+    eqs = [get_equation(x) for x in eq_strings]
+    cancel = _SlotCancel(slot)
+    try:
+        if op == 'prove':
+            events = solve.search(eqs[0], eqs[1], time_budget=timeout, cancel=cancel, use_cache=False, **params)
+        else:
+            events = solve.search(eqs[0], None, simplify=True, semantic=True, time_budget=timeout, cancel=cancel,
+                                  use_cache=False, **params)
+        event = solve._finish(events)
+    except NotEquivalentError as e:
+        return {'status': 'not_equivalent', 'chain': None, 'counterexample': e.counterexample, 'expanded': 0, 'visited': 0}
+
+    chain = None
+    if event.result is not None:
+        # Rule names, as the proof store keeps them; str(func) would hold an address of this worker.
+        chain = [(str(x.eq), solve._stored_description(x.description)) for x in solve._history_chain(event.result)]
+    return {'status': event.status, 'chain': chain, 'counterexample': None, 'expanded': event.expanded,
+            'visited': event.visited}
+
+
+class _Run():
+    """ One search in flight and the number of jobs waiting on it. """
+    def __init__(self, task):
+        self.task = task
+        self.waiters = 0
+
+
+class Service():
+    """
+    Solves jobs in a process pool. Identical jobs in flight are merged into one search,
+    and finished results are kept in a ResultCache keyed by canonical equation strings.
+    The cache lives in the service's own process, not in the workers, which search without
+    one: a result found by any worker is stored here and answers every later job with the
+    same key before it reaches a worker.
+
+    Use as an async context manager, or call start and close.
+    """
+    def __init__(self, workers=None, cache_size=DEFAULT_CACHE_SIZE, timeout=None):
+        """
+        :param workers: Number of worker processes. Defaults to the CPU count.
+        :param cache_size: Results kept in the cache.
+        :param timeout: Default seconds per job, for jobs without their own timeout.
+        """
+        self.workers = workers or os.cpu_count()
+        self.timeout = timeout
+        self.cache = ResultCache(cache_size)
+
+        self._executor = None
+        self._cancel_flags = None
+        self._slots = None
+        self._inflight = {}
+        self._jobs = {}
+
+        self.start_time = None
+        self.submitted = 0
+        self.completed = 0
+        self.errors = 0
+        self.cancelled = 0
+        self.timeouts = 0
+        self.cache_hits = 0
+        self.merged = 0
+        self.searches = 0
+        self.queue_depth = 0
+        self.peak_queue_depth = 0
+        self.running = 0
+        self.total_latency = 0.0
+
+    async def start(self):
+        self._cancel_flags = multiprocessing.Array(ctypes.c_bool, self.workers, lock=False)
+        self._executor = concurrent.futures.ProcessPoolExecutor(self.workers, initializer=_init_worker,
+                                                                initargs=(self._cancel_flags,))
+        # Start the workers now, as forked workers started later would inherit client sockets
+        # and hold them open after the service closes them.
+        await asyncio.get_running_loop().run_in_executor(self._executor, os.getpid)
+        self._slots = asyncio.Queue()
+        for slot in range(self.workers):
+            self._slots.put_nowait(slot)
+        self.start_time = time.monotonic()
+        return self
+
+    async def close(self):
+        for run in list(self._inflight.values()):
+            run.task.cancel()
+        for slot in range(self.workers):
+            self._cancel_flags[slot] = True
+        if sys.version_info >= (3, 9):
+            self._executor.shutdown(wait=True, cancel_futures=True)
+        else:
+            # Jobs wait for a slot before they reach the executor, so none is queued in it.
+            self._executor.shutdown(wait=True)
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def _run(self, job):
+        """ Search for a job in a free worker slot. Returns the worker's outcome dict. """
+        loop = asyncio.get_running_loop()
+        self.queue_depth += 1
+        self.peak_queue_depth = max(self.peak_queue_depth, self.queue_depth)
+        try:
+            slot = await self._slots.get()
+        finally:
+            self.queue_depth -= 1
+
+        self._cancel_flags[slot] = False
+        self.running += 1
+        self.searches += 1
+        future = loop.run_in_executor(self._executor, _solve, job.op, job.eq_strings, job.params, job.timeout, slot)
+
+        def release(_):
+            # The slot is free once its worker returns, even if the job was answered before.
+            self.running -= 1
+            self._cancel_flags[slot] = False
+            self._slots.put_nowait(slot)
+        future.add_done_callback(release)
+
+        timeout = None if job.timeout is None else job.timeout + TIMEOUT_GRACE
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            self._cancel_flags[slot] = True
+            return {'status': 'timeout', 'chain': None, 'counterexample': None, 'expanded': 0, 'visited': 0}
+        except asyncio.CancelledError:
+            self._cancel_flags[slot] = True
+            raise
+
+    def _response(self, job, outcome, start, cached=False, merged=False):
+        proof = None
+        if outcome['chain'] is not None:
+            proof = [[job.rename(eq_string), description] for eq_string, description in outcome['chain']]
+        counterexample = None
+        if outcome['counterexample'] is not None:
+            inverse = {canonical: symbol for symbol, canonical in job.mapping.items()}
+            counterexample = {inverse.get(x, x): value for x, value in outcome['counterexample'].items()}
+
+        return {
+            'id': job.id,
+            'op': job.op,
+            'status': outcome['status'],
+            'result': proof[-1][0] if proof else None,
+            'proof': proof,
+            'counterexample': counterexample,
+            'expanded': outcome['expanded'],
+            'visited': outcome['visited'],
+            'cached': cached,
+            'merged': merged,
+            'elapsed': time.monotonic() - start,
+        }
+
+    async def solve(self, job):
+        """
+        Solve one job.
+
+        :param job: Job obj, or a decoded JSON dict.
+        :returns: Response dict. A malformed job gets status 'error' with the message in 'error'.
+        :raises asyncio.CancelledError: If the job is cancelled, see cancel.
+        """
+        start = time.monotonic()
+        self.submitted += 1
+        if not isinstance(job, Job):
+            try:
+                job = Job.from_dict(job)
+            except ValueError as e:
+                self.errors += 1
+                job_id = job.get('id') if isinstance(job, dict) else None
+                return {'id': job_id if _valid_id(job_id) else None, 'status': 'error', 'error': str(e)}
+        if job.timeout is None:
+            job.timeout = self.timeout
+
+        key = job.key
+        outcome = self.cache.get(key)
+        if outcome is not None:
+            self.cache_hits += 1
+            return self._finish(self._response(job, outcome, start, cached=True))
+
+        if job.id is not None:
+            self._jobs[job.id] = asyncio.current_task()
+        # Jobs only merge with searches given the same time to run.
+        run_key = key + (job.timeout,)
+        run = self._inflight.get(run_key)
+        merged = run is not None
+        if merged:
+            self.merged += 1
+        else:
+            run = _Run(asyncio.ensure_future(self._run(job)))
+            self._inflight[run_key] = run
+
+        run.waiters += 1
+        try:
+            outcome = await asyncio.shield(run.task)
+        except asyncio.CancelledError:
+            run.waiters -= 1
+            if not run.waiters:
+                run.task.cancel()
+                if self._inflight.get(run_key) is run:
+                    del self._inflight[run_key]
+            self.cancelled += 1
+            raise
+        except Exception as e:
+            self.errors += 1
+            return {'id': job.id, 'op': job.op, 'status': 'error', 'error': '%s: %s' % (type(e).__name__, e)}
+        finally:
+            if self._jobs.get(job.id) is asyncio.current_task():
+                del self._jobs[job.id]
+            if run.task.done() and self._inflight.get(run_key) is run:
+                del self._inflight[run_key]
+
+        if outcome['status'] in CACHED_STATUSES:
+            self.cache.put(key, outcome)
+        elif outcome['status'] == 'timeout':
+            self.timeouts += 1
+        return self._finish(self._response(job, outcome, start, merged=merged))
+
+    def _finish(self, response):
+        self.completed += 1
+        self.total_latency += response['elapsed']
+        return response
+
+    def cancel(self, job_id):
+        """
+        Cancel a job in flight. Its search stops once no other job is waiting on it.
+
+        :returns: True if the job was found.
+        """
+        task = self._jobs.pop(job_id, None)
+        if task is None:
+            return False
+        task.cancel()
+        return True
+
+    def metrics(self):
+        uptime = time.monotonic() - self.start_time if self.start_time is not None else 0.0
+        return {
+            'workers': self.workers,
+            'uptime': uptime,
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'errors': self.errors,
+            'cancelled': self.cancelled,
+            'timeouts': self.timeouts,
+            'cache_hits': self.cache_hits,
+            'merged': self.merged,
+            'searches': self.searches,
+            'queue_depth': self.queue_depth,
+            'peak_queue_depth': self.peak_queue_depth,
+            'running': self.running,
+            'in_flight': len(self._inflight),
+            'throughput': self.completed / uptime if uptime else 0.0,
+            'mean_latency': self.total_latency / self.completed if self.completed else 0.0,
+            'cache': self.cache.stats(),
+        }
+
+
+async def serve_lines(service, readline, write):
+    """
+    Answer JSON-lines jobs until readline returns an empty line, then wait for jobs in flight.
+
+    :param readline: Coroutine function returning the next line as str or bytes, empty at the end.
+    :param write: Function taking one response line.
+    """
+    pending = set()
+
+    def respond(data):
+        write(json.dumps(data) + '\n')
+
+    async def answer(data):
+        try:
+            respond(await service.solve(data))
+        except asyncio.CancelledError:
+            respond({'id': data.get('id'), 'status': 'cancelled'})
+
+    while True:
+        line = await readline()
+        if not line:
+            break
+        if isinstance(line, bytes):
+            line = line.decode()
+        if not line.strip():
+            continue
+
+        try:
+            data = json.loads(line)
+            if not isinstance(data, dict):
+                raise ValueError("Job must be a JSON object.")
+            if not _valid_id(data.get('id')):
+                raise ValueError("id must be a string, an integer or null.")
+        except ValueError as e:
+            respond({'id': None, 'status': 'error', 'error': str(e)})
+            continue
+
+        if data.get('op') == 'cancel':
+            if not service.cancel(data.get('id')):
+                respond({'id': data.get('id'), 'status': 'error', 'error': 'No such job in flight.'})
+        elif data.get('op') == 'metrics':
+            respond({'id': data.get('id'), 'status': 'metrics', 'metrics': service.metrics()})
+        else:
+            task = asyncio.ensure_future(answer(data))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+            # Let the job register its id before the next line, so it can be cancelled.
+            await asyncio.sleep(0)
+
+    if pending:
+        await asyncio.wait(pending)
+
+async def serve_stdin(service, stdin=None, stdout=None):
+    """ Answer jobs from stdin on stdout. stdin is read in a thread, so it may be a pipe or a file. """
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+    loop = asyncio.get_running_loop()
+
+    def write(line):
+        stdout.write(line)
+        stdout.flush()
+
+    await serve_lines(service, lambda: loop.run_in_executor(None, stdin.readline), write)
+
+async def serve_socket(service, path=None, port=None):
+    """
+    Answer jobs from connections to a Unix socket at path, or a TCP port on localhost, until cancelled.
+    Each connection is answered on its own stream.
+    """
+    async def handle(reader, writer):
+        try:
+            await serve_lines(service, reader.readline, lambda line: writer.write(line.encode()))
+            await writer.drain()
+        finally:
+            writer.close()
+
+    if path is not None:
+        server = await asyncio.start_unix_server(handle, path)
+    else:
+        server = await asyncio.start_server(handle, '127.0.0.1', port)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m pyles.service', description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes. Defaults to the CPU count.')
+    parser.add_argument('--socket', help='Serve on this Unix socket path instead of stdin.')
+    parser.add_argument('--port', type=int, help='Serve on this TCP port of localhost instead of stdin.')
+    parser.add_argument('--timeout', type=float, default=None, help='Default seconds per job.')
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_SIZE, help='Results kept in the cache.')
+    parser.add_argument('--metrics', action='store_true', help='Print metrics to stderr when done.')
+    args = parser.parse_args(argv)
+
+    async def run():
+        async with Service(args.workers, args.cache_size, args.timeout) as service:
+            try:
+                if args.socket is not None or args.port is not None:
+                    await serve_socket(service, args.socket, args.port)
+                else:
+                    await serve_stdin(service)
+            finally:
+                if args.metrics:
+                    print(json.dumps(service.metrics(), indent=2, sort_keys=True), file=sys.stderr)
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,62 +1,175 @@
-import copy
-import sys
+import collections
+import heapq
+import itertools
+import multiprocessing
+import os
+import time
 
 from .equation import Equation, AndEq, OrEq, NotEq, ImpliesEq, BiImpliesEq, SymbolEq
-from .identities import FUNC_LIST
+from .identities import FUNC_LIST, RULES
 from .database import SetDatabase
+from .truthtable import truth_table, check_equivalence, StoppedError
+from .heuristics import depth_heuristic, tree_edit_distance, get_metric, operator_cost, OPERATOR_COSTS
+from .cache import RESULT_CACHE, SUBTERM_CACHE, canonicalize, rename_symbols
+from .tree import SearchTree, TranspositionTable, DEFAULT_TABLE_SIZE, START
+from .minimize import minimize
+from . import bdd
+from . import sat
+from . import egraph
+from .parser import ParseError, parse_text, parse_equation, get_equation, parse_many
 
-sys.setrecursionlimit(100000000)
+try:
+    import resource
+except ImportError:
+    resource = None
 
 DEFAULT_MAX_DEPTH = 22
 DEFAULT_MAX_TESTS = 1000000
+# Frontiers smaller than this are expanded in the coordinating process.
+PARALLEL_MIN_FRONTIER = 64
+DEFAULT_PROGRESS_INTERVAL = 10000
+# Equations each local search of 'bottom_up' may test, and nodes it may grow its subterm by.
+BOTTOM_UP_TESTS = 500
+BOTTOM_UP_SLACK = 2
 
 
 class EquationHistory():
+    """
+    One step of a proof: an equation, the rule that produced it and the previous step.
+    Steps only link to their parent, so a search's dead branches are freed as it goes.
+    """
+    __slots__ = ('eq', 'description', 'parent')
+
     def __init__(self, eq, description, parent):
         self.eq = eq
         self.description = description
         self.parent = parent
-        self.children = []
-        self.exhausted = False
-
-        if parent:
-            parent.children.append(self)
 
     def __repr__(self):
-        text = ''
-        if self.parent:
-            text += str(self.parent)
-        return text + str(self.eq) + ' by ' + self.description + '\n'
+        return ''.join(str(x.eq) + ' by ' + x.description + '\n' for x in _history_chain(self))
+
+def _history_chain(eq_history):
+    """ List of EquationHistory objects from the start equation to eq_history. """
+    chain = []
+    while eq_history:
+        chain.append(eq_history)
+        eq_history = eq_history.parent
+    chain.reverse()
+    return chain
+
+def _cache_key(kind, eq_list, *params):
+    canonical_list, mapping = canonicalize(*eq_list)
+    return (kind, tuple(str(x) for x in canonical_list)) + params, mapping
+
+def _store_result(key, mapping, eq_history, cache=RESULT_CACHE):
+    chain = tuple((rename_symbols(x.eq, mapping), x.description) for x in _history_chain(eq_history))
+    cache.put(key, chain)
+
+def _load_result(chain, mapping):
+    inverse = {canonical: symbol for symbol, canonical in mapping.items()}
+    eq_history = None
+    for eq, description in chain:
+        eq_history = EquationHistory(rename_symbols(eq, inverse), description, eq_history)
+    return eq_history
+
+def _stored_description(description):
+    """ Description of a proof step as stored: the identity name in place of str(func), which holds an address. """
+    for func in FUNC_LIST:
+        if str(func) == description:
+            return func.__name__
+    return description
+
+def _loaded_description(description):
+    """ Inverse of _stored_description in this process. """
+    for func in FUNC_LIST:
+        if func.__name__ == description:
+            return str(func)
+    return description
+
+def _load_proof(chain):
+    """ Rebuild an EquationHistory chain from the (equation string, description) pairs of a stored proof. """
+    eq_history = None
+    for eq_string, description in chain:
+        eq_history = EquationHistory(get_equation(eq_string), _loaded_description(description), eq_history)
+    return eq_history
+
+def _subterm_at(eq, path):
+    """ Subterm of eq at a path, a tuple of argument indexes. """
+    for i in path:
+        eq = eq._arg_list[i]
+    return eq
+
+def _replace_at(eq, path, new_node):
+    """ eq with the subterm at a path replaced, sharing every other subtree. """
+    nodes = []
+    for i in path:
+        nodes.append(eq)
+        eq = eq._arg_list[i]
+    for node, i in zip(reversed(nodes), reversed(path)):
+        arg_list = list(node._arg_list)
+        arg_list[i] = new_node
+        new_node = type(node)(*arg_list)
+    return new_node
 
 def get_depth(eq):
-    if isinstance(eq, SymbolEq):
-        return 1
-    elif not isinstance(eq, Equation):
-        return 0
-
-    sum = 0
-    for x in eq._arg_list:
-        sum += get_depth(x)
-    
-    return sum + 1
-
-def copy_eq(eq):
-    if isinstance(eq, NotEq):
-        return NotEq(copy_eq(eq.arg1))
-    elif isinstance(eq, AndEq):
-        return AndEq(copy_eq(eq.arg1), copy_eq(eq.arg2))
-    elif isinstance(eq, OrEq):
-        return OrEq(copy_eq(eq.arg1), copy_eq(eq.arg2))
-    elif isinstance(eq, ImpliesEq):
-        return ImpliesEq(copy_eq(eq.arg1), copy_eq(eq.arg2))
-    elif isinstance(eq, BiImpliesEq):
-        return BiImpliesEq(copy_eq(eq.arg1), copy_eq(eq.arg2))
-    elif isinstance(eq, SymbolEq):
-        return eq
-    else:
-        return eq
+    if isinstance(eq, Equation):
+        return eq.depth
+    return 0
 
 
+def _rewrite_positions(eq, max_depth, rewrite, bucket_count):
+    """
+    Visit every compound subterm of eq once, in preorder, and rewrite it.
+    The depth of each result is known from the cached depths before it is built, so
+    results over max_depth are dropped, and subterms too deep for any result are skipped.
+
+    :param rewrite: Function of a subterm returning a list of (bucket, new subterm) pairs.
+    :returns: Tuple of the visited positions, as (subterm, parent position, argument index),
+        and bucket_count lists of (position, new subterm) pairs, for _build_variation.
+    """
+    positions = []
+    buckets = [[] for _ in range(bucket_count)]
+    if isinstance(eq, SymbolEq) or not isinstance(eq, Equation):
+        return positions, buckets
+
+    root_depth = eq.depth
+    stack = [(eq, -1, 0)]
+    while stack:
+        node, parent, arg_index = stack.pop()
+        # Even a rewrite to a constant would leave the equation over max_depth, here and below.
+        if root_depth - node.depth > max_depth:
+            continue
+
+        position = len(positions)
+        positions.append((node, parent, arg_index))
+
+        for i, new_node in rewrite(node):
+            # Rewrites to False have never been kept as variations.
+            if new_node is False or root_depth - node.depth + get_depth(new_node) > max_depth:
+                continue
+            buckets[i].append((position, new_node))
+
+        for i in range(len(node._arg_list) - 1, -1, -1):
+            arg = node._arg_list[i]
+            if not isinstance(arg, SymbolEq) and isinstance(arg, Equation):
+                stack.append((arg, position, i))
+
+    return positions, buckets
+
+def _build_variation(positions, position, new_node):
+    """
+    Replace the subterm at a position, copying only the path from the root to it;
+    every other subtree is shared.
+    """
+    _, up, index = positions[position]
+    while up >= 0:
+        parent_node, next_up, next_index = positions[up]
+        arg_list = list(parent_node._arg_list)
+        arg_list[index] = new_node
+        new_node = type(parent_node)(*arg_list)
+        up, index = next_up, next_index
+    return new_node
+
 def get_variations(func, eq, max_depth=DEFAULT_MAX_DEPTH):
     """
     Gets all the variations of an equation when a function is applied.
@@ -67,254 +180,1045 @@ def get_variations(func, eq, max_depth=DEFAULT_MAX_DEPTH):
     :param eq: Equation to modify.
     :returns: List of Eq objects.
     """
-    
-    variation_list = []
-    if not isinstance(eq, SymbolEq) and isinstance(eq, Equation):
-        # Apply to main eq
-        new_eq = func(eq)
-        if new_eq and get_depth(new_eq) <= max_depth:
-            variation_list.append(new_eq)
-        
-        # Apply to all arguments
-        for i, arg in enumerate(eq._arg_list):
-            if not isinstance(arg, SymbolEq) and isinstance(arg, Equation):
-                # Recursively get all variations of arg
-                arg_var_list = get_variations(func, arg)
-                if arg_var_list:
-                    for var in arg_var_list:
-                        # Create new eq and change its variable
-                        new_eq = copy_eq(eq)
-                        new_eq._arg_list[i] = var
+    def rewrite(node):
+        new_node = func(node)
+        return [] if new_node is None else [(0, new_node)]
 
-                        if get_depth(new_eq) <= max_depth:
-                            variation_list.append(new_eq)
-                            
-    return variation_list
+    positions, buckets = _rewrite_positions(eq, max_depth, rewrite, 1)
+    return [_build_variation(positions, position, new_node) for position, new_node in buckets[0]]
 
-def prove(eq1, dest_eq, database=SetDatabase(), simplify=False, max_depth=DEFAULT_MAX_DEPTH, max_tests=DEFAULT_MAX_TESTS):
+def iter_all_variations(eq, max_depth=DEFAULT_MAX_DEPTH, lemmas=None):
     """
-    Attempts to prove that eq1=eq2 through logical equivalences.
-    Performs a breadth-first search.
+    Generator form of get_all_variations. Subterms are matched up front, but each variation
+    is only built when it is reached, so a search that stops early skips the rest.
+    """
+    if lemmas is None:
+        positions, buckets = _rewrite_positions(eq, max_depth, RULES.match, len(FUNC_LIST))
+    else:
+        offset = len(FUNC_LIST)
+        lemma_rules = lemmas.rules
 
-    :param eq1: Equation that will be modified.
-    :param dest_eq: Destination equation.
-    :param database: Database to keep track of tested equations.
-    :param simplify: If true, function will not stop until MAX_TESTS reached or all variations have been checked.
-    :param max_depth: Max depth of variations to check.
-    :param max_tests: Max amount to equations to test. ONLY works when simplify=True.
+        def rewrite(node):
+            return RULES.match(node) + [(offset + i, x) for i, x in lemma_rules.match(node)]
 
-    :returns: An equation history obj. The matching equation if found, otherwise the top equation.
+        positions, buckets = _rewrite_positions(eq, max_depth, rewrite, offset + len(lemma_rules.functions))
+    for i, bucket in enumerate(buckets):
+        for position, new_node in bucket:
+            yield i, _build_variation(positions, position, new_node)
+
+def get_all_variations(eq, max_depth=DEFAULT_MAX_DEPTH, lemmas=None):
     """
-    dest_eq_str = str(dest_eq)
-    
-    top_node = EquationHistory(eq1, 'start', None)
-    search_list = [top_node]
+    Gets the variations of an equation for every function in FUNC_LIST in one pass,
+    matching each subterm against the compiled rules once.
 
-    curr_history = top_node
+    :param eq: Equation to modify.
+    :param lemmas: Optional pyles.lemmas.LemmaLibrary whose lemmas are applied as well,
+        with indexes following FUNC_LIST, see _describe.
+    :returns: List of (FUNC_LIST index, Eq) pairs, in the same order as calling
+        get_variations with each function of FUNC_LIST in turn.
+    """
+    return list(iter_all_variations(eq, max_depth, lemmas))
 
-    while True:
-        # Apply every function to current eq
-        for func in FUNC_LIST:
-            variation_list = get_variations(func, curr_history.eq, max_depth)
+def _describe(i, lemmas=None):
+    """ Proof step description of a variation index: a FUNC_LIST function, or a lemma past its end. """
+    if i < len(FUNC_LIST):
+        return str(FUNC_LIST[i])
+    return lemmas.description(i - len(FUNC_LIST))
 
-            for var in variation_list:
-                var_str = str(var)
 
-                # If variation matches destination eq, or we are simplifying and the eq is as small as possible
-                if var_str == dest_eq_str or (simplify and (isinstance(var, bool) or isinstance(var, SymbolEq))):
-                    print('finished', len(search_list))
-                    return EquationHistory(var, str(func), curr_history)
-
-                # Else if the variation is not in the tested set
-                elif not database.eq_exists(var_str):
-                    database.add_eq(var_str)
-
-                    new_hist = EquationHistory(var, str(func), curr_history)
-                    search_list.append(new_hist)
-
-                    # If trying to simplify and max_tests exceeded, abort
-                    test_count = database.get_test_count()
-                    if simplify and test_count > max_tests:
-                        print('max tests')
-                        return top_node
-
-                    if test_count % 100000 == 0:
-                        print(test_count)
-
-        # Remove first node since all variations are catalogued
-        # And attempt to select the next node, otherwise return
-        del search_list[0]
-        if len(search_list) > 0:
-            curr_history = search_list[0]
+class SearchEvent():
+    """
+    Progress report of a running search.
+
+    kind is 'progress' for periodic reports and 'finished' for the last event, which also
+    carries status and result. status is one of:
+        'found'         the destination, or when simplifying a bool or symbol, was reached.
+        'exhausted'     every reachable equation was tested.
+        'max_tests'     max_tests equations were tested while simplifying.
+        'truth_table'   the simplified result was read from the truth table.
+        'minimized'     the simplified result is a two-level minimization, see pyles.minimize.
+        'composed'      every subterm was simplified bottom-up, see simplify.
+        'saturated'     no rule adds anything to the e-graph of strategy 'egraph'.
+        'egraph_limit'  the e-graph reached its node or iteration limit.
+        'max_depth'     'iddfs' searched proofs of max_depth steps with a transposition table that lost
+                        equations, so it cannot tell whether longer proofs exist.
+        'no_improvement' patience expansions passed without a smaller equation while simplifying.
+        'cached'        the result came from pyles.cache.RESULT_CACHE.
+        'stored'        the proof came from the database's proof store.
+        'timeout', 'node_budget', 'memory_budget', 'cancelled'
+                        the search was stopped early; result is the best partial result.
+    """
+    __slots__ = ('kind', 'expanded', 'frontier', 'visited', 'best_depth', 'elapsed', 'status', 'result')
+
+    def __init__(self, kind, expanded, frontier, visited, best_depth, elapsed, status=None, result=None):
+        self.kind = kind
+        self.expanded = expanded
+        self.frontier = frontier
+        self.visited = visited
+        self.best_depth = best_depth
+        self.elapsed = elapsed
+        self.status = status
+        self.result = result
+
+    def __repr__(self):
+        text = '%s: expanded=%d frontier=%d visited=%d best_depth=%s elapsed=%.3fs' % (
+            self.kind, self.expanded, self.frontier, self.visited, self.best_depth, self.elapsed)
+        if self.status:
+            text += ' status=' + self.status
+        return text
+
+def _memory_usage():
+    """ Resident memory of this process in bytes, or its peak where the current value is unavailable. """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        if resource is None:
+            return 0
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+class SearchMonitor():
+    """
+    Counts the equations a search expands, checks its budgets and cancellation,
+    and produces its progress events.
+    """
+    def __init__(self, database, time_budget=None, node_budget=None, memory_budget=None, cancel=None,
+                 progress_interval=DEFAULT_PROGRESS_INTERVAL, metric=None, patience=None):
+        """
+        :param time_budget: Seconds of wall-clock time the search may run.
+        :param node_budget: Number of equations the search may expand.
+        :param memory_budget: Resident memory in bytes above which the search stops.
+            Checked every progress_interval expansions.
+        :param cancel: threading.Event that stops the search when set, from any thread.
+        :param progress_interval: Expansions between progress events.
+        :param metric: Size metric that decides the smallest equation, see pyles.heuristics.get_metric.
+        :param patience: Expansions without a smaller equation after which the search stops, or None.
+        """
+        self.database = database
+        self.time_budget = time_budget
+        self.node_budget = node_budget
+        self.memory_budget = memory_budget
+        self.cancel = cancel
+        self.progress_interval = progress_interval
+        self.metric = get_metric(metric)
+        self.patience = patience
+
+        self.start_time = time.monotonic()
+        self.expanded = 0
+        self.frontier = 0
+        self.best_size = None
+        self.best_depth = None
+        self.last_improvement = 0
+        self.status = None
+
+    def tick(self, frontier_size, count=1):
+        """
+        Call before expanding count equations.
+        Sets status if the search must stop instead.
+
+        :returns: A progress event when a progress_interval boundary is crossed, otherwise None.
+        """
+        self.frontier = frontier_size
+        if self.cancel is not None and self.cancel.is_set():
+            self.status = 'cancelled'
+        elif self.node_budget is not None and self.expanded + count > self.node_budget:
+            self.status = 'node_budget'
+        elif self.time_budget is not None and time.monotonic() - self.start_time > self.time_budget:
+            self.status = 'timeout'
+        elif self.patience is not None and self.expanded - self.last_improvement >= self.patience:
+            self.status = 'no_improvement'
+        if self.status:
+            return None
+
+        self.expanded += count
+        if self.expanded // self.progress_interval != (self.expanded - count) // self.progress_interval:
+            if self.memory_budget is not None and _memory_usage() > self.memory_budget:
+                self.status = 'memory_budget'
+            return self.event('progress')
+
+    def stopped(self):
+        """
+        Check cancellation, the time budget and the memory budget without counting an expansion.
+        Passed as the stop callback of the checks that run before the search, see _precheck.
+
+        :returns: True, with status set, if the search must stop.
+        """
+        if self.status:
+            return True
+        if self.cancel is not None and self.cancel.is_set():
+            self.status = 'cancelled'
+        elif self.time_budget is not None and time.monotonic() - self.start_time > self.time_budget:
+            self.status = 'timeout'
+        elif self.memory_budget is not None and _memory_usage() > self.memory_budget:
+            self.status = 'memory_budget'
+        return self.status is not None
+
+    def improve(self, eq):
+        """
+        Record a new equation. Returns True if it is the smallest so far under the metric;
+        of equally small equations the first is kept.
+        """
+        size = self.metric(eq)
+        if self.best_size is None or size < self.best_size:
+            self.best_size = size
+            self.best_depth = get_depth(eq)
+            self.last_improvement = self.expanded
+            return True
+        return False
+
+    def event(self, kind, status=None, result=None):
+        return SearchEvent(kind, self.expanded, self.frontier, self.database.get_test_count(), self.best_depth,
+                           time.monotonic() - self.start_time, status, result)
+
+def _append_reversed(eq_history, back_history):
+    """
+    Append a backward search path to a forward one.
+
+    :param eq_history: Forward EquationHistory ending at the meeting equation.
+    :param back_history: Backward EquationHistory of the same equation, leading back to the destination.
+    :returns: EquationHistory of the destination, chained through eq_history.
+    """
+    while back_history.parent:
+        # The rule that led from parent to child backward links child to parent forward.
+        eq_history = EquationHistory(back_history.parent.eq, back_history.description, eq_history)
+        back_history = back_history.parent
+
+    return eq_history
+
+def _expand_level(frontier, seen, other_seen, database, max_depth, monitor, best, lemmas):
+    """
+    Expand one breadth-first level of a bidirectional search.
+    Generator of progress events.
+
+    :param frontier: List of EquationHistory objects to expand.
+    :param seen: Dict of equation to EquationHistory for this direction.
+    :param other_seen: Dict of equation to EquationHistory for the opposite direction.
+    :param best: One-item list holding the smallest forward EquationHistory, or None for the backward direction.
+    :returns: Tuple of the next frontier and a (history, other_history) pair if the searches met, else None.
+    """
+    next_frontier = []
+    for j, curr_history in enumerate(frontier):
+        event = monitor.tick(len(frontier) - j + len(next_frontier))
+        if event:
+            yield event
+        if monitor.status:
+            break
+
+        for i, var in iter_all_variations(curr_history.eq, max_depth, lemmas):
+            if var in seen:
+                continue
+
+            new_hist = EquationHistory(var, _describe(i, lemmas), curr_history)
+            if var in other_seen:
+                return next_frontier, (new_hist, other_seen[var])
+
+            seen[var] = new_hist
+            database.add_eq(database.key(var))
+            next_frontier.append(new_hist)
+
+            if best is not None and monitor.improve(var):
+                best[0] = new_hist
+
+    return next_frontier, None
+
+def _search_bidirectional(eq1, dest_eq, database, max_depth, monitor, lemmas):
+    """
+    Grow breadth-first frontiers from both eq1 and dest_eq, always expanding the smaller one,
+    until they share an equation. Every identity is an equivalence, so the backward half is
+    reversed onto the forward half with its rule labels kept.
+    """
+    # Equations are hash-consed, so they key the seen dicts without building strings.
+    forward_seen = {eq1: EquationHistory(eq1, 'start', None)}
+    backward_seen = {dest_eq: EquationHistory(dest_eq, 'start', None)}
+
+    best = [forward_seen[eq1]]
+    monitor.improve(eq1)
+    if eq1 in backward_seen:
+        return best[0], 'found'
+
+    forward_frontier = list(forward_seen.values())
+    backward_frontier = list(backward_seen.values())
+
+    while forward_frontier or backward_frontier:
+        if forward_frontier and (not backward_frontier or len(forward_frontier) <= len(backward_frontier)):
+            forward_frontier, meet = yield from _expand_level(forward_frontier, forward_seen, backward_seen, database,
+                                                              max_depth, monitor, best, lemmas)
+            if meet:
+                return _append_reversed(meet[0], meet[1]), 'found'
         else:
-            if simplify:
-                print('list empty', len(tested_set))
-                return top_node
-            else:
-                raise Exception("Proof failed.")
-
-def parse_text(text):
-    """
-    Parse the string into a list of lists.
-
-    Ex. "S and (P or R)" -> ['S', 'and' ['P', 'or' 'R']]
-
-    :param text: Text to parse.
-    :returns: List of items, with subitems as sublitsts.
-    """
-    parse_list = []
-    open_count = 0
-    sub = ''
-    for c in text:
-        if c == '(':
-            if open_count >= 1:
-                sub += c
-            open_count += 1
-        elif c == ')':
-            if open_count >= 1:
-                sub += c
-            open_count -= 1
-
-            if open_count == 0:
-                parse_list.append(parse_text(sub))
-                sub = ''
-
-        elif open_count > 0:
-            sub += c
-        elif c == ' ':
-            new_word = True
+            backward_frontier, meet = yield from _expand_level(backward_frontier, backward_seen, forward_seen, database,
+                                                               max_depth, monitor, None, lemmas)
+            if meet:
+                return _append_reversed(meet[1], meet[0]), 'found'
+
+        if monitor.status:
+            return best[0], monitor.status
+
+    return best[0], 'exhausted'
+
+def _search_best_first(eq1, dest_eq, database, simplify, max_depth, max_tests, monitor, heuristic, admissible, weight, lemmas):
+    """
+    Expand the queued equation with the lowest cost first.
+    Ties are broken by insertion order, so the search is deterministic.
+
+    When admissible, equations are ordered by proof length and the heuristic only breaks ties,
+    so the search stays breadth-first and proofs stay shortest. The identities can remove whole
+    subtrees in one step, so no size-based heuristic bounds the remaining proof length by itself.
+    """
+    if heuristic is None:
+        heuristic = depth_heuristic if dest_eq is None else tree_edit_distance
+
+    counter = itertools.count()
+
+    def push(eq_history, length):
+        h = heuristic(eq_history.eq, dest_eq)
+        if admissible:
+            priority = (length, h)
         else:
-            if len(parse_list) == 0 or new_word:
-                parse_list.append(c)
-                new_word = False
-            else:
-                parse_list[len(parse_list) - 1] += c
-    
-    return parse_list
-
-def parse_equation(parse_list, symbol_list=[]):
-    """
-    Parse equation list into an Equation object.
-    Reuses equivalent symbols so all similar symbols are the same reference.
-
-    :param parse_list: Parse list returned from parse_text.
-    :param symbol_list: List of SymbolEq objects that have already been created.
-    :returns: A single Equation obj, with appropriate Equations as arguments.
-    """
-    if len(parse_list) == 0:
-        return parse_list[0]
-
-    for i, x in enumerate(parse_list):
-        if isinstance(x, list):
-            parse_list[i] = parse_equation(x, symbol_list)
-
-    if len(parse_list) == 0:
-        return parse_list[0]
-
-    # Convert all symbol and boolean tokens first.
-    for i, x in enumerate(parse_list):
-        if x == 'True':
-            parse_list[i] = True
-        elif x == 'False':
-            parse_list[i] = False
-        elif x not in ('not', 'and', 'or', '->', '<->') and not isinstance(x, Equation):
-            if x in (sym.symbol for sym in symbol_list):
-                parse_list[i] = next(sym for sym in symbol_list if sym.symbol == x)
+            priority = (length + weight * h, h)
+        heapq.heappush(queue, (priority, next(counter), length, eq_history))
+
+    top_node = EquationHistory(eq1, 'start', None)
+    best = top_node
+    monitor.improve(eq1)
+    queue = []
+    push(top_node, 0)
+
+    while queue:
+        event = monitor.tick(len(queue))
+        if event:
+            yield event
+        if monitor.status:
+            return best, monitor.status
+
+        _, _, length, curr_history = heapq.heappop(queue)
+
+        for i, var in iter_all_variations(curr_history.eq, max_depth, lemmas):
+            if var is dest_eq or (simplify and (isinstance(var, bool) or isinstance(var, SymbolEq))):
+                return EquationHistory(var, _describe(i, lemmas), curr_history), 'found'
+
+            var_key = database.key(var)
+            if not database.eq_exists(var_key):
+                database.add_eq(var_key)
+                new_hist = EquationHistory(var, _describe(i, lemmas), curr_history)
+                push(new_hist, length + 1)
+
+                if monitor.improve(var):
+                    best = new_hist
+
+                if simplify and database.get_test_count() > max_tests:
+                    return best, 'max_tests'
+
+    return best, 'exhausted'
+
+def _expand_batch(args):
+    """
+    Worker for parallel search. Applies every function to every equation of a batch.
+
+    :param args: Tuple of a list of equations and the max depth.
+    :returns: List with, for each equation, a list of (function index, variation) pairs in FUNC_LIST order.
+    """
+    eq_list, max_depth = args
+    return [get_all_variations(eq, max_depth) for eq in eq_list]
+
+def _search_parallel(eq1, dest_eq, database, simplify, max_depth, max_tests, monitor, processes, batch_size):
+    """
+    Level-synchronous breadth-first search. Each level is split into batches that worker
+    processes expand, and the results are merged in frontier order, so equations are tested
+    in the same order as the serial search and the same proof is found.
+    Budgets are checked once per level.
+    """
+    processes = processes or os.cpu_count()
+    top_node = EquationHistory(eq1, 'start', None)
+    best = top_node
+    monitor.improve(eq1)
+    frontier = [top_node]
+
+    with multiprocessing.Pool(processes) as pool:
+        while frontier:
+            event = monitor.tick(len(frontier), len(frontier))
+            if event:
+                yield event
+            if monitor.status:
+                return best, monitor.status
+
+            eq_list = [x.eq for x in frontier]
+            if len(eq_list) < PARALLEL_MIN_FRONTIER:
+                results = _expand_batch((eq_list, max_depth))
             else:
-                parse_list[i] = SymbolEq(x)
-                symbol_list.append(parse_list[i])
-    
-    # Convert the rest in order of precedence.
-
-    # While there is a token in the parse_list.
-    while 'not' in parse_list:
-        for i, x in enumerate(parse_list):
-            if x == 'not':
-                # Replace the token with the Equation obj, and the arguments consumed with None.
-                parse_list[i] = NotEq(parse_list[i + 1])
-                parse_list[i + 1] = None
-                break
-        
-        # Filter the parse_list so to remove any consumed tokens.
-        parse_list = list(filter(None, parse_list))
-
-    if len(parse_list) == 0:
-        return parse_list[0]
-    
-    while 'and' in parse_list:
-        for i, x in enumerate(parse_list):
-            if x == 'and':
-                parse_list[i] = AndEq(parse_list[i - 1], parse_list[i + 1])
-                parse_list[i - 1] = None
-                parse_list[i + 1] = None
+                size = batch_size or -(-len(eq_list) // (processes * 4))
+                batches = [(eq_list[i:i + size], max_depth) for i in range(0, len(eq_list), size)]
+                results = [x for batch in pool.map(_expand_batch, batches) for x in batch]
+
+            # Goal check and in-level dedup in serial order, then one batched database round trip.
+            candidates = {}
+            for curr_history, variation_list in zip(frontier, results):
+                for i, var in variation_list:
+                    if var is dest_eq or (simplify and (isinstance(var, bool) or isinstance(var, SymbolEq))):
+                        return EquationHistory(var, str(FUNC_LIST[i]), curr_history), 'found'
+
+                    elif var not in candidates:
+                        candidates[var] = (i, curr_history)
+
+            keys = [database.key(x) for x in candidates]
+            exists = database.exists_many(keys)
+            new = [(var, key) for var, key, found in zip(candidates, keys, exists) if not found]
+            if simplify:
+                # Stop at the same equation as the serial search would.
+                new = new[:max(max_tests + 1 - database.get_test_count(), 0)]
+            database.add_many([key for _, key in new])
+
+            frontier = []
+            for var, _ in new:
+                i, curr_history = candidates[var]
+                new_hist = EquationHistory(var, str(FUNC_LIST[i]), curr_history)
+                frontier.append(new_hist)
+
+                if monitor.improve(var):
+                    best = new_hist
+
+            if simplify and database.get_test_count() > max_tests:
+                return best, 'max_tests'
+
+    return best, 'exhausted'
+
+def _search_bfs(eq1, dest_eq, database, simplify, max_depth, max_tests, monitor, lemmas):
+    """
+    Breadth-first search forward from eq1.
+    The new equations of each level are checked and added with one batched database round trip.
+    """
+    top_node = EquationHistory(eq1, 'start', None)
+    best = top_node
+    monitor.improve(eq1)
+    frontier = [top_node]
+
+    while frontier:
+        # Variations not seen earlier in this level, with the rule and equation they came from.
+        candidates = {}
+        for n, curr_history in enumerate(frontier):
+            event = monitor.tick(len(frontier) - n + len(candidates))
+            if event:
+                yield event
+            if monitor.status:
                 break
-        
-        parse_list = list(filter(None, parse_list))
-
-    if len(parse_list) == 0:
-        return parse_list[0]
-    
-    while 'or' in parse_list:
-        for i, x in enumerate(parse_list):
-            if x == 'or':
-                parse_list[i] = OrEq(parse_list[i - 1], parse_list[i + 1])
-                parse_list[i - 1] = None
-                parse_list[i + 1] = None
+
+            # Apply every function to current eq
+            for i, var in iter_all_variations(curr_history.eq, max_depth, lemmas):
+                # If variation matches destination eq, or we are simplifying and the eq is as small as possible
+                if var is dest_eq or (simplify and (isinstance(var, bool) or isinstance(var, SymbolEq))):
+                    return EquationHistory(var, _describe(i, lemmas), curr_history), 'found'
+
+                elif var not in candidates:
+                    candidates[var] = (i, curr_history)
+
+        keys = [database.key(x) for x in candidates]
+        exists = database.exists_many(keys)
+        new = [(var, key) for var, key, found in zip(candidates, keys, exists) if not found]
+        if simplify:
+            # If trying to simplify, stop once max_tests is exceeded
+            new = new[:max(max_tests + 1 - database.get_test_count(), 0)]
+        database.add_many([key for _, key in new])
+
+        frontier = []
+        for var, _ in new:
+            i, curr_history = candidates[var]
+            new_hist = EquationHistory(var, _describe(i, lemmas), curr_history)
+            frontier.append(new_hist)
+
+            if monitor.improve(var):
+                best = new_hist
+
+        if monitor.status:
+            return best, monitor.status
+        if simplify and database.get_test_count() > max_tests:
+            return best, 'max_tests'
+
+    return best, 'exhausted'
+
+def _search_bfs_compact(eq1, dest_eq, database, simplify, max_depth, max_tests, monitor, stats, lemmas):
+    """
+    Breadth-first search forward from eq1, storing the search tree in a SearchTree.
+    Branches are freed once they are fully expanded, and EquationHistory objects are only
+    built for the returned path. The smallest equation so far is pinned in the tree.
+    """
+    rule_list = FUNC_LIST
+    if lemmas is not None:
+        rule_list = [_describe(i, lemmas) for i in range(len(FUNC_LIST) + len(lemmas.rules.functions))]
+    tree = SearchTree(rule_list)
+    queue = collections.deque([tree.add(eq1, START, -1)])
+
+    best = queue[0]
+    tree.pin(best)
+    monitor.improve(eq1)
+
+    try:
+        while queue:
+            event = monitor.tick(len(queue))
+            if event:
+                yield event
+            if monitor.status:
+                return tree.history(best, EquationHistory), monitor.status
+
+            index = queue.popleft()
+            eq = tree.eqs[index]
+
+            for i, var in iter_all_variations(eq, max_depth, lemmas):
+
+                if var is dest_eq or (simplify and (isinstance(var, bool) or isinstance(var, SymbolEq))):
+                    return EquationHistory(var, _describe(i, lemmas), tree.history(index, EquationHistory)), 'found'
+
+                var_key = database.key(var)
+                if not database.eq_exists(var_key):
+                    database.add_eq(var_key)
+                    child = tree.add(var, i, index)
+                    queue.append(child)
+
+                    if monitor.improve(var):
+                        tree.pin(child)
+                        tree.release(best)
+                        best = child
+
+                    if simplify and database.get_test_count() > max_tests:
+                        return tree.history(best, EquationHistory), 'max_tests'
+
+            # Drop the waiting reference; frees the branch if nothing below it is still queued.
+            tree.release(index)
+
+        return tree.history(best, EquationHistory), 'exhausted'
+
+    finally:
+        if stats is not None:
+            stats.update(tree.memory_usage())
+
+def _path_history(path, lemmas=None):
+    """ EquationHistory chain of a list of (equation, FUNC_LIST index) pairs, the first index being None. """
+    eq_history = None
+    for eq, i in path:
+        eq_history = EquationHistory(eq, 'start' if i is None else _describe(i, lemmas), eq_history)
+    return eq_history
+
+def _search_iddfs(eq1, dest_eq, simplify, max_depth, max_tests, monitor, table, stats, lemmas):
+    """
+    Iterative-deepening depth-first search. Iteration n finds proofs of n steps, so the first
+    proof found is a shortest one. Only the current path and the fixed-size transposition
+    table are kept, so memory does not grow with the number of equations reached; the
+    database is not used. Equations already on the path are skipped, so no path walks a cycle
+    of rewrites. The search is exhausted once no equation is left in the table at the limit; an
+    iteration whose table lost equations at the limit cannot show that, so the search then
+    deepens up to max_depth and stops there with status 'max_depth'.
+    """
+    best = [(eq1, None)]
+    monitor.improve(eq1)
+    # A limit of 0 would not even expand eq1, so the first iteration expands it.
+    limit = 1
+
+    try:
+        while True:
+            table.new_iteration()
+            table.seen(eq1, 0)
+            cutoff = False
+            # Frames of [equation, FUNC_LIST index, variations or None until expanded, next variation].
+            stack = [[eq1, None, None, 0]]
+
+            while stack:
+                frame = stack[-1]
+                if frame[2] is None:
+                    if len(stack) > limit:
+                        cutoff = True
+                        stack.pop()
+                        continue
+
+                    event = monitor.tick(len(stack))
+                    if event:
+                        yield event
+                    if monitor.status:
+                        return _path_history(best, lemmas), monitor.status
+                    if simplify and monitor.expanded > max_tests:
+                        return _path_history(best, lemmas), 'max_tests'
+
+                    frame[2] = get_all_variations(frame[0], max_depth, lemmas)
+
+                if frame[3] == len(frame[2]):
+                    stack.pop()
+                    continue
+
+                i, var = frame[2][frame[3]]
+                frame[3] += 1
+
+                if var is dest_eq or (simplify and (isinstance(var, bool) or isinstance(var, SymbolEq))):
+                    return _path_history([(x[0], x[1]) for x in stack] + [(var, i)], lemmas), 'found'
+                elif any(x[0] is var for x in stack) or table.seen(var, len(stack)):
+                    continue
+
+                if monitor.improve(var):
+                    best = [(x[0], x[1]) for x in stack] + [(var, i)]
+                stack.append([var, i, None, 0])
+
+            # Nothing was cut short by the limit, or everything cut short was also reached at a
+            # shallower depth and expanded there: a deeper iteration would find nothing new. The
+            # second only holds if the table kept every equation it was given at the limit.
+            lossy = table.lost_depth >= limit
+            if not cutoff or not (lossy or table.count(limit)):
+                return _path_history(best, lemmas), 'exhausted'
+            if lossy and limit >= max_depth:
+                return _path_history(best, lemmas), 'max_depth'
+            limit += 1
+
+    finally:
+        if stats is not None:
+            stats.update(table.memory_usage())
+            stats['iterations'] = limit
+
+def _postorder_paths(eq):
+    """ Paths of the compound subterms of eq, children before parents. """
+    paths = []
+    stack = [(eq, ())]
+    while stack:
+        node, path = stack.pop()
+        if isinstance(node, SymbolEq) or not isinstance(node, Equation):
+            continue
+        paths.append(path)
+        for i, arg in enumerate(node._arg_list):
+            stack.append((arg, path + (i,)))
+    paths.reverse()
+    return paths
+
+def _run_searcher(searcher):
+    """ Run a strategy generator to the end, dropping its events, and return its (result, status). """
+    try:
+        while True:
+            next(searcher)
+    except StopIteration as stop:
+        return stop.value
+
+def _search_bottom_up(eq1, max_tests, monitor, use_cache, lemmas):
+    """
+    Compositional simplify. Subterms are visited children first, so each is searched with its
+    children already simplified: a breadth-first search of at most BOTTOM_UP_TESTS equations,
+    growing the subterm by at most BOTTOM_UP_SLACK nodes. The smallest equivalent of every subterm
+    is memoized for the run, and in SUBTERM_CACHE across runs, so shared subterms are searched once.
+    Each local proof is lifted into the whole equation, so the history stays a chain of rule steps.
+    Every subterm counts as one expansion of monitor.
+    """
+    eq_history = EquationHistory(eq1, 'start', None)
+    monitor.improve(eq1)
+    memo = {}
+    tested = 0
+
+    paths = _postorder_paths(eq1)
+    for remaining, path in zip(range(len(paths), 0, -1), paths):
+        event = monitor.tick(remaining)
+        if event:
+            yield event
+        if monitor.status:
+            return eq_history, monitor.status
+
+        sub = _subterm_at(eq_history.eq, path)
+        if isinstance(sub, SymbolEq) or not isinstance(sub, Equation):
+            continue
+
+        chain = memo.get(sub)
+        if chain is None and use_cache:
+            key, mapping = _cache_key('bottom_up', (sub,), BOTTOM_UP_TESTS, BOTTOM_UP_SLACK, monitor.metric)
+            cached = SUBTERM_CACHE.get(key)
+            if cached is not None:
+                chain = _history_chain(_load_result(cached, mapping))
+
+        if chain is None:
+            database = SetDatabase()
+            local = SearchMonitor(database, metric=monitor.metric, cancel=monitor.cancel)
+            best, _ = _run_searcher(_search_bfs(sub, None, database, True, sub.depth + BOTTOM_UP_SLACK, BOTTOM_UP_TESTS, local,
+                                                lemmas))
+            tested += database.get_test_count()
+            if use_cache:
+                _store_result(key, mapping, best, SUBTERM_CACHE)
+            chain = _history_chain(best)
+        memo[sub] = chain
+
+        for step in chain[1:]:
+            eq_history = EquationHistory(_replace_at(eq_history.eq, path, step.eq), step.description, eq_history)
+        monitor.improve(eq_history.eq)
+
+        if tested > max_tests:
+            return eq_history, 'max_tests'
+
+    return eq_history, 'composed'
+
+def _search_egraph(eq1, dest_eq, simplify, monitor, stats):
+    """
+    Equality saturation. Every rule is applied to an e-graph of eq1, and of dest_eq when proving,
+    in rounds until it saturates or reaches its limits, see pyles.egraph. Each round counts as
+    one expansion of monitor. Proving succeeds once both equations are in one e-class;
+    simplifying extracts the smallest equation of eq1's class.
+    The result is a single 'equality saturation' step, as the rounds do not record proofs.
+    """
+    top_node = EquationHistory(eq1, 'start', None)
+    monitor.improve(eq1)
+    graph = egraph.EGraph()
+    root = graph.add(eq1)
+    dest = None if simplify else graph.add(dest_eq)
+
+    status = 'egraph_limit'
+    try:
+        for _ in range(egraph.DEFAULT_MAX_ITERATIONS):
+            if dest is not None and graph.find(root) == graph.find(dest):
+                return EquationHistory(dest_eq, 'equality saturation', top_node), 'found'
+
+            event = monitor.tick(graph.class_count())
+            if event:
+                yield event
+            if monitor.status:
+                status = monitor.status
                 break
-        
-        parse_list = list(filter(None, parse_list))
-
-    while '->' in parse_list:
-        for i, x in enumerate(parse_list):
-            if x == '->':
-                parse_list[i] = ImpliesEq(parse_list[i - 1], parse_list[i + 1])
-                parse_list[i - 1] = None
-                parse_list[i + 1] = None
+            if not graph.step(egraph.DEFAULT_MAX_NODES):
+                status = 'saturated'
                 break
-        
-        parse_list = list(filter(None, parse_list))
-
-    while '<->' in parse_list:
-        for i, x in enumerate(parse_list):
-            if x == '<->':
-                parse_list[i] = BiImpliesEq(parse_list[i - 1], parse_list[i + 1])
-                parse_list[i - 1] = None
-                parse_list[i + 1] = None
+            if len(graph) > egraph.DEFAULT_MAX_NODES:
                 break
-        
-        parse_list = list(filter(None, parse_list))
 
-    return parse_list[0]
+        if dest is not None:
+            if graph.find(root) == graph.find(dest):
+                return EquationHistory(dest_eq, 'equality saturation', top_node), 'found'
+            # Saturated without meeting: the rules cannot prove it.
+            return top_node, 'exhausted' if status == 'saturated' else status
+
+        costs = OPERATOR_COSTS if monitor.metric is operator_cost else None
+        result = graph.extract(root, costs)
+        if result is not eq1 and monitor.improve(result):
+            if isinstance(result, bool) or isinstance(result, SymbolEq):
+                status = 'found'
+            return EquationHistory(result, 'equality saturation', top_node), status
+        return top_node, status
+
+    finally:
+        if stats is not None:
+            stats.update(graph.stats())
+
+# Statuses of a search that ran to completion, whose results may be cached.
+_COMPLETE_STATUSES = ('found', 'exhausted', 'max_tests', 'no_improvement', 'truth_table', 'minimized', 'composed', 'saturated',
+                      'egraph_limit')
+
+def _precheck(eq1, dest_eq, stop=None):
+    """
+    Raise NotEquivalentError if eq1 and dest_eq differ. The SAT solver finds a counterexample in
+    a few conflicts even for many symbols; if it gives up, a BDD decides, then a truth table.
+
+    :param stop: Optional function of no arguments; every stage raises StoppedError once it returns True.
+    """
+    try:
+        sat.check_equivalence(eq1, dest_eq, stop=stop)
+    except sat.ConflictLimitError:
+        try:
+            bdd.check_equivalence(eq1, dest_eq, stop=stop)
+        except bdd.NodeLimitError:
+            check_equivalence(eq1, dest_eq, stop=stop)
+
+def search(eq1, dest_eq, database=None, simplify=False, max_depth=DEFAULT_MAX_DEPTH, max_tests=DEFAULT_MAX_TESTS, strategy='bfs',
+           precheck=True, semantic=False, heuristic=None, admissible=False, weight=1, processes=None, batch_size=None,
+           use_cache=True, compact=False, stats=None, time_budget=None, node_budget=None, memory_budget=None, cancel=None,
+           table_size=DEFAULT_TABLE_SIZE, memory_cap=None, progress_interval=DEFAULT_PROGRESS_INTERVAL, metric=None,
+           patience=None, lemmas=None):
+    """
+    Streaming search behind prove and simplify.
+    Generator of SearchEvent objects: a 'progress' event every progress_interval expansions,
+    then one 'finished' event with the status and result.
+
+    Stopping the search early, by a budget or by setting cancel, is not an error:
+    the finished event carries the best partial result, the smallest equation reached.
+
+    :param semantic: If true and simplifying, return a constant or single symbol result read from
+        the truth table when it is exact, see simplify.
+    :param time_budget: Seconds of wall-clock time the search may run.
+    :param node_budget: Number of equations the search may expand.
+    :param memory_budget: Resident memory in bytes above which the search stops.
+    :param cancel: threading.Event that stops the search when set, from any thread.
+    :param progress_interval: Expansions between progress events.
+    :param metric: Size metric of the smallest equation, see simplify.
+    :param patience: Expansions without a smaller equation after which simplifying stops, see simplify.
+    :param lemmas: pyles.lemmas.LemmaLibrary applied as extra rewrite steps, see prove.
+
+    See prove for the other parameters.
+    """
+    if database is None:
+        database = SetDatabase()
+    database.new_search()
+    monitor = SearchMonitor(database, time_budget, node_budget, memory_budget, cancel, progress_interval, metric,
+                            patience if simplify else None)
+
+    if precheck and not simplify and dest_eq is not None:
+        try:
+            _precheck(eq1, dest_eq, monitor.stopped)
+        except StoppedError:
+            # The budgets cover the precheck too; it stops like a search, with nothing proven.
+            yield monitor.event('finished', monitor.status, EquationHistory(eq1, 'start', None))
+            return
+
+    # A cached result would skip the search and so the library's learning, and results found with
+    # lemmas do not belong under the key of a search without them.
+    use_cache = use_cache and lemmas is None
+    if use_cache:
+        if simplify:
+            key, mapping = _cache_key('simplify', (eq1,), max_depth, max_tests, semantic, strategy, heuristic, admissible, weight,
+                                      monitor.metric, patience)
+        else:
+            key, mapping = _cache_key('prove', (eq1, dest_eq), max_depth, strategy, heuristic, admissible, weight)
+        chain = RESULT_CACHE.get(key)
+        if chain is not None:
+            yield monitor.event('finished', 'cached', _load_result(chain, mapping))
+            return
+
+    if not simplify:
+        chain = database.get_proof(str(eq1), str(dest_eq))
+        if chain is not None:
+            yield monitor.event('finished', 'stored', _load_proof(chain))
+            return
+
+    result = None
+    if simplify and semantic:
+        try:
+            result = _semantic_simplify(eq1, monitor.stopped)
+        except StoppedError:
+            yield monitor.event('finished', monitor.status, EquationHistory(eq1, 'start', None))
+            return
+        status = 'truth_table'
+
+    if result is None and strategy == 'minimize':
+        if not simplify:
+            raise ValueError("Minimization can only simplify.")
+        result = _minimize_simplify(eq1)
+        status = 'minimized'
+
+    if result is None:
+        if strategy == 'bottom_up':
+            if not simplify:
+                raise ValueError("Bottom-up search can only simplify.")
+            searcher = _search_bottom_up(eq1, max_tests, monitor, use_cache, lemmas)
+        elif strategy == 'egraph':
+            searcher = _search_egraph(eq1, dest_eq, simplify, monitor, stats)
+        elif strategy == 'bfs' and compact:
+            searcher = _search_bfs_compact(eq1, dest_eq, database, simplify, max_depth, max_tests, monitor, stats, lemmas)
+        elif strategy == 'bfs':
+            searcher = _search_bfs(eq1, dest_eq, database, simplify, max_depth, max_tests, monitor, lemmas)
+        elif strategy == 'bidirectional':
+            if simplify or dest_eq is None:
+                raise ValueError("Bidirectional search needs a destination equation.")
+            searcher = _search_bidirectional(eq1, dest_eq, database, max_depth, monitor, lemmas)
+        elif strategy == 'astar':
+            searcher = _search_best_first(eq1, dest_eq, database, simplify, max_depth, max_tests, monitor, heuristic, admissible,
+                                          weight, lemmas)
+        elif strategy == 'parallel':
+            if lemmas is not None:
+                raise ValueError("Parallel search cannot use lemmas.")
+            searcher = _search_parallel(eq1, dest_eq, database, simplify, max_depth, max_tests, monitor, processes, batch_size)
+        elif strategy == 'iddfs':
+            table = TranspositionTable.for_memory(memory_cap) if memory_cap else TranspositionTable(table_size)
+            searcher = _search_iddfs(eq1, dest_eq, simplify, max_depth, max_tests, monitor, table, stats, lemmas)
+        else:
+            raise ValueError("Unknown search strategy: " + repr(strategy))
+
+        # Searches return the smallest equation they reached when simplifying, tracked by monitor.
+        result, status = yield from searcher
+
+        if lemmas is not None:
+            # Proofs leave the search in primitive rule steps only.
+            result = lemmas.expand(result)
+            if status == 'found' or (simplify and status in _COMPLETE_STATUSES):
+                lemmas.learn(result)
+
+    if status == 'found' and not simplify:
+        steps = [(str(x.eq), _stored_description(x.description)) for x in _history_chain(result)]
+        database.add_proof(str(eq1), str(dest_eq), steps)
+    if use_cache and status in _COMPLETE_STATUSES and (simplify or status == 'found'):
+        _store_result(key, mapping, result)
+
+    yield monitor.event('finished', status, result)
+
+def _finish(events):
+    """ Run a search to the end and return its finished event. """
+    for event in events:
+        pass
+    return event
+
+def prove(eq1, dest_eq, database=None, simplify=False, max_depth=DEFAULT_MAX_DEPTH, max_tests=DEFAULT_MAX_TESTS, strategy='bfs', precheck=True,
+          heuristic=None, admissible=False, weight=1, processes=None, batch_size=None, use_cache=True,
+          compact=False, stats=None, time_budget=None, node_budget=None, memory_budget=None, cancel=None,
+          table_size=DEFAULT_TABLE_SIZE, memory_cap=None, metric=None, patience=None, lemmas=None):
+    """
+    Attempts to prove that eq1=eq2 through logical equivalences.
+    Performs a breadth-first search.
+    Finished proofs are looked up in and stored to the database's proof store, if it has one.
+    Runs search to the end; use search directly for progress events.
+
+    :param eq1: Equation that will be modified.
+    :param dest_eq: Destination equation.
+    :param database: Database to keep track of tested equations. A new SetDatabase if None.
+    :param simplify: If true, function will not stop until MAX_TESTS reached or all variations have been checked,
+        and returns the smallest equation found.
+    :param max_depth: Max depth of variations to check.
+    :param max_tests: Max amount to equations to test. ONLY works when simplify=True.
+    :param strategy: 'bfs' searches forward from eq1 only.
+        'bidirectional' searches from both eq1 and dest_eq until the searches meet. Cannot simplify.
+        'astar' expands the equation with the lowest proof length plus weighted heuristic first.
+        'parallel' is 'bfs' with each level expanded by a pool of worker processes.
+        'iddfs' is iterative-deepening depth-first search with a fixed-size transposition table. Its memory
+        does not grow with the equations reached, and it does not use the database. It stops once an iteration
+        reaches no equation for the first time at its limit. A table too small to hold an iteration's equations
+        cannot tell that, so the search then deepens to proofs of max_depth steps and stops with 'max_depth'.
+        'egraph' saturates an e-graph of both equations with the rules, see pyles.egraph, and succeeds once
+        they share an e-class, or stops at the e-graph's limits. Commuted and reassociated forms cost a few
+        e-nodes rather than a search level each. The proof is a single 'equality saturation' step.
+        The proof fails if the e-graph saturates or reaches its limits before the equations meet.
+    :param precheck: If true, decide equivalence with the SAT solver of pyles.sat first and raise
+        NotEquivalentError with a counterexample if the equations differ. Falls back to a BDD if the
+        solver reaches its conflict limit, and to truth tables if the BDD grows too large.
+        time_budget, memory_budget and cancel also stop the precheck, which then returns eq1.
+    :param heuristic: Cost function (eq, dest_eq) for 'astar', see pyles.heuristics.
+        Defaults to tree_edit_distance when proving and depth_heuristic when simplifying.
+    :param admissible: If true, 'astar' only uses the heuristic to break ties between equal proof lengths,
+        so the proof found is a shortest one.
+    :param weight: Weight of the heuristic against proof length for 'astar'.
+    :param processes: Number of worker processes for 'parallel'. Defaults to the CPU count.
+    :param batch_size: Equations per worker task for 'parallel'. Defaults to a quarter of each worker's share of a level.
+    :param use_cache: If true, look the proof up in pyles.cache.RESULT_CACHE, which ignores symbol names, and
+        store it there once found. A cached proof does not touch database. Ignored when lemmas is given.
+    :param compact: If true, 'bfs' keeps its search tree in a compact SearchTree that frees finished
+        branches, and only builds EquationHistory objects for the returned path.
+    :param stats: Optional dict that the compact search fills with the memory use of its tree,
+        'iddfs' with that of its transposition table, and 'egraph' with the e-graph's size.
+    :param time_budget: Seconds of wall-clock time the search may run.
+    :param node_budget: Number of equations the search may expand.
+    :param memory_budget: Resident memory in bytes above which the search stops.
+    :param cancel: threading.Event that stops the search when set, from any thread.
+    :param table_size: Slots in the 'iddfs' transposition table.
+    :param memory_cap: Bytes for the 'iddfs' transposition table, in place of table_size.
+    :param metric: Size metric of the smallest equation when simplifying, see simplify.
+    :param patience: Expansions without a smaller equation after which simplifying stops, see simplify.
+    :param lemmas: pyles.lemmas.LemmaLibrary. Its lemmas are applied as single steps next to FUNC_LIST,
+        which shortens proofs that repeat known sub-proofs. The returned proof is expanded into
+        primitive rule steps, and the lemmas of a successful proof are added to the library.
+        Not supported by 'parallel'.
+
+    :returns: An equation history obj. The matching equation if found. If a budget or cancel stopped
+        the search, the smallest equation reached.
+    """
+    event = _finish(search(eq1, dest_eq, database=database, simplify=simplify, max_depth=max_depth, max_tests=max_tests,
+                           strategy=strategy, precheck=precheck, heuristic=heuristic, admissible=admissible, weight=weight,
+                           processes=processes, batch_size=batch_size, use_cache=use_cache, compact=compact, stats=stats,
+                           time_budget=time_budget, node_budget=node_budget, memory_budget=memory_budget, cancel=cancel,
+                           table_size=table_size, memory_cap=memory_cap, metric=metric, patience=patience, lemmas=lemmas))
+
+    # An e-graph that hit its limits first proves nothing, as an exhausted search does not.
+    if event.status in ('exhausted', 'egraph_limit') and not simplify:
+        raise Exception("Proof failed.")
+    return event.result
+
 
 def get_top_history(eq_history):
     """ Return the 'start' equation from any given EquationHistory. """
     top_history = eq_history
-    while eq_history.parent:
+    while top_history.parent:
         top_history = top_history.parent
-    
+
     return top_history
 
-def get_lowest_depth(eq_history):
+def get_lowest_depth(eq_history, metric=None):
+    """
+    Find the smallest equation on the path from the start to an EquationHistory.
+    Searches track the smallest equation themselves, so only the path is kept.
+
+    :param eq_history: Last EquationHistory of the path.
+    :param metric: Size metric, see pyles.heuristics.get_metric. Defaults to node count.
+    :returns: Equation history with the smallest Equation, the first of equally small ones.
     """
-    Find the child equation of a EquationHistory that is the smallest.
+    metric = get_metric(metric)
+    lowest = None
+    for node in _history_chain(eq_history):
+        size = metric(node.eq)
+        if lowest is None or size < lowest[0]:
+            lowest = (size, node)
+    return lowest[1]
 
-    :param eq_history: Parent EquationHistory.
-    :returns: Equation history with the lowest depth Equation.
+def _semantic_simplify(eq, stop=None):
     """
+    :param stop: Optional function of no arguments that stops the truth table or SAT solver with StoppedError.
+    :returns: EquationHistory of a constant or single symbol equivalent to eq, justified by its exact
+        truth table, or None. Past the exact table size, only constants are found, by the SAT solver.
+    """
+    table = truth_table(eq, stop=stop)
+    description = 'truth table'
+    if table.exact:
+        result = table.is_constant()
+        if result is None:
+            result = table.as_symbol()
+    else:
+        description = 'sat'
+        try:
+            if sat.is_tautology(eq, stop=stop):
+                result = True
+            elif sat.satisfy(eq, stop=stop) is None:
+                result = False
+            else:
+                result = None
+        except sat.ConflictLimitError:
+            result = None
 
-    lowest_per_child = []
-    for child in eq_history.children:
-        lowest_per_child.append(get_lowest_depth(child))
+    if result is not None:
+        top_node = EquationHistory(eq, 'start', None)
+        if result is eq:
+            return top_node
+        return EquationHistory(result, description, top_node)
 
-    lowest = eq_history
-    for child in lowest_per_child:
-        if get_depth(child.eq) < get_depth(lowest.eq):
-            lowest = child
-    return lowest
+def _minimize_simplify(eq):
+    """
+    :returns: EquationHistory of the minimal sum of products of eq if it is smaller than eq,
+        otherwise of eq itself.
+    """
+    top_node = EquationHistory(eq, 'start', None)
+    result = minimize(eq).eq
+    if get_depth(result) < get_depth(eq):
+        return EquationHistory(result, 'two-level minimization', top_node)
+    return top_node
 
-def simplify(eq, max_depth=DEFAULT_MAX_DEPTH, max_tests=DEFAULT_MAX_TESTS):
-    proof = prove(eq, None, simplify=True, max_depth=max_depth, max_tests=max_tests)
-    return get_lowest_depth(proof)
+def simplify(eq, max_depth=DEFAULT_MAX_DEPTH, max_tests=DEFAULT_MAX_TESTS, semantic=True, strategy='bfs', heuristic=None, processes=None,
+             use_cache=True, compact=False, stats=None, time_budget=None, node_budget=None, memory_budget=None, cancel=None,
+             table_size=DEFAULT_TABLE_SIZE, memory_cap=None, metric=None, patience=None, lemmas=None):
+    """
+    Find the smallest equivalent equation.
+    Runs search to the end; use search directly for progress events.
 
-def get_equation(text):
-    return parse_equation(parse_text(text))
\ No newline at end of file
+    :param semantic: If true and eq has few enough symbols for an exact truth table, a constant
+        or single symbol result is returned straight away, justified by the truth table. With more
+        symbols, a constant result is found by the SAT solver of pyles.sat.
+    :param strategy: 'bfs', 'astar', 'parallel' or 'iddfs' search, see prove.
+        'minimize' skips the search and uses the minimal sum of products from pyles.minimize
+        when it is smaller, in milliseconds. Needs an exact truth table.
+        'bottom_up' simplifies every subterm in turn, children first, each with a small search of
+        its own, so the work grows with the size of eq rather than exponentially in it. Results
+        for subterms are shared through pyles.cache.SUBTERM_CACHE. max_depth is not used: a local
+        search may grow its subterm by BOTTOM_UP_SLACK nodes, and max_tests bounds the equations
+        tested by all local searches together.
+        'egraph' extracts the smallest equation from a saturated e-graph of eq, see prove. The 'cost'
+        metric is minimized directly; other metrics minimize the node count.
+    :param heuristic: Cost function for 'astar', see prove.
+    :param processes: Number of worker processes for 'parallel', see prove.
+    :param use_cache: If true, look the result up in pyles.cache.RESULT_CACHE and store it there, see prove.
+    :param compact: If true, 'bfs' keeps a compact search tree, see prove.
+    :param stats: Optional dict filled with the memory use of the compact search tree or transposition table,
+        or the size of the e-graph.
+    :param table_size: Slots in the 'iddfs' transposition table, see prove.
+    :param memory_cap: Bytes for the 'iddfs' transposition table, see prove.
+    :param time_budget: Seconds of wall-clock time the search may run.
+    :param node_budget: Number of equations the search may expand.
+    :param memory_budget: Resident memory in bytes above which the search stops.
+    :param cancel: threading.Event that stops the search when set, from any thread.
+    :param metric: Size of an equation: 'nodes' (the default), 'depth', 'cost' or a function of one
+        equation, see pyles.heuristics.SIZE_METRICS. The search keeps the smallest equation as it goes.
+    :param patience: Stop after this many expansions without a smaller equation, with status 'no_improvement'.
+    :param lemmas: pyles.lemmas.LemmaLibrary of extra rewrite steps, see prove.
+    :returns: Equation history with the smallest Equation.
+    """
+    event = _finish(search(eq, None, simplify=True, max_depth=max_depth, max_tests=max_tests, strategy=strategy, semantic=semantic,
+                           heuristic=heuristic, processes=processes, use_cache=use_cache, compact=compact, stats=stats,
+                           time_budget=time_budget, node_budget=node_budget, memory_budget=memory_budget, cancel=cancel,
+                           table_size=table_size, memory_cap=memory_cap, metric=metric, patience=patience, lemmas=lemmas))
+    return event.result
@@ -0,0 +1,193 @@
+import sys
+from array import array
+
+# Rule id of a node with no parent.
+START = -1
+
+
+class SearchTree():
+    """
+    Search tree stored in parallel arrays.
+
+    Node i has a parent index, a rule id (an index into the rule list, or START) and an
+    equation. Equations are hash-consed, so each entry is a reference to a shared node.
+
+    A node holds one reference while it waits to be expanded and one per live child.
+    Once it has none left, no goal can be found below it, so its slot is freed and
+    reused, and its parent loses a reference in turn.
+    """
+    def __init__(self, rule_list):
+        self.rule_list = rule_list
+        self.parents = array('l')
+        # One byte per rule id, unless lemmas push the rule list past a signed char.
+        self.rules = array('b' if len(rule_list) < 128 else 'l')
+        self.refs = array('l')
+        self.eqs = []
+        self.free = []
+        self.live_count = 0
+        self.peak_live_count = 0
+        self.added_count = 0
+
+    def add(self, eq, rule, parent):
+        """
+        Add a node waiting to be expanded.
+
+        :param rule: Index of the rule in rule_list, or START.
+        :param parent: Index of the parent node, or -1.
+        :returns: Index of the new node.
+        """
+        if self.free:
+            index = self.free.pop()
+            self.parents[index] = parent
+            self.rules[index] = rule
+            self.refs[index] = 1
+            self.eqs[index] = eq
+        else:
+            index = len(self.eqs)
+            self.parents.append(parent)
+            self.rules.append(rule)
+            self.refs.append(1)
+            self.eqs.append(eq)
+
+        if parent >= 0:
+            self.refs[parent] += 1
+
+        self.added_count += 1
+        self.live_count += 1
+        self.peak_live_count = max(self.peak_live_count, self.live_count)
+        return index
+
+    def pin(self, index):
+        """ Keep a node and its path alive until it is released. """
+        self.refs[index] += 1
+
+    def release(self, index):
+        """ Drop one reference to a node, freeing it and any ancestors left without references. """
+        while index >= 0:
+            self.refs[index] -= 1
+            if self.refs[index] > 0:
+                return
+
+            parent = self.parents[index]
+            self.eqs[index] = None
+            self.free.append(index)
+            self.live_count -= 1
+            index = parent
+
+    def history(self, index, history_class):
+        """ Build the history_class chain (eq, description, parent) from the root to a node. """
+        path = []
+        while index >= 0:
+            path.append(index)
+            index = self.parents[index]
+
+        eq_history = None
+        for i in reversed(path):
+            rule = self.rules[i]
+            description = 'start' if rule == START else str(self.rule_list[rule])
+            eq_history = history_class(self.eqs[i], description, eq_history)
+        return eq_history
+
+    def memory_usage(self):
+        """ Dict of node counts and the bytes held by the arrays, not counting the shared equations. """
+        return {
+            'nodes': self.added_count,
+            'live_nodes': self.live_count,
+            'peak_live_nodes': self.peak_live_count,
+            'bytes': (sys.getsizeof(self.parents) + sys.getsizeof(self.rules) + sys.getsizeof(self.refs)
+                      + sys.getsizeof(self.eqs) + sys.getsizeof(self.free)),
+        }
+
+
+DEFAULT_TABLE_SIZE = 1 << 16
+# Rough bytes per transposition table slot: a list pointer and two array entries.
+TABLE_ENTRY_BYTES = 24
+
+
+class TranspositionTable():
+    """
+    Fixed-size table of the shallowest depth at which each equation was reached in the
+    current iteration of a depth-first search.
+
+    Each equation goes in the slot picked by its hash or the next one, keyed on the interned
+    equation itself, so a collision never prunes a different equation. When both slots hold
+    other equations the shallowest ones are kept (depth-preferred replacement), since they
+    guard the larger subtrees.
+    Losing an entry only costs repeated work, so the table never needs to grow, but a table
+    cannot tell what an iteration reached at the depths it lost entries at, see lost_depth.
+    """
+    def __init__(self, size=DEFAULT_TABLE_SIZE):
+        self.size = size
+        self.keys = [None] * size
+        self.depths = array('l', [0]) * size
+        self.iterations = array('l', [-1]) * size
+        self.iteration = 0
+        self.hits = 0
+        self.stores = 0
+        self.replacements = 0
+        self.drops = 0
+        # Deepest equation replaced or not stored in the current iteration, -1 if none.
+        self.lost_depth = -1
+
+    @classmethod
+    def for_memory(cls, memory_cap):
+        """ Table sized to about memory_cap bytes. """
+        return cls(max(1, memory_cap // TABLE_ENTRY_BYTES))
+
+    def new_iteration(self):
+        """ Forget every entry, without touching the slots. """
+        self.iteration += 1
+        self.lost_depth = -1
+
+    def seen(self, eq, depth):
+        """
+        Check an equation reached at depth, and record it if it is new or shallower.
+
+        :returns: True if it was already reached at depth or shallower in this iteration.
+        """
+        first = hash(eq) % self.size
+        victim = None
+        for slot in (first, (first + 1) % self.size):
+            if self.iterations[slot] != self.iteration:
+                # Free slots are preferred over any entry of this iteration.
+                if victim is None or self.iterations[victim] == self.iteration:
+                    victim = slot
+                continue
+            if self.keys[slot] is eq:
+                if self.depths[slot] <= depth:
+                    self.hits += 1
+                    return True
+                self.depths[slot] = depth
+                return False
+            if victim is None or (self.iterations[victim] == self.iteration and self.depths[slot] > self.depths[victim]):
+                victim = slot
+
+        if self.iterations[victim] == self.iteration:
+            if self.depths[victim] < depth:
+                self.drops += 1
+                self.lost_depth = max(self.lost_depth, depth)
+                return False
+            self.replacements += 1
+            self.lost_depth = max(self.lost_depth, self.depths[victim])
+
+        self.keys[victim] = eq
+        self.depths[victim] = depth
+        self.iterations[victim] = self.iteration
+        self.stores += 1
+        return False
+
+    def count(self, depth):
+        """ Number of entries of the current iteration held at depth. """
+        return sum(1 for slot_depth, iteration in zip(self.depths, self.iterations)
+                   if iteration == self.iteration and slot_depth == depth)
+
+    def memory_usage(self):
+        """ Dict of slot counts and the bytes held by the table, not counting the shared equations. """
+        return {
+            'slots': self.size,
+            'hits': self.hits,
+            'stores': self.stores,
+            'replacements': self.replacements,
+            'drops': self.drops,
+            'bytes': sys.getsizeof(self.keys) + sys.getsizeof(self.depths) + sys.getsizeof(self.iterations),
+        }
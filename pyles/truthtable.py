@@ -0,0 +1,233 @@
+import hashlib
+
+import numpy as np
+
+from .equation import Equation, AndEq, OrEq, NotEq, ImpliesEq, BiImpliesEq, SymbolEq
+
+# Formulas with at most this many symbols are evaluated on every assignment.
+MAX_EXACT_SYMBOLS = 20
+# Number of random assignments evaluated for formulas with more symbols.
+DEFAULT_SAMPLE_SIZE = 1 << 16
+# Sampled tables of very large formulas use fewer assignments, to stay near this many bytes.
+MAX_SAMPLE_BYTES = 1 << 27
+# Nodes evaluated between calls of a stop callback.
+STOP_INTERVAL = 256
+
+
+class NotEquivalentError(Exception):
+    """ Raised when two equations are shown to differ on some assignment. """
+    def __init__(self, eq1, eq2, counterexample):
+        super().__init__("Proof failed. Equations differ on " + repr(counterexample))
+        self.eq1 = eq1
+        self.eq2 = eq2
+        self.counterexample = counterexample
+
+
+class StoppedError(Exception):
+    """ Raised when the stop callback of a check asks it to give up, e.g. for a search budget. """
+
+
+class TruthTable():
+    """
+    Packed truth table of an equation.
+
+    Bit k of bits holds the value of the equation for assignment k. For an exact table
+    assignment k gives symbol i the value of bit i of k, otherwise it is row k of samples.
+    """
+    def __init__(self, symbols, bits, size, samples=None):
+        self.symbols = symbols
+        self.bits = bits
+        self.size = size
+        self.samples = samples
+
+    @property
+    def exact(self):
+        return self.samples is None
+
+    def count(self):
+        """ Number of assignments the equation is true for. """
+        return int(np.unpackbits(self.bits, count=self.size, bitorder='little').sum())
+
+    def assignment(self, k):
+        """ Dict of symbol name to value for assignment k. """
+        if self.exact:
+            return {symbol: bool((k >> i) & 1) for i, symbol in enumerate(self.symbols)}
+        return {symbol: bool(self.samples[k, i]) for i, symbol in enumerate(self.symbols)}
+
+    def is_constant(self):
+        """
+        :returns: True or False if the equation has that value on every tested assignment, otherwise None.
+        """
+        count = self.count()
+        if count == self.size:
+            return True
+        elif count == 0:
+            return False
+
+    def as_symbol(self):
+        """
+        :returns: The SymbolEq the equation matches on every tested assignment, otherwise None.
+        """
+        for i, symbol in enumerate(self.symbols):
+            if _first_difference(self, _symbol_bits(self, i)) is None:
+                return SymbolEq(symbol)
+
+    def fingerprint(self):
+        """ Digest of the symbols and packed values. Equal for equations with equal tables. """
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update('\0'.join(self.symbols).encode())
+        digest.update(b'\1' if self.exact else b'\0')
+        digest.update(self.bits.tobytes())
+        return digest.hexdigest()
+
+
+def _pack(values):
+    return np.packbits(values, bitorder='little')
+
+def _symbol_bits(table, i):
+    if table.exact:
+        index = np.arange(table.size, dtype=np.uint32)
+        return _pack((index >> i) & 1)
+    return _pack(table.samples[:, i])
+
+def _first_difference(table, bits):
+    """ Index of the first assignment where table and bits differ, otherwise None. """
+    diff = np.unpackbits(table.bits ^ bits, count=table.size, bitorder='little')
+    nonzero = np.flatnonzero(diff)
+    if len(nonzero):
+        return int(nonzero[0])
+
+def truth_table(eq, symbols=None, max_exact=MAX_EXACT_SYMBOLS, sample_size=DEFAULT_SAMPLE_SIZE, seed=0, stop=None):
+    """
+    Evaluate an equation on all assignments of its symbols, or on a random sample of them
+    when there are more than max_exact symbols. Every node is evaluated once, as a
+    vectorized operation over all assignments.
+
+    :param eq: Equation or bool to evaluate.
+    :param symbols: Ordered symbol names to assign. Defaults to the sorted symbols of eq.
+    :param max_exact: Largest symbol count evaluated exhaustively.
+    :param sample_size: Number of random assignments otherwise. Lowered, to no fewer than 64,
+        for formulas so large that the table would pass MAX_SAMPLE_BYTES.
+    :param seed: Seed for the random assignments.
+    :param stop: Optional function of no arguments, called every STOP_INTERVAL nodes. Evaluation
+        raises StoppedError once it returns True.
+    :returns: TruthTable obj.
+    """
+    if symbols is None:
+        symbols = _symbol_names(eq)
+    symbols = tuple(symbols)
+
+    if len(symbols) <= max_exact:
+        table = TruthTable(symbols, None, 1 << len(symbols))
+    else:
+        # One byte per sample and symbol, plus one packed bit per sample for every symbol and node.
+        per_sample = len(symbols) + (len(symbols) + (eq.depth if isinstance(eq, Equation) else 0)) / 8
+        sample_size = max(64, min(sample_size, int(MAX_SAMPLE_BYTES / per_sample)))
+        samples = np.random.default_rng(seed).integers(0, 2, size=(sample_size, len(symbols)), dtype=np.uint8)
+        table = TruthTable(symbols, None, sample_size, samples)
+
+    columns = {SymbolEq(symbol): _symbol_bits(table, i) for i, symbol in enumerate(symbols)}
+    n_bytes = (table.size + 7) // 8
+    constants = {True: np.full(n_bytes, 0xff, dtype=np.uint8), False: np.zeros(n_bytes, dtype=np.uint8)}
+
+    # Parents of every compound subterm, so its values are freed once the last one is evaluated.
+    # Without this, a large formula over many symbols holds a full column per distinct node.
+    parent_count = {}
+    stack = [eq]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, Equation) and not isinstance(node, SymbolEq):
+            for x in node._arg_list:
+                if x not in parent_count:
+                    stack.append(x)
+                parent_count[x] = parent_count.get(x, 0) + 1
+
+    # Post-order walk with an explicit stack; interned subterms are evaluated once.
+    values = {}
+    done = set()
+    stack = [eq]
+    while stack:
+        node = stack[-1]
+        if node in done:
+            stack.pop()
+            continue
+        elif not isinstance(node, Equation):
+            values[node] = constants[bool(node)]
+            done.add(node)
+            stack.pop()
+            continue
+        elif isinstance(node, SymbolEq):
+            if node not in columns:
+                raise ValueError("Symbol " + node.symbol + " has no assigned value.")
+            values[node] = columns[node]
+            done.add(node)
+            stack.pop()
+            continue
+
+        pending = [x for x in node._arg_list if x not in done]
+        if pending:
+            stack.extend(pending)
+            continue
+
+        stack.pop()
+        if stop is not None and len(done) % STOP_INTERVAL == 0 and stop():
+            raise StoppedError("Truth table evaluation stopped.")
+        args = [values[x] for x in node._arg_list]
+        if isinstance(node, AndEq):
+            values[node] = args[0] & args[1]
+        elif isinstance(node, OrEq):
+            values[node] = args[0] | args[1]
+        elif isinstance(node, NotEq):
+            values[node] = ~args[0]
+        elif isinstance(node, ImpliesEq):
+            values[node] = ~args[0] | args[1]
+        elif isinstance(node, BiImpliesEq):
+            values[node] = ~(args[0] ^ args[1])
+        done.add(node)
+
+        for x in node._arg_list:
+            parent_count[x] -= 1
+            if parent_count[x] == 0:
+                del values[x]
+
+    bits = values[eq].copy()
+    if table.size % 8:
+        # Clear the padding so equal tables have equal bytes.
+        bits[-1] &= (1 << (table.size % 8)) - 1
+    table.bits = bits
+    return table
+
+def _symbol_names(*eqs):
+    names = set()
+    for eq in eqs:
+        if isinstance(eq, Equation):
+            names |= {sym.symbol for sym in eq.get_symbol_set()}
+    return sorted(names)
+
+def find_counterexample(eq1, eq2, **kwargs):
+    """
+    Compare two equations on a shared truth table.
+
+    :param kwargs: Passed to truth_table.
+    :returns: Dict of symbol name to value where the equations differ, or None if no difference was found.
+        None is a proof of equivalence only when the table was exact.
+    """
+    symbols = _symbol_names(eq1, eq2)
+    table1 = truth_table(eq1, symbols, **kwargs)
+    table2 = truth_table(eq2, symbols, **kwargs)
+
+    k = _first_difference(table1, table2.bits)
+    if k is not None:
+        return table1.assignment(k)
+
+def check_equivalence(eq1, eq2, **kwargs):
+    """
+    Raise NotEquivalentError with a counterexample if eq1 and eq2 differ on any tested assignment.
+    """
+    counterexample = find_counterexample(eq1, eq2, **kwargs)
+    if counterexample is not None:
+        raise NotEquivalentError(eq1, eq2, counterexample)
+
+def semantic_fingerprint(eq, **kwargs):
+    """ Fingerprint of the truth table of eq over its own symbols. """
+    return truth_table(eq, **kwargs).fingerprint()
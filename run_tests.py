@@ -2,6 +2,20 @@ import unittest
 
 from test import test_solve
 from test import test_identities
+from test import test_truthtable
+from test import test_heuristics
+from test import test_cache
+from test import test_database
+from test import test_rules
+from test import test_bench
+from test import test_parser
+from test import test_compiler
+from test import test_minimize
+from test import test_bdd
+from test import test_service
+from test import test_sat
+from test import test_lemmas
+from test import test_egraph
 
 # initialize the test suite
 loader = unittest.TestLoader()
@@ -10,6 +24,20 @@ suite  = unittest.TestSuite()
 # add tests to the test suite
 suite.addTests(loader.loadTestsFromModule(test_identities))
 suite.addTests(loader.loadTestsFromModule(test_solve))
+suite.addTests(loader.loadTestsFromModule(test_truthtable))
+suite.addTests(loader.loadTestsFromModule(test_heuristics))
+suite.addTests(loader.loadTestsFromModule(test_cache))
+suite.addTests(loader.loadTestsFromModule(test_database))
+suite.addTests(loader.loadTestsFromModule(test_rules))
+suite.addTests(loader.loadTestsFromModule(test_bench))
+suite.addTests(loader.loadTestsFromModule(test_parser))
+suite.addTests(loader.loadTestsFromModule(test_compiler))
+suite.addTests(loader.loadTestsFromModule(test_minimize))
+suite.addTests(loader.loadTestsFromModule(test_bdd))
+suite.addTests(loader.loadTestsFromModule(test_service))
+suite.addTests(loader.loadTestsFromModule(test_sat))
+suite.addTests(loader.loadTestsFromModule(test_lemmas))
+suite.addTests(loader.loadTestsFromModule(test_egraph))
 
 # initialize a runner, pass it your suite and run it
 runner = unittest.TextTestRunner(verbosity=3)
@@ -0,0 +1,69 @@
+import random
+import unittest
+
+from pyles.bdd import *
+from pyles.bench import random_equation
+from pyles.equation import *
+from pyles.solve import get_equation, prove
+from pyles.truthtable import NotEquivalentError, find_counterexample
+
+class TestBDD(unittest.TestCase):
+    def test_canonical(self):
+        manager = BDD()
+        u = manager.build(get_equation("(a -> b) and (b -> a)"))
+        self.assertEqual(manager.build(get_equation("a <-> b")), u)
+        self.assertEqual(manager.build(get_equation("(a and b) or (not a and not b)")), u)
+        self.assertEqual(manager.build(get_equation("a or not a")), TRUE)
+        self.assertEqual(manager.build(get_equation("a and not a")), FALSE)
+        self.assertEqual(manager.size(u), 5)
+
+    def test_normal_form(self):
+        self.assertEqual(normal_form(get_equation("a <-> b")), normal_form(get_equation("(b -> a) and (a -> b)")))
+        self.assertNotEqual(normal_form(get_equation("a -> b")), normal_form(get_equation("b -> a")))
+        self.assertEqual(normal_form(get_equation("(a or (b -> c)) or ((c or not a) and (b or not a))")), 'T')
+
+    def test_random(self):
+        rng = random.Random(6)
+        for _ in range(30):
+            eq1 = random_equation(rng, 4, depth=4)
+            eq2 = random_equation(rng, 4, depth=4)
+            manager = BDD()
+            same = manager.build(eq1) == manager.build(eq2)
+            self.assertEqual(same, find_counterexample(eq1, eq2) is None)
+
+    def test_check_equivalence(self):
+        eq1 = get_equation(' and '.join('(x%d or y%d)' % (i, i) for i in range(100)))
+        eq2 = get_equation(' and '.join('(y%d or x%d)' % (i, i) for i in reversed(range(100))))
+        check_equivalence(eq1, eq2)
+
+        with self.assertRaises(NotEquivalentError) as context:
+            check_equivalence(get_equation("a -> b"), get_equation("b -> a"))
+        self.assertEqual(context.exception.counterexample, {'a': True, 'b': False})
+
+        with self.assertRaises(NotEquivalentError):
+            prove(get_equation("a -> b"), get_equation("b -> a"))
+
+        with self.assertRaises(NodeLimitError):
+            check_equivalence(eq1, eq2, max_nodes=10)
+
+        # Collecting while eq2 is built must keep the nodes of eq1.
+        eq1 = get_equation("(a and b) or (c and d)")
+        eq2 = get_equation("(d and c) or (b and a)")
+        check_equivalence(eq1, eq2, gc_threshold=0)
+
+    def test_collect(self):
+        manager = BDD(order=['a', 'b'])
+        kept = manager.ref(manager.build(get_equation("a and b")))
+        manager.build(get_equation("a or c"))
+        live = manager.stats()['live_nodes']
+
+        self.assertGreater(manager.collect(), 0)
+        self.assertLess(manager.stats()['live_nodes'], live)
+        self.assertEqual(manager.build(get_equation("b and a")), kept)
+
+        manager.deref(kept)
+        manager.collect()
+        self.assertEqual(manager.stats()['live_nodes'], 2)
+
+if __name__ == '__main__':
+    unittest.main()
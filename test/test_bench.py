@@ -0,0 +1,59 @@
+import random
+import unittest
+import unittest.mock
+
+from pyles.bench import *
+from pyles.equation import *
+from pyles.solve import get_depth
+from pyles.truthtable import check_equivalence
+
+class TestBench(unittest.TestCase):
+    def test_random_equation(self):
+        eq1 = random_equation(random.Random(5), symbol_count=4, depth=4)
+        eq2 = random_equation(random.Random(5), symbol_count=4, depth=4)
+        self.assertIs(eq1, eq2)
+        self.assertLessEqual({x.symbol for x in eq1.get_symbol_set()}, {'a', 'b', 'c', 'd'})
+
+        eq = random_equation(random.Random(5), depth=3, operators={NotEq: 1})
+        self.assertEqual(str(eq), "(not (not (not " + str(eq.arg1.arg1.arg1) + ")))")
+
+    def test_make_workload(self):
+        pairs = make_workload(seed=3, count=10)
+        self.assertEqual(pairs, make_workload(seed=3, count=10))
+        self.assertNotEqual(pairs, make_workload(seed=4, count=10))
+
+        for eq, equivalent in pairs:
+            check_equivalence(eq, equivalent)
+            self.assertLessEqual(get_depth(equivalent), get_depth(eq) + 2)
+
+    def test_bench_prove_skipped(self):
+        eq = get_equation("P and Q")
+        result = bench_prove([(eq, eq), (True, True), (eq, get_equation("Q and P"))])
+        self.assertEqual(result['searches'], 1)
+        self.assertEqual(result['skipped'], 2)
+        self.assertEqual(result['finished'], 1)
+
+    def test_run(self):
+        with unittest.mock.patch('pyles.bench.MIN_BENCH_SECONDS', 0):
+            report = run(count=3, node_budget=50)
+
+        results = report['results']
+        self.assertEqual(report['params']['count'], 3)
+        self.assertEqual(results['prove']['searches'] + results['prove']['skipped'], 3)
+        self.assertEqual(results['simplify']['searches'], 3)
+        self.assertLessEqual(results['simplify']['nodes_expanded'], 150)
+        self.assertTrue(0 <= results['prove']['dedup_hit_rate'] <= 1)
+        for name in ('database_set', 'database_sqlite_memory', 'database_sqlite_file'):
+            self.assertEqual(results[name]['found'], 2 * results[name]['equations'])
+
+    def test_compare(self):
+        baseline = {'results': {'prove': {'nodes_per_sec': 100.0, 'total_seconds': 1.0, 'searches': 3}}}
+        report = {'results': {'prove': {'nodes_per_sec': 90.0, 'total_seconds': 1.1, 'searches': 4}}}
+        self.assertEqual(compare(report, baseline), [])
+
+        report = {'results': {'prove': {'nodes_per_sec': 50.0, 'total_seconds': 2.0, 'searches': 3}}}
+        self.assertEqual(compare(report, baseline), [('prove', 'nodes_per_sec', 100.0, 50.0),
+                                                     ('prove', 'total_seconds', 1.0, 2.0)])
+
+if __name__ == '__main__':
+    unittest.main()
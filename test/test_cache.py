@@ -0,0 +1,62 @@
+import unittest
+
+from pyles.solve import get_equation, prove, simplify
+from pyles.cache import *
+
+class TestCache(unittest.TestCase):
+    def setUp(self):
+        RESULT_CACHE.clear()
+
+    def test_canonicalize(self):
+        (eq1,), mapping = canonicalize(get_equation("a or (b -> c)"))
+        (eq2,), _ = canonicalize(get_equation("x or (y -> z)"))
+        self.assertIs(eq1, eq2)
+        self.assertEqual(mapping, {'a': 'x0', 'b': 'x1', 'c': 'x2'})
+
+        (eq1,), _ = canonicalize(get_equation("a or (b -> a)"))
+        (eq2,), _ = canonicalize(get_equation("a or (b -> b)"))
+        self.assertIsNot(eq1, eq2)
+
+    def test_rename_symbols(self):
+        eq = get_equation("P and (Q or P)")
+        self.assertIs(rename_symbols(eq, {'P': 'R'}), get_equation("R and (Q or R)"))
+        self.assertIs(rename_symbols(True, {'P': 'R'}), True)
+
+    def test_lru(self):
+        cache = ResultCache(maxsize=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.put('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.stats(), {'size': 2, 'maxsize': 2, 'hits': 1, 'misses': 1, 'evictions': 1})
+
+    def test_prove(self):
+        prove(get_equation("not (a and b)"), get_equation("not b or not a"))
+        self.assertEqual(RESULT_CACHE.stats()['misses'], 1)
+
+        history = prove(get_equation("not (x and y)"), get_equation("not y or not x"))
+        self.assertEqual(RESULT_CACHE.stats()['hits'], 1)
+        self.assertIs(history.eq, get_equation("not y or not x"))
+        self.assertIn("(not (x and y)) by start", str(history))
+
+        prove(get_equation("not (x and y)"), get_equation("not y or not x"), use_cache=False)
+        self.assertEqual(RESULT_CACHE.stats()['hits'], 1)
+
+    def test_search_options(self):
+        eq1 = get_equation("not (a and b)")
+        dest_eq = get_equation("not b or not a")
+        prove(eq1, dest_eq, strategy='astar', weight=20)
+        prove(eq1, dest_eq, strategy='astar', weight=20, admissible=True)
+        self.assertEqual(RESULT_CACHE.stats()['hits'], 0)
+        prove(eq1, dest_eq, strategy='astar', weight=20, admissible=True)
+        self.assertEqual(RESULT_CACHE.stats()['hits'], 1)
+
+    def test_simplify(self):
+        simplify(get_equation("p and (p or q)"))
+        history = simplify(get_equation("r and (r or s)"))
+        self.assertEqual(RESULT_CACHE.stats()['hits'], 1)
+        self.assertIs(history.eq, get_equation("r"))
+
+if __name__ == '__main__':
+    unittest.main()
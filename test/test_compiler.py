@@ -0,0 +1,61 @@
+import random
+import unittest
+
+import numpy as np
+
+from pyles.compiler import *
+from pyles.compiler import compile as compile_equation
+from pyles.bench import random_equation
+from pyles.equation import *
+from pyles.solve import get_equation
+
+class TestCompiler(unittest.TestCase):
+    def test_compile(self):
+        eq = get_equation("(a and not b) or c")
+        func = compile_equation(eq)
+        self.assertEqual(func.symbols, ('a', 'b', 'c'))
+        self.assertEqual(func.source, "def evaluate(a, b, c):\n    return ((a and (not b)) or c)\n")
+        self.assertIs(compile_equation(get_equation("(a and not b) or c")), func)
+
+        self.assertIs(compile_equation(eq, ['c', 'b', 'a'])(False, False, True), True)
+        self.assertIs(compile_equation(True)(), True)
+
+        with self.assertRaises(ValueError):
+            compile_equation(eq, ['a', 'b'])
+
+    def test_matches_eval(self):
+        rng = random.Random(2)
+        for _ in range(20):
+            eq = random_equation(rng, symbol_count=4, depth=4)
+            symbols = ['a', 'b', 'c', 'd']
+            func = compile_equation(eq, symbols)
+            batch = compile_batch(eq, symbols)
+            rows = [[(k >> i) & 1 == 1 for i in range(4)] for k in range(16)]
+
+            expected = []
+            for row in rows:
+                for symbol, value in zip(symbols, row):
+                    eq.set_symbol_value(symbol, value)
+                expected.append(eq.eval())
+
+            self.assertEqual([func(*row) for row in rows], expected)
+            self.assertEqual(batch(np.arange(16)).tolist(), expected)
+            self.assertEqual(batch(np.array(rows)).tolist(), expected)
+
+    def test_batch_constants(self):
+        batch = compile_batch(get_equation("not (P and False)"))
+        self.assertEqual(batch([0, 1]).tolist(), [True, True])
+        self.assertEqual(compile_batch(False)(np.arange(3)).tolist(), [False, False, False])
+
+        with self.assertRaises(ValueError):
+            batch(np.zeros((2, 3)))
+
+    def test_shared_and_deep(self):
+        eq = get_equation("(x and y) or not (x and y)")
+        self.assertEqual(compile_equation(eq).source.count('(x and y)'), 1)
+
+        eq = get_equation(' and '.join('x' + str(i) for i in range(1000)))
+        self.assertIs(compile_equation(eq)(*[True] * 1000), True)
+
+if __name__ == '__main__':
+    unittest.main()
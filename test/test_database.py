@@ -0,0 +1,152 @@
+import os
+import tempfile
+import unittest
+
+from pyles.database import *
+from pyles.equation import fingerprint
+from pyles.identities import FUNC_LIST
+from pyles.solve import get_equation, get_all_variations, prove
+
+class TestDatabase(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'pyles.db')
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_database(self):
+        for database in (SetDatabase(), SqliteDatabase(self.path, batch_size=2), FingerprintDatabase(),
+                         FingerprintDatabase(bits=128), FingerprintDatabase(approximate=True)):
+            self.assertFalse(database.eq_exists('(P and Q)'))
+            database.add_eq('(P and Q)')
+            self.assertTrue(database.eq_exists('(P and Q)'))
+
+            database.add_many(['(Q and P)', '(P or Q)', '(P and Q)'])
+            self.assertEqual(database.exists_many(['(P or Q)', '(Q or P)', '(Q and P)']), [True, False, True])
+            self.assertEqual(database.get_test_count(), 3)
+            database.close()
+
+    def test_fingerprint(self):
+        eq = get_equation("P and not (Q or R)")
+        self.assertEqual(fingerprint(eq), eq.fingerprint)
+        self.assertEqual(eq.fingerprint, get_equation("P and not (Q or R)").fingerprint)
+        self.assertNotEqual(eq.fingerprint, get_equation("P and not (R or Q)").fingerprint)
+        self.assertNotEqual(fingerprint(True), fingerprint(False))
+        self.assertLess(eq.fingerprint, 1 << 128)
+
+    def test_fingerprint_database(self):
+        eqs = [eq for _, eq in get_all_variations(get_equation("(P -> Q) and not (R or P)"))]
+        eqs += [x for eq in eqs for _, x in get_all_variations(eq)]
+        unique = set(eqs)
+
+        for bits in (64, 128):
+            database = FingerprintDatabase(bits=bits, capacity=8)
+            database.add_many(database.key(x) for x in eqs)
+            self.assertEqual(database.get_test_count(), len(unique))
+            self.assertTrue(all(database.exists_many(eqs)))
+            self.assertFalse(database.eq_exists(get_equation("P or not P")))
+
+            stats = database.stats()
+            self.assertGreater(stats['resizes'], 0)
+            self.assertLessEqual(stats['load_factor'], MAX_LOAD)
+            self.assertEqual(stats['bytes'], stats['slots'] * bits // 8)
+
+        set_database = SetDatabase()
+        set_database.add_many(str(x) for x in unique)
+        database = FingerprintDatabase(capacity=1)
+        database.add_many(unique)
+        strings = sum(len(x) for x in set_database.tested_eqs)
+        self.assertLess(database.memory_usage(), strings)
+
+        database = FingerprintDatabase(approximate=True, bloom_bits=1 << 12, bloom_hashes=3)
+        database.add_many(eqs)
+        self.assertEqual(database.get_test_count(), len(unique))
+        self.assertTrue(all(database.exists_many(eqs)))
+        self.assertEqual(database.memory_usage(), 1 << 9)
+        self.assertGreater(database.false_positive_rate(), 0)
+        self.assertLess(database.false_positive_rate(), 0.5)
+
+        with self.assertRaises(ValueError):
+            FingerprintDatabase(bits=32)
+
+    def test_fingerprint_search(self):
+        eq = get_equation("(P -> Q) and (P -> R)")
+        dest_eq = get_equation("(not P or R) and (not P or Q)")
+        for strategy in ('bfs', 'astar', 'bidirectional'):
+            history = prove(eq, dest_eq, strategy=strategy, database=FingerprintDatabase(), use_cache=False)
+            self.assertEqual(str(history), str(prove(eq, dest_eq, strategy=strategy, use_cache=False)))
+
+        eq = get_equation("(P and (P or Q)) or R")
+        database = FingerprintDatabase()
+        history = prove(eq, None, database=database, simplify=True, max_tests=2000, use_cache=False)
+        self.assertEqual(str(history.eq), "(P or R)")
+        self.assertGreater(database.get_test_count(), 0)
+
+        # Each search reports its own lookups and collisions.
+        stats = database.stats()
+        prove(eq, None, database=database, simplify=True, max_tests=2000, use_cache=False)
+        self.assertEqual(database.stats(), stats)
+
+    def test_persistence(self):
+        database = SqliteDatabase(self.path)
+        database.add_eq('(P and Q)')
+        database.add_proof('(P and Q)', '(Q and P)', [('(P and Q)', 'start'), ('(Q and P)', 'commutative')])
+        database.close()
+
+        database = SqliteDatabase(self.path, clear_tested=False)
+        self.assertTrue(database.eq_exists('(P and Q)'))
+        database.close()
+
+        database = SqliteDatabase(self.path)
+        self.assertFalse(database.eq_exists('(P and Q)'))
+        self.assertEqual(database.get_proof('(P and Q)', '(Q and P)'), [('(P and Q)', 'start'), ('(Q and P)', 'commutative')])
+        self.assertIsNone(database.get_proof('(Q and P)', '(P and Q)'))
+        database.close()
+
+    def test_prove(self):
+        eq = get_equation("not (P and Q)")
+        dest_eq = get_equation("not Q or not P")
+
+        database = SqliteDatabase(self.path)
+        history = prove(eq, dest_eq, database=database, use_cache=False)
+        database.close()
+
+        database = SqliteDatabase(self.path)
+        # Steps are stored by identity name, not by str(func), which holds an address of this process.
+        names = [description for _, description in database.get_proof(str(eq), str(dest_eq))]
+        self.assertEqual(names[0], 'start')
+        self.assertLessEqual(set(names[1:]), {func.__name__ for func in FUNC_LIST})
+        self.assertEqual(str(prove(eq, dest_eq, database=database, use_cache=False)), str(history))
+        self.assertEqual(database.get_test_count(), 0)
+        database.close()
+
+    def test_reuse(self):
+        # Each search starts with an empty visited set; only proofs carry over.
+        eq = get_equation("(P -> Q) and (P -> R)")
+        dest1 = get_equation("(not P or R) and (not P or Q)")
+        dest2 = get_equation("(not P or Q) and (not P or R)")
+        database = SqliteDatabase(self.path)
+        prove(eq, dest1, database=database, use_cache=False)
+        self.assertIs(prove(eq, dest2, database=database, use_cache=False).eq, dest2)
+        database.flush()
+        database.c.execute("SELECT COUNT(*) FROM tested_eqs")
+        self.assertEqual(database.get_test_count(), database.c.fetchone()[0])
+        database.close()
+
+        database = SqliteDatabase(self.path, clear_tested=False)
+        self.assertGreater(database.get_test_count(), 0)
+        self.assertIs(prove(eq, get_equation("(R or not P) and (Q or not P)"), database=database, use_cache=False).eq,
+                      get_equation("(R or not P) and (Q or not P)"))
+        database.close()
+
+    def test_batched_levels(self):
+        # The serial BFS checks each level with exists_many, not one eq_exists per variation.
+        database = SqliteDatabase()
+        database.eq_exists = None
+        history = prove(get_equation("not (P and Q)"), get_equation("not Q or not P"), database=database, use_cache=False)
+        self.assertIs(history.eq, get_equation("not Q or not P"))
+        database.close()
+
+if __name__ == '__main__':
+    unittest.main()
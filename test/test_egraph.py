@@ -0,0 +1,70 @@
+import random
+import unittest
+import unittest.mock
+
+from pyles import egraph
+from pyles.egraph import *
+from pyles.bench import random_equation
+from pyles.equation import *
+from pyles.solve import get_equation, get_depth, prove, simplify, _history_chain
+from pyles.truthtable import find_counterexample
+
+class TestEGraph(unittest.TestCase):
+    def test_hashcons(self):
+        graph = EGraph()
+        a = graph.add(get_equation("(a and b) or (a and b)"))
+        # Shared subterms are added once: a, b, the conjunction and the disjunction.
+        self.assertEqual(len(graph), 4)
+        self.assertEqual(graph.add(get_equation("(a and b) or (a and b)")), a)
+
+    def test_congruence(self):
+        graph = EGraph([])
+        x = graph.add(get_equation("not a"))
+        y = graph.add(get_equation("not b"))
+        self.assertNotEqual(graph.find(x), graph.find(y))
+        graph.union(graph.add(get_equation("a")), graph.add(get_equation("b")))
+        graph.rebuild()
+        self.assertEqual(graph.find(x), graph.find(y))
+
+    def test_goal(self):
+        graph = EGraph()
+        a = graph.add(get_equation("(a and b) and c"))
+        b = graph.add(get_equation("c and (b and a)"))
+        self.assertEqual(graph.saturate(goal=(a, b)), 'found')
+
+    def test_extract(self):
+        graph = EGraph()
+        a = graph.add(get_equation("(a and (a or b)) or not not c"))
+        graph.saturate()
+        self.assertIs(graph.extract(a), get_equation("a or c"))
+
+    def test_random(self):
+        rng = random.Random(3)
+        for _ in range(10):
+            eq = random_equation(rng, 3, depth=3)
+            graph = EGraph()
+            a = graph.add(eq)
+            graph.saturate(max_nodes=500)
+            result = graph.extract(a)
+            self.assertIsNone(find_counterexample(eq, result))
+            self.assertLessEqual(get_depth(result), get_depth(eq))
+
+    def test_prove(self):
+        eq1 = get_equation("(a or (b -> c)) or ((c or not a) and (b or not a))")
+        eq_history = prove(eq1, True, strategy='egraph', precheck=False, use_cache=False)
+        self.assertIs(eq_history.eq, True)
+        self.assertEqual([x.description for x in _history_chain(eq_history)], ['start', 'equality saturation'])
+
+    def test_prove_limit(self):
+        eq1 = get_equation("(a or (b -> c)) or ((c or not a) and (b or not a))")
+        with unittest.mock.patch.object(egraph, 'DEFAULT_MAX_NODES', 10):
+            with self.assertRaisesRegex(Exception, "Proof failed"):
+                prove(eq1, True, strategy='egraph', use_cache=False)
+
+    def test_simplify(self):
+        stats = {}
+        eq = get_equation("(p -> q) and (p -> r)")
+        eq_history = simplify(eq, strategy='egraph', semantic=False, use_cache=False, stats=stats)
+        self.assertIsNone(find_counterexample(eq_history.eq, get_equation("p -> (q and r)")))
+        self.assertLess(get_depth(eq_history.eq), get_depth(eq))
+        self.assertGreater(stats['nodes'], 0)
@@ -0,0 +1,41 @@
+import unittest
+
+from pyles.solve import get_equation
+from pyles.heuristics import *
+
+class TestHeuristics(unittest.TestCase):
+    def test_depth_heuristic(self):
+        self.assertEqual(depth_heuristic(get_equation("P and not Q"), None), 4)
+        self.assertEqual(depth_heuristic(True, None), 1)
+
+    def test_label_count_distance(self):
+        eq = get_equation("P and Q")
+        self.assertEqual(label_count_distance(eq, get_equation("Q and P")), 0)
+        self.assertEqual(label_count_distance(eq, get_equation("P or Q")), 2)
+        self.assertEqual(label_count_distance(eq, None), 3)
+
+    def test_tree_edit_distance(self):
+        eq = get_equation("P and Q")
+        self.assertEqual(tree_edit_distance(eq, eq), 0)
+        self.assertEqual(tree_edit_distance(eq, get_equation("P or Q")), 1)
+        self.assertEqual(tree_edit_distance(eq, get_equation("Q and P")), 2)
+        self.assertEqual(tree_edit_distance(eq, get_equation("P and not Q")), 2)
+
+    def test_size_metrics(self):
+        eq = get_equation("(P -> Q) and not (P <-> R)")
+        self.assertEqual(node_count(eq), 8)
+        self.assertEqual(tree_depth(eq), 4)
+        self.assertEqual(operator_cost(eq), 4 + 1 + 2 + 1 + 4)
+        self.assertEqual(operator_cost(eq, {AndEq: 0, NotEq: 0, ImpliesEq: 0, BiImpliesEq: 0}), 4)
+        for metric in SIZE_METRICS.values():
+            self.assertEqual(metric(True), 0)
+            self.assertEqual(metric(get_equation("P")), 1)
+
+        self.assertIs(get_metric(None), node_count)
+        self.assertIs(get_metric('depth'), tree_depth)
+        self.assertIs(get_metric(len), len)
+        with self.assertRaises(ValueError):
+            get_metric('width')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,9 +1,21 @@
 import unittest
+import unittest.mock
 
 from pyles.identities import *
-from pyles.solve import get_equation
+from pyles.cache import RESULT_CACHE, SUBTERM_CACHE
+from pyles.solve import get_equation, prove
 
 class TestLogic(unittest.TestCase):
+    def test_register_identity(self):
+        # Results found before an identity is added may be longer proofs or failures now.
+        prove(get_equation("not (a and b)"), get_equation("not b or not a"))
+        SUBTERM_CACHE.put('key', ())
+        with unittest.mock.patch.object(RULES, 'add') as add:
+            register_identity('excluded_middle', "P or not P = True")
+        add.assert_called_once_with('excluded_middle', "P or not P = True")
+        self.assertEqual(RESULT_CACHE.stats()['size'], 0)
+        self.assertEqual(SUBTERM_CACHE.stats()['size'], 0)
+
     def test_identity(self):
         self.func_helper(identity, "P and True", "P")
         self.func_helper(identity,"Q or False", "Q")
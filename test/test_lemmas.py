@@ -0,0 +1,98 @@
+import os
+import tempfile
+import unittest
+
+from pyles.lemmas import *
+from pyles.identities import FUNC_LIST
+from pyles.solve import get_equation, get_variations, prove, _history_chain
+
+class TestLemmas(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'lemmas.db')
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def assertPrimitive(self, history):
+        # Each step must be a rule application in one direction or the other.
+        func_dict = {str(func): func for func in FUNC_LIST}
+        chain = _history_chain(history)
+        for prev, curr in zip(chain, chain[1:]):
+            func = func_dict[curr.description]
+            self.assertTrue(curr.eq in get_variations(func, prev.eq) or prev.eq in get_variations(func, curr.eq))
+
+    def test_extract(self):
+        history = prove(get_equation("(P -> Q) and (P -> R)"), get_equation("P -> (Q and R)"), strategy='bidirectional',
+                        use_cache=False)
+        texts = [x.text for x in extract_lemmas(history)]
+        self.assertIn('((x0 -> x1) and (x0 -> x2)) = (x0 -> (x1 and x2))', texts)
+
+        lemma = extract_lemmas(history, min_steps=4)[0]
+        self.assertEqual([name for _, name in lemma.steps],
+                         [None, 'implication_equivalence', 'implication_equivalence', 'distributive', 'implication_equivalence'])
+        self.assertEqual(extract_lemmas(history, min_steps=5), [])
+
+    def test_reuse(self):
+        library = LemmaLibrary(self.path)
+        prove(get_equation("(P -> Q) and (P -> R)"), get_equation("P -> (Q and R)"), strategy='bidirectional',
+              use_cache=False, lemmas=library)
+        self.assertGreater(len(library), 0)
+        library.close()
+
+        # Forward search cannot undo distribution, but the stored lemma does it in one step.
+        library = LemmaLibrary(self.path)
+        eq = get_equation("((a -> b) and (a -> c)) or d")
+        dest_eq = get_equation("(a -> (b and c)) or d")
+        history = prove(eq, dest_eq, use_cache=False, lemmas=library)
+        self.assertIs(history.eq, dest_eq)
+        self.assertEqual(len(_history_chain(history)), 5)
+        self.assertPrimitive(history)
+        self.assertEqual(library.stats()['expanded'], 1)
+        library.close()
+
+        library = LemmaLibrary(self.path)
+        self.assertEqual(library.lemmas['((x0 -> x1) and (x0 -> x2)) = (x0 -> (x1 and x2))'].uses, 1)
+        library.close()
+
+    def test_cached(self):
+        # A pair already in the result cache is still searched, so the library learns from it.
+        eq = get_equation("not (p and q)")
+        dest_eq = get_equation("q -> not p")
+        prove(eq, dest_eq)
+        library = LemmaLibrary()
+        history = prove(eq, dest_eq, lemmas=library)
+        self.assertIs(history.eq, dest_eq)
+        self.assertGreater(len(library), 0)
+
+    def test_compact(self):
+        # Learned after more lemmas than a signed char holds, so its rule id in the compact tree does not fit a byte.
+        library = LemmaLibrary(max_lemmas=1000)
+        for i in range(1, 151):
+            lemma = Lemma([(get_equation("x0 or x%d" % i), None), (get_equation("x%d or x0" % i), 'commutative')])
+            library.lemmas[lemma.text] = lemma
+        library.learn(prove(get_equation("(P -> Q) and (P -> R)"), get_equation("P -> (Q and R)"), strategy='bidirectional',
+                            use_cache=False))
+        self.assertGreater(len(library.rules.functions), 128)
+
+        eq = get_equation("((a -> b) and (a -> c)) or d")
+        dest_eq = get_equation("d or (a -> (b and c))")
+        history = prove(eq, dest_eq, compact=True, use_cache=False, lemmas=library)
+        self.assertIs(history.eq, dest_eq)
+        self.assertPrimitive(history)
+
+    def test_eviction(self):
+        library = LemmaLibrary(max_lemmas=2)
+        history = prove(get_equation("(P -> Q) and (P -> R)"), get_equation("P -> (Q and R)"), strategy='bidirectional',
+                        use_cache=False)
+        library.learn(history)
+        self.assertEqual(len(library), 2)
+        self.assertEqual(library.stats()['evicted'], 4)
+
+        # Used lemmas outlive newer unused ones.
+        used, unused = library.lemmas
+        library.lemmas[used].uses = 1
+        self.assertGreater(library.learn(prove(get_equation("not (not (a and b))"), get_equation("b and a"), use_cache=False)), 0)
+        self.assertIn(used, library.lemmas)
+        self.assertNotIn(unused, library.lemmas)
+        self.assertEqual(len(library), 2)
@@ -0,0 +1,58 @@
+import random
+import unittest
+import unittest.mock
+
+from pyles.minimize import *
+from pyles.bench import random_equation
+from pyles.equation import *
+from pyles.solve import get_depth, get_equation, simplify
+from pyles.truthtable import check_equivalence
+
+class TestMinimize(unittest.TestCase):
+    def test_prime_implicants(self):
+        # f(a, b, c) = a'b'c' + a'b'c + ab'c + abc, with a as bit 0.
+        primes = prime_implicants([0b000, 0b100, 0b101, 0b111])
+        self.assertEqual(primes, {(0b000, 0b100), (0b100, 0b001), (0b101, 0b010)})
+
+        cover = minimum_cover([0b000, 0b100, 0b101, 0b111], primes, 3)
+        self.assertEqual(sorted(cover), [(0b000, 0b100), (0b101, 0b010)])
+
+    def test_minimize(self):
+        m = minimize(get_equation("(a and b) or (b and c) or (not a and c)"))
+        self.assertEqual(str(m.eq), "((a and b) or ((not a) and c))")
+        self.assertEqual(m.method, 'quine-mccluskey')
+        self.assertEqual(m.literal_count(), 4)
+        self.assertTrue(m.certificate.verify())
+
+        self.assertIs(minimize(get_equation("a or not a")).eq, True)
+        self.assertIs(minimize(get_equation("a and not a")).eq, False)
+
+    def test_random(self):
+        rng = random.Random(4)
+        for symbol_count in (3, 6, 10):
+            eq = random_equation(rng, symbol_count, depth=5)
+            m = minimize(eq)
+            check_equivalence(eq, m.eq)
+            self.assertEqual(m.method, 'quine-mccluskey' if symbol_count <= QM_MAX_SYMBOLS else 'espresso')
+
+    def test_espresso_matches_exact(self):
+        rng = random.Random(5)
+        for _ in range(5):
+            eq = random_equation(rng, 5, depth=4)
+            exact = minimize(eq)
+            with unittest.mock.patch('pyles.minimize.QM_MAX_SYMBOLS', 0):
+                heuristic = minimize(eq)
+            check_equivalence(eq, heuristic.eq)
+            self.assertGreaterEqual(len(heuristic.cubes), len(exact.cubes))
+
+    def test_simplify(self):
+        eq = get_equation("(a and b) or (a and not b) or (c and a)")
+        history = simplify(eq, strategy='minimize', semantic=False, use_cache=False)
+        self.assertIs(history.eq, SymbolEq('a'))
+        self.assertEqual(history.description, 'two-level minimization')
+
+        eq = get_equation("a -> b")
+        self.assertIs(simplify(eq, strategy='minimize', use_cache=False).eq, eq)
+
+if __name__ == '__main__':
+    unittest.main()
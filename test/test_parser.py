@@ -0,0 +1,45 @@
+import unittest
+
+from pyles.parser import *
+from pyles.equation import *
+
+class TestParser(unittest.TestCase):
+    def test_precedence(self):
+        P, Q, R, S = (SymbolEq(x) for x in 'PQRS')
+        self.assertIs(get_equation("not P and Q or R -> S"), ImpliesEq(OrEq(AndEq(NotEq(P), Q), R), S))
+        self.assertIs(get_equation("P <-> Q -> R"), BiImpliesEq(P, ImpliesEq(Q, R)))
+        self.assertIs(get_equation("P -> Q -> R"), ImpliesEq(ImpliesEq(P, Q), R))
+        self.assertIs(get_equation("not not (P or False)"), NotEq(NotEq(OrEq(P, False))))
+        self.assertIs(get_equation("((P))"), P)
+
+    def test_parse_text(self):
+        self.assertEqual(parse_text("S and (P or R)"), ['S', 'and', ['P', 'or', 'R']])
+        self.assertIs(parse_equation(parse_text("S and (P or R)")), get_equation("S and (P or R)"))
+
+        symbol_list = []
+        parse_equation(parse_text("P and Q"), symbol_list)
+        parse_equation(parse_text("Q and R"), symbol_list)
+        self.assertEqual([x.symbol for x in symbol_list], ['P', 'Q', 'R'])
+
+    def test_errors(self):
+        for text, position in (("", 0), ("P and", 5), ("(P", 0), ("P)", 1), ("and P", 0), ("P  Q", 3)):
+            with self.assertRaises(ParseError) as context:
+                get_equation(text)
+            self.assertEqual(context.exception.position, position)
+
+    def test_parse_many(self):
+        lines = ["P and Q\n", "\n", "# comment\n", "not P\n"]
+        self.assertEqual(list(parse_many(lines)), [get_equation("P and Q"), get_equation("not P")])
+
+        with self.assertRaises(ParseError) as context:
+            list(parse_many(["P", "P or"]))
+        self.assertEqual(context.exception.line, 2)
+        self.assertEqual(context.exception.position, 4)
+
+    def test_long_chain(self):
+        text = ' and '.join('x' + str(i) for i in range(10000))
+        eq = get_equation('(' * 1000 + text + ')' * 1000)
+        self.assertEqual(eq.arg2, SymbolEq('x9999'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+
+from pyles.solve import get_equation
+from pyles.identities import RULES, FUNC_LIST, commutative, double_negation
+from pyles.rules import *
+
+class TestRules(unittest.TestCase):
+    def test_rule(self):
+        rule = Rule('absorption', "P and (P or Q) = P")
+        self.assertIs(rule.lhs, get_equation("P and (P or Q)"))
+        self.assertIs(rule.rhs, get_equation("P"))
+
+        with self.assertRaises(ValueError):
+            Rule('bad', "P and Q")
+        with self.assertRaises(ValueError):
+            Rule('bad', "P = Q")
+
+    def test_match(self):
+        eq = get_equation("A and (A or B)")
+        matches = dict(RULES.match(eq))
+        self.assertEqual(sorted(matches), sorted(i for i, func in enumerate(FUNC_LIST) if func(eq) is not None))
+        for i, result in matches.items():
+            self.assertIs(result, FUNC_LIST[i](eq))
+
+        self.assertIs(matches[FUNC_LIST.index(commutative)], get_equation("(A or B) and A"))
+
+        # The first rule of an identity wins.
+        self.assertIs(double_negation(get_equation("not (not A)")), get_equation("A"))
+
+    def test_nonlinear(self):
+        rule_set = RuleSet()
+        rule_set.add('idempotent', "P and P = P")
+        self.assertIs(rule_set.function('idempotent')(get_equation("A and A")), get_equation("A"))
+        self.assertIsNone(rule_set.function('idempotent')(get_equation("A and B")))
+
+    def test_register(self):
+        rule_set = RuleSet()
+        rule_set.add('commutative', "P and Q = Q and P")
+        func = rule_set.add('reduction', "P and (not P or Q) = P and Q")
+
+        eq = get_equation("A and (not A or B)")
+        self.assertIs(func(eq), get_equation("A and B"))
+        self.assertEqual(rule_set.match(eq), [(0, get_equation("(not A or B) and A")), (1, get_equation("A and B"))])
+        self.assertEqual(func.__name__, 'reduction')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import random
+import time
+import unittest
+
+from pyles.sat import *
+from pyles.bench import random_equation
+from pyles.equation import *
+from pyles.solve import get_equation, prove, simplify
+from pyles.truthtable import NotEquivalentError, find_counterexample
+
+class TestSAT(unittest.TestCase):
+    def test_encode(self):
+        cnf = CNF()
+        literal = cnf.encode(get_equation("(a and b) or not (a and b)"))
+        # The shared subterm and the negation add no variables.
+        self.assertEqual(cnf.variables, 4)
+        self.assertEqual(set(cnf.symbols), {'a', 'b'})
+        self.assertTrue(cnf.to_dimacs().startswith('p cnf 4 6\n'))
+        self.assertGreater(literal, 0)
+
+    def test_random(self):
+        rng = random.Random(7)
+        for _ in range(40):
+            eq1 = random_equation(rng, 4, depth=4)
+            eq2 = random_equation(rng, 4, depth=4)
+            result = equivalent(eq1, eq2)
+            self.assertEqual(bool(result), find_counterexample(eq1, eq2) is None)
+            if not result:
+                for symbol in eq1.get_symbol_set() | eq2.get_symbol_set():
+                    symbol.value = result.counterexample[symbol.symbol]
+                self.assertNotEqual(eq1.eval(), eq2.eval())
+
+    def test_tautology(self):
+        self.assertTrue(is_tautology(get_equation("(a -> b) or (b -> a)")))
+        self.assertTrue(is_tautology(True))
+        result = is_tautology(get_equation("a -> (a and b)"))
+        self.assertFalse(result)
+        self.assertEqual(result.counterexample, {'a': True, 'b': False})
+        self.assertIsNone(satisfy(get_equation("a and not a")))
+
+    def test_pigeonhole(self):
+        # Five pigeons in four holes: unsatisfiable, and only refuted by learning.
+        pigeons, holes = 5, 4
+        clauses = [' or '.join('p%d_%d' % (i, j) for j in range(holes)) for i in range(pigeons)]
+        clauses += ['(not p%d_%d or not p%d_%d)' % (i, j, k, j)
+                    for j in range(holes) for i in range(pigeons) for k in range(i + 1, pigeons)]
+        eq = get_equation(' and '.join('(' + x + ')' for x in clauses))
+        stats = {}
+        self.assertIsNone(satisfy(eq, stats=stats))
+        self.assertGreater(stats['conflicts'], 0)
+
+        with self.assertRaises(ConflictLimitError):
+            satisfy(eq, max_conflicts=5)
+
+    def test_check_equivalence(self):
+        eq1 = get_equation(' and '.join('(x%d or y%d)' % (i, i) for i in range(150)))
+        eq2 = get_equation(' and '.join('(y%d or x%d)' % (i, i) for i in reversed(range(150))))
+        check_equivalence(eq1, eq2)
+
+        differ = get_equation(' and '.join('(y%d or x%d)' % (i, i) for i in range(149)) + ' and (x149 and y149)')
+        start = time.perf_counter()
+        with self.assertRaises(NotEquivalentError) as context:
+            check_equivalence(eq1, differ)
+        self.assertLess(time.perf_counter() - start, 1)
+        counterexample = context.exception.counterexample
+        self.assertEqual(len(counterexample), 300)
+        self.assertNotEqual(counterexample['x149'], counterexample['y149'])
+
+        with self.assertRaises(NotEquivalentError):
+            prove(eq1, differ)
+
+    def test_simplify(self):
+        eq = get_equation(' or '.join('(x%d or not x%d)' % (i, i) for i in range(30)))
+        self.assertIs(simplify(eq, max_tests=10).eq, True)
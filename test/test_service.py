@@ -0,0 +1,153 @@
+import asyncio
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from pyles.service import Service, Job, serve_stdin, serve_socket
+from pyles.solve import get_equation
+
+# Simplifies for far longer than any test waits.
+SLOW_EQ = '((p and b) or (c and d)) or ((e and f) or (g and h))'
+
+
+class TestService(unittest.TestCase):
+    def run_service(self, func, workers=1, **kwargs):
+        async def run():
+            async with Service(workers, **kwargs) as service:
+                return await func(service)
+        return asyncio.run(run())
+
+    def test_job(self):
+        job1 = Job.from_dict({'op': 'prove', 'eq': 'a and b', 'dest': 'b and a', 'max_depth': 5})
+        job2 = Job.from_dict({'op': 'prove', 'eq': 'x and y', 'dest': 'y and x', 'max_depth': 5})
+        self.assertEqual(job1.key, job2.key)
+        self.assertEqual(job2.rename('(x1 and x0)'), '(y and x)')
+
+        with self.assertRaises(ValueError):
+            Job.from_dict({'op': 'solve', 'eq': 'a'})
+        with self.assertRaises(ValueError):
+            Job.from_dict({'op': 'prove', 'eq': 'a'})
+        with self.assertRaises(ValueError):
+            Job.from_dict({'op': 'simplify', 'eq': 'a and'})
+        with self.assertRaises(ValueError):
+            Job.from_dict({'op': 'simplify', 'eq': 'a', 'max_tests': 'many'})
+        with self.assertRaises(ValueError):
+            Job.from_dict({'op': 'simplify', 'eq': 'a', 'max_tests': True})
+        with self.assertRaises(ValueError):
+            Job.from_dict({'op': 'simplify', 'eq': 'a', 'timeout': True})
+        with self.assertRaises(ValueError):
+            Job.from_dict({'id': [1], 'op': 'simplify', 'eq': 'a'})
+
+    def test_solve(self):
+        async def run(service):
+            prove = await service.solve({'id': 1, 'op': 'prove', 'eq': 'a and b', 'dest': 'b and a'})
+            renamed = await service.solve({'id': 2, 'op': 'prove', 'eq': 'p and q', 'dest': 'q and p'})
+            simplify = await service.solve({'id': 3, 'op': 'simplify', 'eq': 'a or (a and b)'})
+            differ = await service.solve({'id': 4, 'op': 'prove', 'eq': 'a and b', 'dest': 'a or b'})
+            error = await service.solve({'id': 5, 'op': 'simplify', 'eq': '(a'})
+            return prove, renamed, simplify, differ, error, service.metrics()
+
+        prove, renamed, simplify, differ, error, metrics = self.run_service(run)
+
+        self.assertEqual(prove['id'], 1)
+        self.assertEqual(prove['status'], 'found')
+        self.assertEqual(prove['proof'], [['(a and b)', 'start'], ['(b and a)', 'commutative']])
+        self.assertEqual(prove['result'], '(b and a)')
+        self.assertFalse(prove['cached'])
+
+        self.assertTrue(renamed['cached'])
+        self.assertEqual(renamed['proof'][0], ['(p and q)', 'start'])
+        self.assertEqual(renamed['result'], '(q and p)')
+
+        self.assertIs(get_equation(simplify['result']), get_equation('a'))
+
+        self.assertEqual(differ['status'], 'not_equivalent')
+        self.assertIsNone(differ['proof'])
+        counterexample = differ['counterexample']
+        self.assertNotEqual(counterexample['a'] and counterexample['b'], counterexample['a'] or counterexample['b'])
+
+        self.assertEqual(error['status'], 'error')
+        self.assertIn('error', error)
+
+        self.assertEqual(metrics['submitted'], 5)
+        self.assertEqual(metrics['completed'], 4)
+        self.assertEqual(metrics['errors'], 1)
+        self.assertEqual(metrics['cache_hits'], 1)
+        self.assertEqual(metrics['searches'], 3)
+
+    def test_merge(self):
+        async def run(service):
+            jobs = [{'id': i, 'op': 'simplify', 'eq': SLOW_EQ.replace('p', 'p' + str(i)), 'timeout': 0.5} for i in range(3)]
+            return await asyncio.gather(*(service.solve(x) for x in jobs)), service.metrics()
+
+        responses, metrics = self.run_service(run)
+        self.assertEqual([x['status'] for x in responses], ['timeout'] * 3)
+        self.assertEqual([x['merged'] for x in responses], [False, True, True])
+        self.assertIn('p2', responses[2]['proof'][0][0])
+        self.assertEqual(metrics['searches'], 1)
+        self.assertEqual(metrics['timeouts'], 3)
+        # Timed out results are not cached.
+        self.assertEqual(metrics['cache']['size'], 0)
+
+    def test_cancel(self):
+        async def run(service):
+            slow = asyncio.ensure_future(service.solve({'id': 'slow', 'op': 'simplify', 'eq': SLOW_EQ}))
+            queued = asyncio.ensure_future(service.solve({'id': 'queued', 'op': 'prove', 'eq': 'a or a', 'dest': 'a'}))
+            await asyncio.sleep(0.5)
+            self.assertEqual(service.metrics()['queue_depth'], 1)
+            self.assertTrue(service.cancel('slow'))
+            self.assertFalse(service.cancel('missing'))
+
+            with self.assertRaises(asyncio.CancelledError):
+                await slow
+            # The worker stops the cancelled search and takes the next job.
+            return await asyncio.wait_for(queued, 10), service.metrics()
+
+        queued, metrics = self.run_service(run)
+        self.assertEqual(queued['status'], 'found')
+        self.assertEqual(metrics['cancelled'], 1)
+        self.assertEqual(metrics['peak_queue_depth'], 1)
+
+    def test_serve_stdin(self):
+        lines = [
+            {'id': 1, 'op': 'prove', 'eq': 'not (a or b)', 'dest': '(not a) and (not b)'},
+            {'id': 2, 'op': 'simplify', 'eq': 'not not a'},
+            {'id': 3, 'op': 'metrics'},
+            {'id': {'job': 4}, 'op': 'simplify', 'eq': 'a'},
+            {'id': [5], 'op': 'cancel'},
+        ]
+        stdin = io.StringIO(''.join(json.dumps(x) + '\n' for x in lines) + 'not json\n')
+        stdout = io.StringIO()
+        self.run_service(lambda service: serve_stdin(service, stdin, stdout))
+
+        responses = [json.loads(x) for x in stdout.getvalue().splitlines()]
+        by_id = {x['id']: x for x in responses}
+        self.assertEqual(len(responses), 6)
+        self.assertEqual(by_id[1]['status'], 'found')
+        self.assertEqual(by_id[2]['result'], 'a')
+        self.assertEqual(by_id[3]['status'], 'metrics')
+        # Unparseable lines and unhashable ids are answered without an id.
+        self.assertEqual([x['status'] for x in responses if x['id'] is None], ['error'] * 3)
+
+    def test_serve_socket(self):
+        async def run(service):
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'pyles.sock')
+                server = asyncio.ensure_future(serve_socket(service, path))
+                while not os.path.exists(path):
+                    await asyncio.sleep(0.01)
+
+                reader, writer = await asyncio.open_unix_connection(path)
+                writer.write(b'{"id": 7, "op": "simplify", "eq": "not not q"}\n')
+                writer.write_eof()
+                # The connection closes once its jobs are answered.
+                responses = await asyncio.wait_for(reader.read(), 10)
+                writer.close()
+                server.cancel()
+                return responses.decode().splitlines()
+
+        responses = self.run_service(run)
+        self.assertEqual(len(responses), 1)
+        self.assertEqual(json.loads(responses[0])['result'], 'q')
@@ -1,8 +1,14 @@
+import pickle
+import threading
+import time
 import unittest
+import unittest.mock
 
 from pyles.solve import *
 from pyles.equation import *
 from pyles.identities import *
+from pyles.tree import TABLE_ENTRY_BYTES
+from pyles.cache import SUBTERM_CACHE
 
 class TestLogic(unittest.TestCase):
     def test_get_equation(self):
@@ -32,6 +38,15 @@ class TestLogic(unittest.TestCase):
         self.assertIn(get_equation("(R and (P and Q)) and S"), variation_list)
         self.assertIn(get_equation("((Q and P) and R) and S"), variation_list)
 
+    def test_get_all_variations(self):
+        eq = get_equation("(P -> Q) and (not (P or R) or Q)")
+        variation_list = [(i, var) for i, func in enumerate(FUNC_LIST) for var in get_variations(func, eq)]
+        self.assertEqual(get_all_variations(eq), variation_list)
+
+        # The depth limit applies to the whole equation.
+        self.assertEqual(get_all_variations(eq, max_depth=get_depth(eq)),
+                         [(i, var) for i, var in variation_list if get_depth(var) <= get_depth(eq)])
+
     def test_hash(self):
         eq1 = get_equation("not P and Q or R -> S")
         eq2 = get_equation("not P and Q or R -> S")
@@ -59,6 +74,59 @@ class TestLogic(unittest.TestCase):
         variation_list = get_variations(commutative, eq1)
         self.assertNotIn(hash(eq1), variation_list)
 
+    def test_interning(self):
+        eq1 = get_equation("(P and Q) or not R")
+        eq2 = OrEq(AndEq(SymbolEq("P"), SymbolEq("Q")), NotEq(SymbolEq("R")))
+        self.assertIs(eq1, eq2)
+        self.assertIs(eq1.arg1, get_equation("P and Q"))
+
+        self.assertEqual(get_depth(eq1), 6)
+        self.assertEqual(eq1.get_symbol_set(), {SymbolEq("P"), SymbolEq("Q"), SymbolEq("R")})
+        self.assertEqual(str(eq1), "((P and Q) or (not R))")
+
+        with self.assertRaises(AttributeError):
+            eq1.arg1 = SymbolEq("S")
+
+    def test_interning_threads(self):
+        # Threads building the same new nodes at once must get the same objects.
+        barrier = threading.Barrier(8)
+        results = [None] * 8
+
+        def build(index):
+            barrier.wait()
+            results[index] = [AndEq(SymbolEq("t%d" % i), NotEq(SymbolEq("u%d" % i))) for i in range(2000)]
+
+        threads = [threading.Thread(target=build, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for eqs in results[1:]:
+            self.assertTrue(all(x is y for x, y in zip(eqs, results[0])))
+
+    def test_deep_equation(self):
+        names = ['a' + str(i) for i in range(100000)]
+        eq = get_equation(' and '.join(names))
+        self.assertEqual(get_depth(eq), 199999)
+
+        text = str(eq)
+        self.assertTrue(text.startswith('(' * 99999 + 'a0 and a1)'))
+        self.assertIs(get_equation(text), eq)
+        self.assertEqual(len(eq.get_symbol_set()), 100000)
+
+        for name in names:
+            eq.set_symbol_value(name, True)
+        self.assertIs(eq.eval(), True)
+        eq.set_symbol_value('a500', False)
+        self.assertIs(eq.eval(), False)
+        self.assertEqual(eq.sub_str().count('False'), 1)
+
+        dest_eq = AndEq(eq.arg2, eq.arg1)
+        history = prove(eq, dest_eq, max_depth=get_depth(eq), precheck=False, use_cache=False)
+        self.assertIs(history.eq, dest_eq)
+        self.assertEqual(str(history), text + ' by start\n' + str(dest_eq) + ' by ' + str(commutative) + '\n')
+        self.assertIs(get_top_history(history).eq, eq)
+
     def test_prove(self):
         # self.skipTest('r')
         eq = get_equation("(a or (b -> c)) or ((c or not a) and (b or not a))")
@@ -68,6 +136,211 @@ class TestLogic(unittest.TestCase):
         except Exception:
             self.fail()
 
+    def test_prove_bidirectional(self):
+        eq = get_equation("not (P and Q)")
+        dest_eq = get_equation("not Q or not P")
+        history = prove(eq, dest_eq, strategy='bidirectional')
+
+        chain = []
+        while history:
+            chain.append(history)
+            history = history.parent
+        chain.reverse()
+
+        self.assertIs(chain[0].eq, eq)
+        self.assertIs(chain[-1].eq, dest_eq)
+
+        # Each step must be a rule application in one direction or the other.
+        func_dict = {str(func): func for func in FUNC_LIST}
+        for prev, curr in zip(chain, chain[1:]):
+            func = func_dict[curr.description]
+            self.assertTrue(curr.eq in get_variations(func, prev.eq) or prev.eq in get_variations(func, curr.eq))
+
+        with self.assertRaises(ValueError):
+            prove(eq, None, simplify=True, strategy='bidirectional')
+
+    def test_prove_astar(self):
+        eq = get_equation("not (P and Q)")
+        dest_eq = get_equation("not Q or not P")
+
+        history = prove(eq, dest_eq, strategy='astar', admissible=True)
+        self.assertIs(history.eq, dest_eq)
+        self.assertEqual(str(history).count('\n'), 3)
+
+        eq = get_equation("(a or (b -> c)) or ((c or not a) and (b or not a))")
+        history = prove(eq, True, max_depth=get_depth(eq) + 1, strategy='astar')
+        self.assertEqual(history.eq, True)
+
+    def test_prove_parallel(self):
+        eq = get_equation("(P -> Q) and (P -> R)")
+        dest_eq = get_equation("(not P or R) and (not P or Q)")
+
+        serial = prove(eq, dest_eq)
+        with unittest.mock.patch('pyles.solve.PARALLEL_MIN_FRONTIER', 1):
+            parallel = prove(eq, dest_eq, strategy='parallel', processes=2, batch_size=8)
+        self.assertEqual(str(parallel), str(serial))
+
+    def test_prove_parallel_deep(self):
+        # Equations too deep for pickle to recurse through reach the workers and come back.
+        chain = SymbolEq('x0')
+        for i in range(1, 5000):
+            chain = AndEq(chain, SymbolEq('x' + str(i % 50)))
+        self.assertIs(pickle.loads(pickle.dumps(chain)), chain)
+
+        eq = AndEq(SymbolEq('x599'), True)
+        dest_eq = SymbolEq('x599')
+        for i in range(598, -1, -1):
+            eq = BiImpliesEq(SymbolEq('x' + str(i)), eq)
+            dest_eq = BiImpliesEq(SymbolEq('x' + str(i)), dest_eq)
+        with unittest.mock.patch('pyles.solve.PARALLEL_MIN_FRONTIER', 1):
+            history = prove(eq, dest_eq, strategy='parallel', processes=2, max_depth=eq.depth, precheck=False, use_cache=False)
+        self.assertIs(history.eq, dest_eq)
+
+    def test_prove_compact(self):
+        eq = get_equation("(P -> Q) and (P -> R)")
+        dest_eq = get_equation("(not P or R) and (not P or Q)")
+
+        stats = {}
+        history = prove(eq, dest_eq, compact=True, stats=stats, use_cache=False)
+        self.assertEqual(str(history), str(prove(eq, dest_eq, use_cache=False)))
+        self.assertLess(stats['peak_live_nodes'], stats['nodes'] + 1)
+        self.assertGreater(stats['bytes'], 0)
+
+        eq = get_equation("(P and (P or Q)) or R")
+        history = simplify(eq, max_depth=get_depth(eq), max_tests=2000, semantic=False, compact=True, use_cache=False)
+        self.assertLess(get_depth(history.eq), get_depth(eq))
+
+    def test_prove_iddfs(self):
+        eq = get_equation("(P -> Q) and (P -> R)")
+        dest_eq = get_equation("(not P or R) and (not P or Q)")
+        shortest = prove(eq, dest_eq, strategy='bidirectional', use_cache=False)
+
+        for memory_cap in (None, 1000):
+            stats = {}
+            history = prove(eq, dest_eq, strategy='iddfs', memory_cap=memory_cap, stats=stats, use_cache=False)
+            self.assertIs(history.eq, dest_eq)
+            self.assertEqual(str(history).count('\n'), str(shortest).count('\n'))
+            # One iteration per proof length, from 1 to the 3 steps of the shortest proof.
+            self.assertEqual(stats['iterations'], 3)
+        self.assertEqual(stats['slots'], 1000 // TABLE_ENTRY_BYTES)
+
+        eq = get_equation("(P and (P or Q)) or R")
+        history = simplify(eq, max_depth=get_depth(eq), max_tests=2000, semantic=False, strategy='iddfs', use_cache=False)
+        self.assertEqual(str(history.eq), "(P or R)")
+
+        with self.assertRaises(Exception):
+            prove(get_equation("P and P"), get_equation("P or P"), max_depth=3, strategy='iddfs', precheck=False)
+
+        # Equivalent, but not reachable within max_depth: every iteration deepens until no new equation is left.
+        eq = get_equation("(a or b) and (c -> d)")
+        dest_eq = get_equation("((a or b) and (not c)) or ((a or b) and d)")
+        stats = {}
+        with self.assertRaises(Exception):
+            prove(eq, dest_eq, max_depth=11, strategy='iddfs', table_size=1 << 20, stats=stats, precheck=False,
+                  use_cache=False, time_budget=60)
+        self.assertLess(stats['iterations'], 20)
+
+        # A table that loses equations still finds the shortest proof, and never reports an unreachable goal as exhausted.
+        eq = get_equation("not (a and b) or c")
+        dest_eq = get_equation("(b -> c) or not a")
+        shortest = prove(eq, dest_eq, use_cache=False)
+        for table_size in (1, 4):
+            history = prove(eq, dest_eq, strategy='iddfs', table_size=table_size, use_cache=False)
+            self.assertEqual(str(history).count('\n'), str(shortest).count('\n'))
+
+        eq = get_equation("P and Q")
+        dest_eq = get_equation("P or Q")
+        for table_size, status in ((1, 'max_depth'), (65536, 'exhausted')):
+            for event in search(eq, dest_eq, max_depth=7, strategy='iddfs', table_size=table_size, precheck=False,
+                                use_cache=False):
+                pass
+            self.assertEqual(event.status, status)
+
+    def test_simplify_bottom_up(self):
+        eq = get_equation(' and '.join('((x%d and (x%d or y%d)) or not not z%d)' % (i, i, i, i) for i in range(6)))
+        history = simplify(eq, strategy='bottom_up', semantic=False, use_cache=False)
+        self.assertIs(history.eq, get_equation(' and '.join('(x%d or z%d)' % (i, i) for i in range(6))))
+
+        # Every step is a rule application somewhere in the whole equation.
+        func_dict = {str(func): func for func in FUNC_LIST}
+        while history.parent:
+            self.assertIn(history.eq, get_variations(func_dict[history.description], history.parent.eq, get_depth(eq)))
+            history = history.parent
+        self.assertIs(history.eq, eq)
+
+        # Subterm results are shared across calls, whatever the symbol names.
+        SUBTERM_CACHE.clear()
+        simplify(get_equation("(a and (a or b)) or c"), strategy='bottom_up', semantic=False, use_cache=True)
+        simplify(get_equation("((p and (p or q)) or r) or s"), strategy='bottom_up', semantic=False, use_cache=True)
+        self.assertGreater(SUBTERM_CACHE.stats()['hits'], 0)
+
+        with self.assertRaises(ValueError):
+            prove(eq, eq, strategy='bottom_up')
+
+    def test_search(self):
+        eq = get_equation("(P -> Q) and (P -> R)")
+        dest_eq = get_equation("(not P or R) and (not P or Q)")
+
+        events = list(search(eq, dest_eq, use_cache=False, progress_interval=10))
+        self.assertTrue(all(x.kind == 'progress' for x in events[:-1]))
+        self.assertGreater(len(events), 1)
+        self.assertEqual(events[-1].kind, 'finished')
+        self.assertEqual(events[-1].status, 'found')
+        self.assertIs(events[-1].result.eq, dest_eq)
+
+        expanded = [x.expanded for x in events]
+        self.assertEqual(expanded, sorted(expanded))
+
+    def test_search_budgets(self):
+        eq = get_equation("(a or (b -> c)) or ((c or not a) and (b or not a))")
+
+        for strategy in ('bfs', 'astar'):
+            event = list(search(eq, True, strategy=strategy, node_budget=50, use_cache=False))[-1]
+            self.assertEqual(event.status, 'node_budget')
+            self.assertEqual(event.expanded, 50)
+            self.assertLessEqual(get_depth(event.result.eq), get_depth(eq))
+
+        history = prove(eq, True, time_budget=0, use_cache=False)
+        self.assertIs(history.eq, eq)
+
+        cancel = threading.Event()
+        cancel.set()
+        history = simplify(eq, semantic=False, cancel=cancel, use_cache=False)
+        self.assertIs(history.eq, eq)
+
+        # A budget stop is not a finished proof, so nothing is cached.
+        history = prove(eq, True, node_budget=1)
+        self.assertIs(history.eq, eq)
+
+        # The checks before the search keep the budgets too: XOR chains take the SAT solver thousands of conflicts.
+        eq1 = get_equation(' <-> '.join('x%d' % i for i in range(60)))
+        eq2 = get_equation(' <-> '.join('x%d' % i for i in reversed(range(60))))
+        start = time.monotonic()
+        event = list(search(eq1, eq2, time_budget=0.2, use_cache=False))[-1]
+        self.assertEqual(event.status, 'timeout')
+        self.assertLess(time.monotonic() - start, 1.5)
+        self.assertIs(prove(eq1, eq2, cancel=cancel, use_cache=False).eq, eq1)
+
+        event = list(search(BiImpliesEq(eq1, eq2), None, simplify=True, semantic=True, cancel=cancel, use_cache=False))[-1]
+        self.assertEqual(event.status, 'cancelled')
+
+    def test_simplify_metric(self):
+        eq = get_equation("(P and (P or Q)) or R")
+        for metric in ('nodes', 'depth', 'cost'):
+            history = simplify(eq, max_depth=get_depth(eq), max_tests=2000, semantic=False, metric=metric, use_cache=False)
+            self.assertEqual(str(history.eq), "(P or R)")
+            self.assertIs(get_top_history(history).eq, eq)
+
+        # Any function of one equation is a metric; this one prefers large equations.
+        history = simplify(eq, max_depth=get_depth(eq) + 2, max_tests=200, semantic=False, metric=lambda x: -get_depth(x),
+                           use_cache=False)
+        self.assertGreater(get_depth(history.eq), get_depth(eq))
+
+        events = list(search(eq, None, simplify=True, max_depth=get_depth(eq) + 2, patience=20, use_cache=False))
+        self.assertEqual(events[-1].status, 'no_improvement')
+        self.assertEqual(str(events[-1].result.eq), "(P or R)")
+        self.assertLess(events[-1].expanded, 200)
+
     def test_simplify(self):
         # self.skipTest('r')
         eq = get_equation("(a or (b -> c)) or ((c or not a) and (b or not a))")
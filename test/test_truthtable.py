@@ -0,0 +1,68 @@
+import tracemalloc
+import unittest
+
+from pyles.equation import AndEq, OrEq, NotEq, SymbolEq
+from pyles.solve import get_equation, prove, simplify
+from pyles.truthtable import *
+
+class TestTruthTable(unittest.TestCase):
+    def test_truth_table(self):
+        table = truth_table(get_equation("P and not Q"))
+        self.assertTrue(table.exact)
+        self.assertEqual(table.symbols, ('P', 'Q'))
+        self.assertEqual(table.count(), 1)
+        self.assertIsNone(table.is_constant())
+
+        self.assertEqual(truth_table(get_equation("P or not P")).is_constant(), True)
+        self.assertEqual(truth_table(get_equation("P and not P")).is_constant(), False)
+        self.assertEqual(truth_table(get_equation("P and (P or Q)")).as_symbol(), get_equation("P"))
+
+    def test_counterexample(self):
+        eq1 = get_equation("P -> Q")
+        eq2 = get_equation("Q -> P")
+        counterexample = find_counterexample(eq1, eq2)
+        self.assertIsNotNone(counterexample)
+
+        for symbol, value in counterexample.items():
+            eq1.set_symbol_value(symbol, value)
+        self.assertNotEqual(eq1.eval(), eq2.eval())
+
+        self.assertIsNone(find_counterexample(eq1, get_equation("not P or Q")))
+
+        with self.assertRaises(NotEquivalentError):
+            prove(eq1, eq2)
+
+    def test_sampled(self):
+        text = " or ".join("a" + str(i) for i in range(30))
+        table = truth_table(get_equation(text), sample_size=1000)
+        self.assertFalse(table.exact)
+        self.assertEqual(table.size, 1000)
+
+        counterexample = find_counterexample(get_equation(text), get_equation("(" + text + ") and b"), sample_size=1000)
+        self.assertIsNotNone(counterexample)
+
+    def test_exact_memory(self):
+        # 2000 distinct nodes over 20 symbols: a column of 128KB each if none were freed.
+        eq = SymbolEq('s0')
+        for i in range(2000):
+            eq = (AndEq if i % 2 else OrEq)(eq, NotEq(SymbolEq('s' + str(i % 20))))
+        tracemalloc.start()
+        try:
+            table = truth_table(eq)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        self.assertTrue(table.exact)
+        self.assertLess(peak, 64 << 20)
+
+    def test_fingerprint(self):
+        self.assertEqual(semantic_fingerprint(get_equation("P -> Q")), semantic_fingerprint(get_equation("not P or Q")))
+        self.assertNotEqual(semantic_fingerprint(get_equation("P -> Q")), semantic_fingerprint(get_equation("Q -> P")))
+
+    def test_simplify(self):
+        history = simplify(get_equation("(P and Q) or (P and not Q)"))
+        self.assertEqual(history.eq, get_equation("P"))
+        self.assertEqual(history.description, 'truth table')
+
+if __name__ == '__main__':
+    unittest.main()